@@ -0,0 +1,77 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""swap in wal_events with binary ids
+
+Revision ID: 0a6d9b4e7c31
+Revises: f3c5a8e1d2b7
+Create Date: 2026-10-17 19:58:37.551026
+
+Cut-over of the BINARY(16) wal_events built by f3c5a8e1d2b7: an atomic RENAME,
+then the old table and its triggers are dropped. Code from before this revision
+writes 36-character ids and fails against the new table, so stop the WAL
+listeners and the API (or switch them to this revision's code) right before
+running it; it takes seconds.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6d9b4e7c31'
+down_revision: Union[str, None] = 'f3c5a8e1d2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS = ('wal_events_v2_insert', 'wal_events_v2_update', 'wal_events_v2_delete')
+
+
+def upgrade() -> None:
+    op.execute("RENAME TABLE wal_events TO wal_events_text_ids, wal_events_v2 TO wal_events")
+    for trigger in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.drop_table('wal_events_text_ids')
+
+
+def downgrade() -> None:
+    # Blocking copy back to the 36-character string form of every id.
+    op.create_table('wal_events_text_ids',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('wal_pipeline_id', sa.String(length=36), nullable=False),
+    sa.Column('commit_lsn', sa.BigInteger(), nullable=False),
+    sa.Column('seq', sa.BigInteger(), nullable=False),
+    sa.Column('record_pks', sa.JSON(), nullable=False),
+    sa.Column('record', sa.JSON(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=True),
+    sa.Column('changes', sa.JSON(), nullable=True),
+    sa.Column('action', sa.Enum('insert', 'update', 'delete', name='waleventaction'), nullable=False),
+    sa.Column('committed_at', sa.DateTime(), nullable=False),
+    sa.Column('source_table_oid', sa.Integer(), nullable=False),
+    sa.Column('source_table_schema', sa.String(length=255), nullable=False),
+    sa.Column('source_table_name', sa.String(length=255), nullable=False),
+    sa.Column('inserted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['wal_pipeline_id'], ['postgres_replication_slots.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('wal_pipeline_id', 'commit_lsn', 'seq', name='uq_wal_events_pipeline_commit_seq')
+    )
+    op.create_index('ix_wal_events_pipeline_committed', 'wal_events_text_ids',
+                    ['wal_pipeline_id', 'committed_at', 'seq', 'id'], unique=False)
+    op.create_index('ix_wal_events_pipeline_table_action_committed', 'wal_events_text_ids',
+                    ['wal_pipeline_id', 'source_table_name', 'action', 'committed_at', 'seq', 'id'], unique=False)
+    op.execute("""
+        INSERT INTO wal_events_text_ids (id, wal_pipeline_id, commit_lsn, seq, record_pks, record, data, changes,
+                                         action, committed_at, source_table_oid, source_table_schema,
+                                         source_table_name, inserted_at)
+        SELECT LOWER(CONCAT_WS('-', SUBSTR(HEX(id), 1, 8), SUBSTR(HEX(id), 9, 4), SUBSTR(HEX(id), 13, 4),
+                               SUBSTR(HEX(id), 17, 4), SUBSTR(HEX(id), 21))),
+               wal_pipeline_id, commit_lsn, seq, record_pks, record, data, changes, action,
+               committed_at, source_table_oid, source_table_schema, source_table_name, inserted_at
+        FROM wal_events
+    """)
+    # Left for f3c5a8e1d2b7's downgrade to drop.
+    op.execute("RENAME TABLE wal_events TO wal_events_v2, wal_events_text_ids TO wal_events")
@@ -0,0 +1,42 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""drop redundant unique ids
+
+Revision ID: 1e7b4c9d2f85
+Revises: 0a6d9b4e7c31
+Create Date: 2026-10-17 21:12:05.318442
+
+The initial migration gave users, postgres_databases and
+postgres_replication_slots an unnamed UniqueConstraint('id') next to their
+primary key on the same column. The primary key already enforces uniqueness and
+serves every lookup and foreign key on id, so the second index only costs a
+write per insert and its space. Dropping an index is an in-place metadata
+change in InnoDB.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e7b4c9d2f85'
+down_revision: Union[str, None] = '0a6d9b4e7c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# MySQL names an unnamed unique index after its column.
+TABLES = ('users', 'postgres_databases', 'postgres_replication_slots')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.drop_constraint('id', table, type_='unique')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.create_unique_constraint('id', table, ['id'])
@@ -0,0 +1,54 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""add replication slot leases
+
+Revision ID: 5e2c7a91d4f0
+Revises: 01c756fe3429
+Create Date: 2026-10-17 09:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2c7a91d4f0'
+down_revision: Union[str, None] = '01c756fe3429'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('wal_listener_nodes',
+    sa.Column('node_id', sa.String(length=255), nullable=False),
+    sa.Column('hostname', sa.String(length=255), nullable=True),
+    sa.Column('pid', sa.Integer(), nullable=True),
+    sa.Column('started_at', mysql.DATETIME(fsp=6), nullable=True),
+    sa.Column('heartbeat_at', mysql.DATETIME(fsp=6), nullable=True),
+    sa.Column('expires_at', mysql.DATETIME(fsp=6), nullable=False),
+    sa.PrimaryKeyConstraint('node_id')
+    )
+    op.create_table('replication_slot_leases',
+    sa.Column('slot_id', sa.String(length=36), nullable=False),
+    sa.Column('owner', sa.String(length=255), nullable=True),
+    sa.Column('fencing_token', sa.BigInteger(), nullable=False),
+    sa.Column('acquired_at', mysql.DATETIME(fsp=6), nullable=True),
+    sa.Column('renewed_at', mysql.DATETIME(fsp=6), nullable=True),
+    sa.Column('expires_at', mysql.DATETIME(fsp=6), nullable=False),
+    sa.ForeignKeyConstraint(['slot_id'], ['postgres_replication_slots.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('slot_id')
+    )
+    op.create_index(op.f('ix_replication_slot_leases_owner'), 'replication_slot_leases', ['owner'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_replication_slot_leases_owner'), table_name='replication_slot_leases')
+    op.drop_table('replication_slot_leases')
+    op.drop_table('wal_listener_nodes')
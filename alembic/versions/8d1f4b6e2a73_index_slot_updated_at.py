@@ -0,0 +1,34 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""index updated_at for incremental slot refresh
+
+Revision ID: 8d1f4b6e2a73
+Revises: 5e2c7a91d4f0
+Create Date: 2026-10-17 11:40:05.230118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d1f4b6e2a73'
+down_revision: Union[str, None] = '5e2c7a91d4f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_postgres_replication_slots_updated_at'), 'postgres_replication_slots', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_postgres_databases_updated_at'), 'postgres_databases', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_postgres_databases_updated_at'), table_name='postgres_databases')
+    op.drop_index(op.f('ix_postgres_replication_slots_updated_at'), table_name='postgres_replication_slots')
@@ -0,0 +1,39 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""add replication slot checkpoints
+
+Revision ID: b3e9d07c5f12
+Revises: 8d1f4b6e2a73
+Create Date: 2026-10-17 13:02:51.774610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e9d07c5f12'
+down_revision: Union[str, None] = '8d1f4b6e2a73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('replication_slot_checkpoints',
+    sa.Column('slot_id', sa.String(length=36), nullable=False),
+    sa.Column('commit_lsn', mysql.BIGINT(unsigned=True), nullable=False),
+    sa.Column('updated_at', mysql.DATETIME(fsp=6), nullable=True),
+    sa.ForeignKeyConstraint(['slot_id'], ['postgres_replication_slots.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('slot_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('replication_slot_checkpoints')
@@ -0,0 +1,104 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""dedupe wal_events and add natural key
+
+Revision ID: c41a8e5d9b27
+Revises: b3e9d07c5f12
+Create Date: 2026-10-17 14:26:09.481553
+
+Deletes replayed duplicate wal_events and renumbers seq, then adds the unique
+natural key. Nothing is lost for good: the deleted rows are copied to
+wal_events_dedupe_backup and every row's previous seq to
+wal_events_seq_backup first, and the counts are logged. Drop both tables once
+the result has been checked. The downgrade only removes the key; it does not
+restore the deleted rows or the old seq values (do that from the backup tables
+if needed), and the upgrade refuses to run again while they exist.
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41a8e5d9b27'
+down_revision: Union[str, None] = 'b3e9d07c5f12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DELETED_BACKUP = 'wal_events_dedupe_backup'
+SEQ_BACKUP = 'wal_events_seq_backup'
+
+# Rows written before this revision carry seq = commit_lsn + xid, the same value
+# for every change of a transaction, and replays after a reconnect stored whole
+# transactions again. The replayed copies have identical content within one
+# pipeline/commit_lsn; the oldest row is kept.
+DUPLICATES = """
+    SELECT w.* FROM wal_events w
+    JOIN (
+        SELECT id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY wal_pipeline_id, commit_lsn, source_table_oid, action,
+                                MD5(CONCAT_WS('|', CAST(record_pks AS CHAR), CAST(record AS CHAR),
+                                              COALESCE(CAST(changes AS CHAR), '')))
+                   ORDER BY inserted_at, id
+               ) AS copy
+        FROM wal_events
+    ) d ON d.id = w.id
+    WHERE d.copy > 1
+"""
+
+
+def _execute(sql):
+    """
+    Run `sql`, returning the affected row count (None when rendering SQL offline).
+    """
+    if op.get_context().as_sql:
+        op.execute(sql)
+        return None
+    return op.get_bind().execute(sa.text(sql)).rowcount
+
+
+def upgrade() -> None:
+    # CREATE TABLE fails if a backup from an earlier run is still there.
+    op.execute(f"CREATE TABLE {DELETED_BACKUP} LIKE wal_events")
+    _execute(f"INSERT INTO {DELETED_BACKUP} {DUPLICATES}")
+    op.create_table(SEQ_BACKUP,
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('seq', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _execute(f"INSERT INTO {SEQ_BACKUP} (id, seq) SELECT id, seq FROM wal_events")
+    deleted = _execute(f"DELETE w FROM wal_events w JOIN {DELETED_BACKUP} b ON b.id = w.id")
+    # Renumber seq as the ordinal within each transaction. The original change
+    # order of legacy rows was never stored; insertion order is kept.
+    renumbered = _execute("""
+        UPDATE wal_events w
+        JOIN (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY wal_pipeline_id, commit_lsn
+                       ORDER BY inserted_at, id
+                   ) - 1 AS ordinal
+            FROM wal_events
+        ) o ON o.id = w.id
+        SET w.seq = o.ordinal
+    """)
+    if deleted is not None:
+        logger.info("Deleted %d duplicate wal_events (copied to %s) and renumbered seq of %d rows "
+                    "(previous values in %s)", deleted, DELETED_BACKUP, renumbered, SEQ_BACKUP)
+    op.create_unique_constraint('uq_wal_events_pipeline_commit_seq', 'wal_events',
+                                ['wal_pipeline_id', 'commit_lsn', 'seq'])
+
+
+def downgrade() -> None:
+    # Only the key: the deleted duplicates and the old seq values stay in the
+    # backup tables and are not restored.
+    op.drop_constraint('uq_wal_events_pipeline_commit_seq', 'wal_events', type_='unique')
@@ -0,0 +1,51 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""add replication slot lag samples
+
+Revision ID: d7a3f1c9e4b6
+Revises: c41a8e5d9b27
+Create Date: 2026-10-17 16:12:40.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3f1c9e4b6'
+down_revision: Union[str, None] = 'c41a8e5d9b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('replication_slot_lag_samples',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('slot_id', sa.String(length=36), nullable=False),
+    sa.Column('sampled_at', mysql.DATETIME(fsp=6), nullable=False),
+    sa.Column('wal_lsn', mysql.BIGINT(unsigned=True), nullable=True),
+    sa.Column('confirmed_flush_lsn', mysql.BIGINT(unsigned=True), nullable=True),
+    sa.Column('restart_lsn', mysql.BIGINT(unsigned=True), nullable=True),
+    sa.Column('lag_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('retained_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('lag_seconds', sa.Float(), nullable=True),
+    sa.Column('active', sa.Boolean(), nullable=True),
+    sa.Column('wal_status', sa.String(length=16), nullable=True),
+    sa.ForeignKeyConstraint(['slot_id'], ['postgres_replication_slots.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_replication_slot_lag_samples_slot_sampled', 'replication_slot_lag_samples', ['slot_id', 'sampled_at'], unique=False)
+    op.create_index(op.f('ix_replication_slot_lag_samples_sampled_at'), 'replication_slot_lag_samples', ['sampled_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_replication_slot_lag_samples_sampled_at'), table_name='replication_slot_lag_samples')
+    op.drop_index('ix_replication_slot_lag_samples_slot_sampled', table_name='replication_slot_lag_samples')
+    op.drop_table('replication_slot_lag_samples')
@@ -0,0 +1,41 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""index wal_events for the list filters
+
+Revision ID: e5b8c2d6a914
+Revises: d7a3f1c9e4b6
+Create Date: 2026-10-17 18:03:51.724906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8c2d6a914'
+down_revision: Union[str, None] = 'd7a3f1c9e4b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GET /api/wal-events pages through one pipeline's events, optionally of one
+    # table and action, in (committed_at, seq, id) order. Both indexes end in the
+    # full sort key, so a page is a range scan that stops after `limit` rows.
+    # InnoDB adds secondary indexes in place without blocking writes, but each one
+    # reads the whole table: expect minutes per 10M rows.
+    op.create_index('ix_wal_events_pipeline_committed', 'wal_events',
+                    ['wal_pipeline_id', 'committed_at', 'seq', 'id'], unique=False)
+    op.create_index('ix_wal_events_pipeline_table_action_committed', 'wal_events',
+                    ['wal_pipeline_id', 'source_table_name', 'action', 'committed_at', 'seq', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_wal_events_pipeline_table_action_committed', table_name='wal_events')
+    op.drop_index('ix_wal_events_pipeline_committed', table_name='wal_events')
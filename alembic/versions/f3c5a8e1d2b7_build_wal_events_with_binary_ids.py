@@ -0,0 +1,117 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+"""build wal_events with binary ids
+
+Revision ID: f3c5a8e1d2b7
+Revises: e5b8c2d6a914
+Create Date: 2026-10-17 19:41:12.308514
+
+First half of moving wal_events.id from VARCHAR(36) to BINARY(16). Creates
+wal_events_v2 with the new key, keeps it in sync with wal_events through
+triggers and copies the existing rows over in chunks of BACKFILL_CHUNK, each
+committed on its own. Runs while listeners and the API keep writing on the old
+code; the cut-over is the next revision (0a6d9b4e7c31).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c5a8e1d2b7'
+down_revision: Union[str, None] = 'e5b8c2d6a914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK = 10000
+
+COLUMNS = ('id', 'wal_pipeline_id', 'commit_lsn', 'seq', 'record_pks', 'record', 'data', 'changes', 'action',
+           'committed_at', 'source_table_oid', 'source_table_schema', 'source_table_name', 'inserted_at')
+# Existing ids keep their value, only the storage changes: '1b4e28ba-2fa1-...' -> 16 bytes.
+TO_BINARY = "UNHEX(REPLACE({}, '-', ''))"
+TRIGGERS = ('wal_events_v2_insert', 'wal_events_v2_update', 'wal_events_v2_delete')
+
+
+def _values(row):
+    return ", ".join([TO_BINARY.format(f"{row}.id")] + [f"{row}.{column}" for column in COLUMNS[1:]])
+
+
+def upgrade() -> None:
+    op.create_table('wal_events_v2',
+    sa.Column('id', sa.BINARY(length=16), nullable=False),
+    sa.Column('wal_pipeline_id', sa.String(length=36), nullable=False),
+    sa.Column('commit_lsn', sa.BigInteger(), nullable=False),
+    sa.Column('seq', sa.BigInteger(), nullable=False),
+    sa.Column('record_pks', sa.JSON(), nullable=False),
+    sa.Column('record', sa.JSON(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=True),
+    sa.Column('changes', sa.JSON(), nullable=True),
+    sa.Column('action', sa.Enum('insert', 'update', 'delete', name='waleventaction'), nullable=False),
+    sa.Column('committed_at', sa.DateTime(), nullable=False),
+    sa.Column('source_table_oid', sa.Integer(), nullable=False),
+    sa.Column('source_table_schema', sa.String(length=255), nullable=False),
+    sa.Column('source_table_name', sa.String(length=255), nullable=False),
+    sa.Column('inserted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['wal_pipeline_id'], ['postgres_replication_slots.id'], name='fk_wal_events_wal_pipeline_id'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('wal_pipeline_id', 'commit_lsn', 'seq', name='uq_wal_events_pipeline_commit_seq')
+    )
+    op.create_index('ix_wal_events_pipeline_committed', 'wal_events_v2',
+                    ['wal_pipeline_id', 'committed_at', 'seq', 'id'], unique=False)
+    op.create_index('ix_wal_events_pipeline_table_action_committed', 'wal_events_v2',
+                    ['wal_pipeline_id', 'source_table_name', 'action', 'committed_at', 'seq', 'id'], unique=False)
+
+    # From here on every change to wal_events is mirrored, so the backfill below
+    # may run as long as it needs. Both sides are idempotent on the primary key.
+    columns = ", ".join(COLUMNS)
+    op.execute(f"""
+        CREATE TRIGGER wal_events_v2_insert AFTER INSERT ON wal_events FOR EACH ROW
+        REPLACE INTO wal_events_v2 ({columns}) VALUES ({_values('NEW')})
+    """)
+    op.execute(f"""
+        CREATE TRIGGER wal_events_v2_update AFTER UPDATE ON wal_events FOR EACH ROW
+        BEGIN
+            DELETE FROM wal_events_v2 WHERE id = {TO_BINARY.format('OLD.id')};
+            REPLACE INTO wal_events_v2 ({columns}) VALUES ({_values('NEW')});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER wal_events_v2_delete AFTER DELETE ON wal_events FOR EACH ROW
+        DELETE FROM wal_events_v2 WHERE id = {TO_BINARY.format('OLD.id')}
+    """)
+
+    select = f"SELECT {_values('wal_events')} FROM wal_events"
+    # Rows the triggers already mirrored are at least as recent; keep them.
+    copy = (f"INSERT INTO wal_events_v2 ({columns}) {select} {{where}} "
+            "ON DUPLICATE KEY UPDATE wal_events_v2.id = wal_events_v2.id")
+    if op.get_context().as_sql:
+        op.execute(copy.format(where=""))
+        return
+
+    # One short transaction per chunk of the old primary key, so the copy holds
+    # no long-lived locks and does not build up undo.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        last = ""
+        while True:
+            upper = conn.execute(
+                sa.text("SELECT id FROM wal_events WHERE id > :last ORDER BY id LIMIT 1 OFFSET :offset"),
+                {"last": last, "offset": BACKFILL_CHUNK - 1}
+            ).scalar()
+            if upper is None:
+                conn.execute(sa.text(copy.format(where="WHERE wal_events.id > :last")), {"last": last})
+                break
+            conn.execute(sa.text(copy.format(where="WHERE wal_events.id > :last AND wal_events.id <= :upper")),
+                         {"last": last, "upper": upper})
+            last = upper
+
+
+def downgrade() -> None:
+    for trigger in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.drop_table('wal_events_v2')
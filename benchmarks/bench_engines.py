@@ -0,0 +1,259 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/bench_engines.py
+"""
+Thread-per-slot vs asyncio-multiplexed listener engines.
+
+Every slot is a real SlotStream (decoder, TransactionBuffer, wal_event building,
+feedback bookkeeping) whose replication cursor is replaced by an in-process
+source: a socketpair provides the file descriptor the engines wait on and
+read_message() hands out pre-encoded pgoutput messages. Events are built but not
+written to MySQL, so the numbers isolate scheduling + decode cost.
+
+  idle: N slots with no traffic for --idle-seconds; reports CPU used and RSS.
+  busy: N slots with --transactions transactions each, drained as fast as
+        possible; reports msgs/sec per core (messages / process CPU seconds).
+
+With --processes N the busy run is repeated with the slots split across N worker
+processes (what ShardSupervisor does), to show throughput scaling across cores.
+
+Run from the repository root:
+    python -m benchmarks.bench_engines --slots 500 --transactions 200 --rows 10
+    python -m benchmarks.bench_engines --slots 500 --processes 4
+"""
+import gc
+import os
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import resource
+import threading
+import multiprocessing
+from types import SimpleNamespace
+
+# wal_listener_service reads its MySQL settings at import time.
+os.environ.setdefault("DB_PORT", "3306")
+
+from services.wal_listener.slot_stream import SlotStream
+from services.wal_listener.async_listener_service import AsyncWALListenerService
+from services.wal_listener.wal_listener_service import STREAM_POLL_INTERVAL
+from benchmarks.bench_decoder import make_workload
+
+RELATION_ID = 16384
+
+
+def make_relation(columns):
+    parts = [b'R', RELATION_ID.to_bytes(4, 'big'), b'public\x00', b'orders\x00', b'd',
+             columns.to_bytes(2, 'big')]
+    for col in range(columns):
+        parts += [b'\x00', f"col_{col}".encode() + b'\x00', (25).to_bytes(4, 'big'),
+                  (-1).to_bytes(4, 'big', signed=True)]
+    return b''.join(parts)
+
+
+class SyntheticCursor:
+    """
+    Stands in for a ReplicationCursor: fileno() is one end of a socketpair that
+    becomes readable when messages are queued; read_message() never blocks.
+    """
+
+    def __init__(self):
+        self._source, self._sink = socket.socketpair()
+        self._source.setblocking(False)
+        self._messages = []
+        self._next = 0
+        self.delivered = 0
+
+    def push(self, payloads):
+        start = self.delivered + len(self._messages) - self._next
+        self._messages.extend(
+            SimpleNamespace(payload=payload, data_start=start + i, cursor=self)
+            for i, payload in enumerate(payloads)
+        )
+        self._sink.send(b'\x00')
+
+    def read_message(self):
+        if self._next < len(self._messages):
+            msg = self._messages[self._next]
+            self._next += 1
+            self.delivered += 1
+            return msg
+        try:
+            self._source.recv(4096)
+        except BlockingIOError:
+            pass
+        self._messages, self._next = [], 0
+        return None
+
+    def send_feedback(self, **kwargs):
+        pass
+
+    def fileno(self):
+        return self._source.fileno()
+
+    def close(self):
+        self._source.close()
+        self._sink.close()
+
+
+class DiscardingWriter:
+    fenced = False
+    max_pending_rows = 1
+
+    def has_room(self):
+        return True
+
+    def stats(self):
+        return {}
+
+    def submit_transaction(self, wal_events, ack_lsn=None):
+        pass
+
+    def submit_stream(self, wal_events, ack_lsn=None, on_wait=None):
+        return sum(1 for _ in wal_events)
+
+    def stop(self):
+        pass
+
+
+def make_streams(count):
+    streams = []
+    for db_id in range(count):
+        stream = SlotStream(db_id, {}, f"slot_{db_id}", "pub")
+        stream.cursor = SyntheticCursor()
+        stream.writer = DiscardingWriter()
+        stream.connection = SimpleNamespace(closed=False, close=stream.cursor.close)
+        streams.append(stream)
+    return streams
+
+
+def thread_engine(streams, until):
+    """
+    What WALListenerService._wal_loop does for each slot.
+    """
+    def loop(stream):
+        try:
+            while True:
+                if not stream.poll():
+                    stream.wait(STREAM_POLL_INTERVAL)
+        except RuntimeError:
+            pass
+
+    threads = [threading.Thread(target=loop, args=(s,), daemon=True) for s in streams]
+    for t in threads:
+        t.start()
+    until()
+    for s in streams:
+        s.run_status["running"] = False
+    for s in streams:
+        s.cursor.push([])  # wake the thread so it notices
+    for t in threads:
+        t.join()
+
+
+def asyncio_engine(streams, until):
+    async def main():
+        engine = AsyncWALListenerService()
+        for s in streams:
+            engine.add_stream(s.db_id, s)
+        ticker = asyncio.ensure_future(engine._feedback_ticker())
+        await asyncio.get_running_loop().run_in_executor(None, until)
+        ticker.cancel()
+        for s in streams:
+            await engine.remove_stream(s.db_id)
+
+    asyncio.run(main())
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def measure(engine, streams, until):
+    gc.collect()
+    rss_before = rss_mb()
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    engine(streams, until)
+    return time.perf_counter() - started, time.process_time() - cpu_started, rss_mb() - rss_before
+
+
+def bench_idle(engine, slots, seconds):
+    streams = make_streams(slots)
+    wall, cpu, rss = measure(engine, streams, lambda: time.sleep(seconds))
+    return {"cpu_pct_of_core": 100.0 * cpu / wall, "rss_mb": rss}
+
+
+def bench_busy(engine, slots, transactions, rows, columns):
+    streams = make_streams(slots)
+    tx = make_workload(rows, columns)
+    # pgoutput sends the RELATION inside the first transaction touching the table.
+    payload = [tx[0], make_relation(columns)] + tx[1:]
+    for _ in range(transactions - 1):
+        payload.extend(tx)
+    expected = len(payload) * slots
+
+    def until():
+        while sum(s.cursor.delivered for s in streams) < expected:
+            time.sleep(0.01)
+
+    for s in streams:
+        s.cursor.push(payload)
+    wall, cpu, _ = measure(engine, streams, until)
+    return {"msgs": expected, "msgs_per_sec": expected / wall, "msgs_per_cpu_sec": expected / cpu}
+
+
+def _busy_worker(args):
+    engine, slots, transactions, rows, columns = args
+    logging.disable(logging.INFO)
+    return bench_busy(ENGINES[engine], slots, transactions, rows, columns)
+
+
+def bench_sharded(engine, processes, slots, transactions, rows, columns):
+    share = max(1, slots // processes)
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(_busy_worker, [(engine, share, transactions, rows, columns)] * processes)
+    # The workers drain concurrently, so their rates add up.
+    return {"msgs": sum(r["msgs"] for r in results),
+            "msgs_per_sec": sum(r["msgs_per_sec"] for r in results)}
+
+
+ENGINES = {"threads": thread_engine, "asyncio": asyncio_engine}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=200)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--transactions", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"slots: {args.slots}, busy load per slot: {args.transactions} tx x {args.rows} rows")
+    for name, engine in ENGINES.items():
+        idle = bench_idle(engine, args.slots, args.idle_seconds)
+        busy = bench_busy(engine, args.slots, args.transactions, args.rows, args.columns)
+        print(f"{name:8} idle: {idle['cpu_pct_of_core']:6.1f}% of a core, {idle['rss_mb']:7.1f} MB RSS   "
+              f"busy: {busy['msgs_per_sec']:10,.0f} msgs/sec, {busy['msgs_per_cpu_sec']:10,.0f} msgs/cpu-sec")
+        if args.processes > 1:
+            sharded = bench_sharded(name, args.processes, args.slots, args.transactions, args.rows, args.columns)
+            print(f"{name:8} x{args.processes} processes busy: {sharded['msgs_per_sec']:10,.0f} msgs/sec "
+                  f"({sharded['msgs_per_sec'] / busy['msgs_per_sec']:.2f}x one process)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/bench_suite.py
+"""
+Regression benchmarks of the WAL pipeline on a synthetic pgoutput workload
+(see pgoutput_workload.py), recorded as JSON.
+
+  decode:        decode_message_view() per message (latency per message; see
+                 bench_decoder for the comparison with decode_message());
+  build:         a SlotStream as in production (decode, transaction assembly,
+                 wal_event building), events discarded (latency per transaction);
+  persist:       the same with the slot's real WalEventWriter, only with --db-id
+                 (a slot whose wal_pipeline exists in the configured MySQL; use a
+                 scratch database). Latency per transaction: handed to the writer
+                 until committed to wal_events.
+
+Each benchmark reports msgs/sec (best of --repeat, without per-message timers),
+p50 / p99 / max latency from a separate timed run, and the peak memory traced by
+tracemalloc during a third run. With --baseline, the results are compared with an
+earlier JSON file and the exit status is 1 if any msgs/sec dropped or p99 grew by
+more than --max-regression percent.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite --transactions 20000 --output bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.bench_suite --transactions 20000 --tx-size 1-50 --update-ratio 0.3 --baseline bench-main.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import datetime
+import subprocess
+import tracemalloc
+from collections import deque
+from types import SimpleNamespace
+
+# wal_listener_service reads its MySQL settings at import time.
+os.environ.setdefault("DB_PORT", "3306")
+
+from services.wal_listener.postgres_decoder import decode_message_view
+from services.wal_listener.slot_stream import SlotStream
+from benchmarks import pgoutput_workload
+from benchmarks.bench_engines import DiscardingWriter
+
+COMMIT_KINDS = (ord('C'), ord('c'))
+
+
+class _NullCursor:
+    def send_feedback(self, **kwargs):
+        pass
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _stream(db_id=0, writer=None):
+    stream = SlotStream(db_id, {}, f"bench_{db_id}", "bench")
+    stream.writer = writer or DiscardingWriter()
+    return stream
+
+
+def _messages(records):
+    cursor = _NullCursor()
+    return [SimpleNamespace(payload=payload, data_start=data_start, cursor=cursor)
+            for data_start, payload in records]
+
+
+class DecodeBench:
+    unit = "message"
+
+    def __init__(self, records, decode):
+        self.payloads = [payload for _, payload in records]
+        self.decode = decode
+
+    def run(self):
+        decode = self.decode
+        for payload in self.payloads:
+            decode(payload)
+
+    def latencies(self):
+        decode = self.decode
+        clock = time.perf_counter
+        out = []
+        for payload in self.payloads:
+            started = clock()
+            decode(payload)
+            out.append(clock() - started)
+        return out
+
+
+class BuildBench:
+    unit = "transaction"
+
+    def __init__(self, records):
+        self.messages = _messages(records)
+
+    def run(self):
+        stream = _stream()
+        handle = stream.handle
+        for msg in self.messages:
+            handle(msg)
+        stream.writer.stop()
+
+    def latencies(self):
+        stream = _stream()
+        handle = stream.handle
+        clock = time.perf_counter
+        out = []
+        elapsed = 0.0
+        for msg in self.messages:
+            started = clock()
+            handle(msg)
+            elapsed += clock() - started
+            if msg.payload[0] in COMMIT_KINDS:
+                out.append(elapsed)
+                elapsed = 0.0
+        return out
+
+
+class _TimedWriter:
+    """
+    Wraps a WalEventWriter to time each transaction from submission to on_flush.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.submitted = deque()
+        self.latencies = []
+        writer.on_flush = self.flushed
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+    def submit_transaction(self, wal_events, ack_lsn=None):
+        self.submitted.append((ack_lsn, time.perf_counter()))
+        self.writer.submit_transaction(wal_events, ack_lsn=ack_lsn)
+
+    def submit_stream(self, wal_events, ack_lsn=None, on_wait=None):
+        self.submitted.append((ack_lsn, time.perf_counter()))
+        return self.writer.submit_stream(wal_events, ack_lsn=ack_lsn, on_wait=on_wait)
+
+    def flushed(self, lsn):
+        now = time.perf_counter()
+        while self.submitted and self.submitted[0][0] <= lsn:
+            self.latencies.append(now - self.submitted.popleft()[1])
+
+
+class PersistBench:
+    unit = "transaction"
+
+    def __init__(self, records, db_id):
+        self.messages = _messages(records)
+        self.db_id = db_id
+
+    def _replay(self):
+        from services.wal_listener.wal_event_writer import WalEventWriter
+        writer = _TimedWriter(WalEventWriter(self.db_id, f"bench_{self.db_id}"))
+        if not writer.start():
+            raise SystemExit(f"db_id={self.db_id} has no wal_pipeline in the configured MySQL")
+        stream = _stream(self.db_id, writer)
+        handle = stream.handle
+        for msg in self.messages:
+            while not writer.has_room():
+                writer.wait_for_room(writer.max_pending_rows - 1, 1.0)
+            handle(msg)
+        writer.stop()
+        return writer.latencies
+
+    def run(self):
+        self._replay()
+
+    def latencies(self):
+        return self._replay()
+
+
+def measure(bench, messages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        bench.run()
+        best = min(best, time.perf_counter() - started)
+    latencies = sorted(bench.latencies())
+    tracemalloc.start()
+    try:
+        bench.run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": round(best, 6),
+        "msgs_per_sec": round(messages / best, 1),
+        "latency_unit": bench.unit,
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 3) if latencies else None,
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 3) if latencies else None,
+        "max_us": round(latencies[-1] * 1e6, 3) if latencies else None,
+        "peak_mb": round(peak / 1048576, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print the change against `baseline` per benchmark; returns the regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        throughput = (result["msgs_per_sec"] / before["msgs_per_sec"] - 1) * 100
+        line = f"{name:14} msgs/sec {throughput:+7.1f}%"
+        if throughput < -max_regression:
+            regressions.append(f"{name} msgs/sec {throughput:+.1f}%")
+        if result.get("p99_us") and before.get("p99_us"):
+            p99 = (result["p99_us"] / before["p99_us"] - 1) * 100
+            line += f"   p99 {p99:+7.1f}%"
+            if p99 > max_regression:
+                regressions.append(f"{name} p99 {p99:+.1f}%")
+        if before.get("peak_mb"):
+            line += f"   peak memory {(result['peak_mb'] / before['peak_mb'] - 1) * 100:+7.1f}%"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    pgoutput_workload.add_arguments(parser)
+    parser.add_argument("--benchmarks", default="decode,build,persist")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db-id", type=int, help="slot whose wal_pipeline receives the events (persist)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    records = list(pgoutput_workload.from_arguments(args).records(args.transactions))
+    messages = len(records)
+    benches = {
+        "decode": lambda: DecodeBench(records, decode_message_view),
+        "build": lambda: BuildBench(records),
+        "persist": lambda: PersistBench(records, args.db_id),
+    }
+    names = [name.strip() for name in args.benchmarks.split(",") if name.strip()]
+    unknown = [name for name in names if name not in benches]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    print(f"{messages:,} messages ({sum(len(payload) for _, payload in records) / 1048576:.1f} MB), "
+          f"{args.transactions:,} transactions")
+    results = {}
+    for name in names:
+        if name == "persist" and args.db_id is None:
+            print(f"{name:14} skipped (needs --db-id and MySQL)")
+            continue
+        result = results[name] = measure(benches[name](), messages, 1 if name == "persist" else args.repeat)
+        print(f"{name:14} {result['msgs_per_sec']:12,.0f} msgs/sec   p50 {result['p50_us']:9.1f} us   "
+              f"p99 {result['p99_us']:9.1f} us per {result['latency_unit']}   peak {result['peak_mb']:7.1f} MB")
+
+    report = {
+        "revision": git_revision(),
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workload": {**pgoutput_workload.describe(args), "messages": messages},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("workload") != report["workload"]:
+            print("⚠️ baseline was recorded with a different workload")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"regressions over {args.max_regression:g}%: {'; '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/bench_type_conversion.py
+"""
+Per-row cost of type-aware column decoding.
+
+Compares building a record from text values (what we stored before) with building
+it through the relation's compiled converter table, for a typical mixed-type
+"orders" row.
+
+Run from the repository root:
+    python -m benchmarks.bench_type_conversion --rows 200000
+"""
+import time
+import argparse
+
+from services.wal_listener import type_converters as tc
+from services.wal_listener.wal_event_builder import build_record, cache_relation
+
+COLUMNS = [
+    ("id", tc.INT8OID, "918273"),
+    ("customer_name", 25, "Jane Smith"),
+    ("total_amount", tc.NUMERICOID, "123.45"),
+    ("status", 1043, "Processing"),
+    ("is_paid", tc.BOOLOID, "t"),
+    ("quantity", tc.INT4OID, "3"),
+    ("weight", tc.FLOAT8OID, "1.25"),
+    ("metadata", tc.JSONBOID, '{"channel": "web", "coupon": null}'),
+    ("created_at", tc.TIMESTAMPTZOID, "2025-02-03 00:04:19.210417+00"),
+    ("ship_date", tc.DATEOID, "2025-02-05"),
+]
+
+
+def relation():
+    return {
+        "type": "relation",
+        "relation_id": 16384,
+        "relation_name": "orders",
+        "columns": [name for name, _, _ in COLUMNS],
+        "columns_meta": [{"name": name, "type_oid": oid, "type_mod": -1} for name, oid, _ in COLUMNS],
+    }
+
+
+def per_row_us(relation_msg, change_msg, rows):
+    started = time.perf_counter()
+    for _ in range(rows):
+        build_record(change_msg, relation_msg)
+    return (time.perf_counter() - started) / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    change_msg = {"type": "insert", "relation_id": 16384, "tuple": [value for _, _, value in COLUMNS]}
+
+    text_relation = relation()  # no converter table: values stay text
+    typed_relation = relation()
+    cache_relation({}, typed_relation)
+
+    text_us = per_row_us(text_relation, change_msg, args.rows)
+    typed_us = per_row_us(typed_relation, change_msg, args.rows)
+    print(f"columns per row:   {len(COLUMNS)}")
+    print(f"text record:       {text_us:8.2f} us/row")
+    print(f"typed record:      {typed_us:8.2f} us/row")
+    print(f"conversion cost:   {typed_us - text_us:8.2f} us/row")
+    print(f"sample:            {build_record(change_msg, typed_relation)}")
+
+
+if __name__ == "__main__":
+    main()
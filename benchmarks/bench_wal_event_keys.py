@@ -0,0 +1,181 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/bench_wal_event_keys.py
+"""
+Insert throughput and on-disk size of wal_events with the old and the new
+primary key (revisions f3c5a8e1d2b7 / 0a6d9b4e7c31):
+
+  text:   VARCHAR(36) random UUID4 plus the redundant UNIQUE(id), as before;
+  binary: BINARY(16) time-ordered UUIDv7 (resources/wal_events/ids.py).
+
+Both tables carry the natural key and the two list indexes, in a scratch
+MySQL/MariaDB database (dropped and recreated on every run, without the foreign
+key). --rows events are inserted into each in --batch-size multi-row INSERTs, as
+the WalEventWriter does; rows/sec is printed per --report-every rows, since a
+difference is only expected once the table outgrows the buffer pool (a small
+innodb_buffer_pool_size gets there sooner). Afterwards the size of every index
+is read from mysql.innodb_index_stats.
+
+    docker compose --profile local-db up -d smartcdc_mariadb
+    python -m benchmarks.bench_wal_event_keys --port 3307 --password smartcdc --rows 5000000
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import datetime
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+from resources.wal_events.ids import uuid7
+
+BASE_TIME = datetime.datetime(2025, 1, 1)
+
+DDL = """
+CREATE TABLE {table} (
+  id {id_type} NOT NULL PRIMARY KEY,
+  wal_pipeline_id VARCHAR(36) NOT NULL,
+  commit_lsn BIGINT NOT NULL,
+  seq BIGINT NOT NULL,
+  record_pks JSON NOT NULL,
+  record JSON NOT NULL,
+  data JSON NULL,
+  changes JSON NULL,
+  action ENUM('insert', 'update', 'delete') NOT NULL,
+  committed_at DATETIME NOT NULL,
+  source_table_oid INT NOT NULL,
+  source_table_schema VARCHAR(255) NOT NULL,
+  source_table_name VARCHAR(255) NOT NULL,
+  inserted_at DATETIME NOT NULL,
+  {extra}UNIQUE KEY uq_wal_events_pipeline_commit_seq (wal_pipeline_id, commit_lsn, seq),
+  KEY ix_wal_events_pipeline_committed (wal_pipeline_id, committed_at, seq, id),
+  KEY ix_wal_events_pipeline_table_action_committed
+    (wal_pipeline_id, source_table_name, action, committed_at, seq, id)
+)
+"""
+
+LAYOUTS = {
+    "text": {"id_type": "VARCHAR(36)", "extra": "UNIQUE KEY id (id),\n  ",
+             "new_id": lambda: str(uuid.uuid4())},
+    "binary": {"id_type": "BINARY(16)", "extra": "",
+               "new_id": lambda: uuid.UUID(uuid7()).bytes},
+}
+
+
+def rows(count, pipelines, new_id, seed=0):
+    """
+    Events of 1-10 change transactions on random pipelines, as the writer sends them.
+    """
+    rng = random.Random(seed)
+    pipeline_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(pipelines)]
+    lsn = 0x16B3748
+    committed_at = BASE_TIME
+    written = 0
+    while written < count:
+        pipeline_id = rng.choice(pipeline_ids)
+        committed_at += datetime.timedelta(milliseconds=rng.randrange(1, 50))
+        lsn += 4096
+        for seq in range(min(rng.randint(1, 10), count - written)):
+            row_id = rng.getrandbits(40)
+            table = rng.randrange(20)
+            yield (new_id(), pipeline_id, lsn, seq, json.dumps({"id": row_id}),
+                   json.dumps({"id": row_id, "amount": rng.randrange(100000), "note": "x" * rng.randrange(8, 64)}),
+                   rng.choice(("insert", "insert", "update")), committed_at, 16384 + table, "public",
+                   f"table_{table:02d}", datetime.datetime.utcnow())
+            written += 1
+
+
+def load(conn, table, layout, count, pipelines, batch_size, report_every):
+    sql = (f"INSERT INTO {table} (id, wal_pipeline_id, commit_lsn, seq, record_pks, record, action, "
+           "committed_at, source_table_oid, source_table_schema, source_table_name, inserted_at) "
+           "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    started = window_start = time.monotonic()
+    written = window_rows = 0
+    batch = []
+
+    def flush():
+        with conn.cursor() as cur:
+            cur.executemany(sql, batch)
+        conn.commit()
+        batch.clear()
+
+    for row in rows(count, pipelines, LAYOUTS[layout]["new_id"]):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            written += len(batch)
+            window_rows += len(batch)
+            flush()
+            if window_rows >= report_every:
+                now = time.monotonic()
+                print(f"  {layout:6} {written:>12,} rows  {window_rows / (now - window_start):10,.0f} rows/sec")
+                window_start, window_rows = now, 0
+    if batch:
+        written += len(batch)
+        flush()
+    return written / (time.monotonic() - started)
+
+
+def sizes(conn, table):
+    """
+    { index name -> bytes } for `table`, PRIMARY being the clustered index (the rows).
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"ANALYZE TABLE {table}")
+        cur.fetchall()
+        cur.execute("SELECT index_name, stat_value * @@innodb_page_size AS size FROM mysql.innodb_index_stats "
+                    "WHERE database_name = DATABASE() AND table_name = %s AND stat_name = 'size'", (table,))
+        return {row["index_name"]: int(row["size"]) for row in cur.fetchall()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3307)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="smartcdc_scratch")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--pipelines", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--report-every", type=int, default=500_000)
+    parser.add_argument("--layouts", default="text,binary")
+    args = parser.parse_args()
+
+    layouts = [name.strip() for name in args.layouts.split(",") if name.strip()]
+    unknown = [name for name in layouts if name not in LAYOUTS]
+    if unknown:
+        parser.error(f"unknown layouts: {', '.join(unknown)}")
+
+    conn = pymysql.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                           database=args.database, cursorclass=DictCursor)
+    results = {}
+    try:
+        for layout in layouts:
+            table = f"wal_events_keys_{layout}"
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+                cur.execute(DDL.format(table=table, id_type=LAYOUTS[layout]["id_type"],
+                                       extra=LAYOUTS[layout]["extra"]))
+            print(f"{layout}: inserting {args.rows:,} rows in batches of {args.batch_size:,}")
+            rate = load(conn, table, layout, args.rows, args.pipelines, args.batch_size, args.report_every)
+            results[layout] = (rate, sizes(conn, table))
+    finally:
+        conn.close()
+
+    print()
+    for layout, (rate, index_sizes) in results.items():
+        print(f"{layout:6} {rate:10,.0f} rows/sec overall, {sum(index_sizes.values()) / 1048576:9.1f} MB in total")
+        for name, size in sorted(index_sizes.items(), key=lambda item: item[0] != "PRIMARY"):
+            print(f"         {name:48} {size / 1048576:9.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/bench_wal_event_queries.py
+"""
+Latency of the GET /api/wal-events queries on a large wal_events table, with and
+without the composite indexes of revision e5b8c2d6a914 and for both shapes of
+the ownership check (the old JOIN + correlated EXISTS of `wal_pipeline.has()`
+and the plain join on postgres_replication_slots.user_id).
+
+Works on its own wal_events / postgres_replication_slots tables (the columns the
+API reads, without foreign keys) in a scratch MySQL/MariaDB database. They are
+created and seeded with --rows events on the first run (10M take a while; later
+runs reuse them unless --reseed), spread over --pipelines slots of --users users,
+--tables source tables and 70% insert / 25% update / 5% delete, in commit order.
+Every query is the SQL list_wal_events sends for one page of 100, run --repeat
+times; the table prints p50 / p99 latency and what EXPLAIN says MySQL does with
+wal_events. --without-indexes drops the two indexes first (the plan before the
+migration), otherwise they are created if missing, timing the build.
+
+    docker compose --profile local-db up -d smartcdc_mariadb
+    python -m benchmarks.bench_wal_event_queries --port 3307 --password smartcdc --rows 10000000
+    python -m benchmarks.bench_wal_event_queries --port 3307 --password smartcdc --without-indexes
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import datetime
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+from resources.wal_events.ids import uuid7
+
+PAGE = 100
+BASE_TIME = datetime.datetime(2025, 1, 1)
+ACTIONS = (("insert", 0.70), ("update", 0.25), ("delete", 0.05))
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS postgres_replication_slots (
+      id VARCHAR(36) NOT NULL PRIMARY KEY,
+      slot_name VARCHAR(255) NOT NULL,
+      user_id VARCHAR(36) NOT NULL,
+      KEY user_id (user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS wal_events (
+      id BINARY(16) NOT NULL PRIMARY KEY,
+      wal_pipeline_id VARCHAR(36) NOT NULL,
+      commit_lsn BIGINT NOT NULL,
+      seq BIGINT NOT NULL,
+      record_pks JSON NOT NULL,
+      record JSON NOT NULL,
+      data JSON NULL,
+      changes JSON NULL,
+      action ENUM('insert', 'update', 'delete') NOT NULL,
+      committed_at DATETIME NOT NULL,
+      source_table_oid INT NOT NULL,
+      source_table_schema VARCHAR(255) NOT NULL,
+      source_table_name VARCHAR(255) NOT NULL,
+      inserted_at DATETIME NOT NULL,
+      UNIQUE KEY uq_wal_events_pipeline_commit_seq (wal_pipeline_id, commit_lsn, seq)
+    )
+    """,
+]
+
+INDEXES = {
+    "ix_wal_events_pipeline_committed":
+        "(wal_pipeline_id, committed_at, seq, id)",
+    "ix_wal_events_pipeline_table_action_committed":
+        "(wal_pipeline_id, source_table_name, action, committed_at, seq, id)",
+}
+
+SELECT = (
+    "SELECT wal_events.* FROM wal_events "
+    "JOIN postgres_replication_slots ON postgres_replication_slots.id = wal_events.wal_pipeline_id "
+)
+OWNERSHIP = {
+    "exists": ("EXISTS (SELECT 1 FROM postgres_replication_slots AS owner "
+               "WHERE owner.id = wal_events.wal_pipeline_id AND owner.user_id = %s)"),
+    "join": "postgres_replication_slots.user_id = %s",
+}
+AFTER = ("(wal_events.committed_at > %s OR (wal_events.committed_at = %s AND "
+         "(wal_events.seq > %s OR (wal_events.seq = %s AND wal_events.id > %s))))")
+ORDER = " ORDER BY wal_events.committed_at, wal_events.seq, wal_events.id LIMIT %s"
+
+
+def seed(conn, rows, pipelines, users, tables, batch=5000, seed_value=0):
+    rng = random.Random(seed_value)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(users)]
+    slots = [(str(uuid.UUID(int=rng.getrandbits(128), version=4)), f"slot_{i}", user_ids[i % users])
+             for i in range(pipelines)]
+    table_names = [f"table_{i:02d}" for i in range(tables)]
+    actions, weights = zip(*ACTIONS)
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE TABLE wal_events")
+        cur.execute("TRUNCATE TABLE postgres_replication_slots")
+        cur.executemany("INSERT INTO postgres_replication_slots (id, slot_name, user_id) VALUES (%s, %s, %s)", slots)
+    conn.commit()
+
+    # One transaction of 1-10 changes at a time, on a random pipeline, 1-3 seconds
+    # after the previous one; its changes share committed_at, like real events.
+    sql = ("INSERT INTO wal_events (id, wal_pipeline_id, commit_lsn, seq, record_pks, record, action, "
+           "committed_at, source_table_oid, source_table_schema, source_table_name, inserted_at) "
+           "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    started = time.monotonic()
+    pending = []
+    lsn = 0x16B3748
+    written = 0
+    report_at = 1_000_000
+    committed_at = BASE_TIME
+    while written < rows:
+        pipeline_id = rng.choice(slots)[0]
+        committed_at += datetime.timedelta(seconds=rng.randrange(1, 4))
+        lsn += 4096
+        for seq in range(min(rng.randint(1, 10), rows - written)):
+            row_id = rng.getrandbits(40)
+            table = rng.randrange(tables)
+            pending.append((
+                uuid.UUID(uuid7(int(committed_at.timestamp() * 1000))).bytes, pipeline_id, lsn, seq,
+                json.dumps({"id": row_id}), json.dumps({"id": row_id, "amount": rng.randrange(100000),
+                                                        "note": "x" * rng.randrange(8, 64)}),
+                rng.choices(actions, weights)[0], committed_at, 16384 + table, "public", table_names[table],
+                committed_at,
+            ))
+            written += 1
+        if len(pending) >= batch:
+            with conn.cursor() as cur:
+                cur.executemany(sql, pending)
+            conn.commit()
+            pending = []
+            if written >= report_at:
+                report_at += 1_000_000
+                print(f"  {written:,} / {rows:,} rows ({written / (time.monotonic() - started):,.0f} rows/sec)")
+    if pending:
+        with conn.cursor() as cur:
+            cur.executemany(sql, pending)
+        conn.commit()
+    print(f"seeded {rows:,} events in {time.monotonic() - started:.0f}s")
+
+
+def set_indexes(conn, enabled):
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT index_name AS name FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = 'wal_events'")
+        present = {row["name"] for row in cur.fetchall()}
+        for name, columns in INDEXES.items():
+            if enabled and name not in present:
+                started = time.monotonic()
+                cur.execute(f"CREATE INDEX {name} ON wal_events {columns}")
+                print(f"created {name} in {time.monotonic() - started:.1f}s")
+            elif not enabled and name in present:
+                cur.execute(f"DROP INDEX {name} ON wal_events")
+                print(f"dropped {name}")
+
+
+def scenarios(conn):
+    """
+    The busiest pipeline's user and, per filter combination list_wal_events
+    accepts, (name, [(WHERE clause, arg)], cursor or None).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT wal_pipeline_id, COUNT(*) AS n FROM wal_events "
+                    "GROUP BY wal_pipeline_id ORDER BY n DESC LIMIT 1")
+        pipeline_id = cur.fetchone()["wal_pipeline_id"]
+        cur.execute("SELECT user_id FROM postgres_replication_slots WHERE id = %s", (pipeline_id,))
+        user_id = cur.fetchone()["user_id"]
+        cur.execute("SELECT MIN(committed_at) AS first, MAX(committed_at) AS last FROM wal_events")
+        span = cur.fetchone()
+    middle = (span["first"] + (span["last"] - span["first"]) / 2, 0, b"")
+    pipeline = ("wal_events.wal_pipeline_id = %s", pipeline_id)
+    table = ("wal_events.source_table_name = %s", "table_03")
+    action = ("wal_events.action = %s", "delete")
+    cases = [
+        ("user, first page", [], None),
+        ("user, middle page", [], middle),
+        ("pipeline, first page", [pipeline], None),
+        ("pipeline, middle page", [pipeline], middle),
+        ("pipeline + table", [pipeline, table], middle),
+        ("pipeline + action", [pipeline, action], middle),
+        ("pipeline + table + action", [pipeline, table, action], middle),
+        ("user + table + action", [table, action], middle),
+    ]
+    return user_id, cases
+
+
+def build(ownership, user_id, filters, after):
+    clauses = [OWNERSHIP[ownership]] + [clause for clause, _ in filters]
+    args = [user_id] + [value for _, value in filters]
+    if after is not None:
+        committed_at, seq, event_id = after
+        clauses.append(AFTER)
+        args += [committed_at, committed_at, seq, seq, event_id]
+    return SELECT + "WHERE " + " AND ".join(clauses) + ORDER, args + [PAGE + 1]
+
+
+def plan(conn, sql, args):
+    """
+    key / rows / Extra of the wal_events line of EXPLAIN.
+    """
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN " + sql, args)
+        for row in cur.fetchall():
+            if row["table"] == "wal_events":
+                return f"{row['type']} {row['key'] or '-'} rows={row['rows']} {row['Extra'] or ''}".strip()
+    return "?"
+
+
+def timed(conn, sql, args, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(sql, args)
+            cur.fetchall()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3307)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="smartcdc_scratch")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--pipelines", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tables", type=int, default=20, help="distinct source_table_name values")
+    parser.add_argument("--reseed", action="store_true", help="seed again even if wal_events has --rows rows")
+    parser.add_argument("--without-indexes", action="store_true", help="drop the composite indexes first")
+    parser.add_argument("--ownership", default="exists,join", help="ownership checks to compare")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = pymysql.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                           database=args.database, cursorclass=DictCursor)
+    try:
+        with conn.cursor() as cur:
+            for ddl in TABLES:
+                cur.execute(ddl)
+            cur.execute("SELECT COUNT(*) AS n FROM wal_events")
+            count = cur.fetchone()["n"]
+        if args.reseed or count != args.rows:
+            # Faster without the secondary indexes; they are built afterwards.
+            set_indexes(conn, False)
+            seed(conn, args.rows, args.pipelines, args.users, args.tables)
+        set_indexes(conn, not args.without_indexes)
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE TABLE wal_events, postgres_replication_slots")
+            cur.fetchall()
+
+        user_id, cases = scenarios(conn)
+        print(f"{args.rows:,} events, {'without' if args.without_indexes else 'with'} composite indexes, "
+              f"page of {PAGE}, {args.repeat} runs each")
+        for ownership in [name.strip() for name in args.ownership.split(",") if name.strip()]:
+            if ownership not in OWNERSHIP:
+                parser.error(f"unknown ownership check {ownership!r}")
+            print(f"\nownership: {ownership}")
+            for name, filters, after in cases:
+                sql, query_args = build(ownership, user_id, filters, after)
+                p50, p99 = timed(conn, sql, query_args, args.repeat)
+                print(f"  {name:27} p50 {p50 * 1000:9.2f} ms  p99 {p99 * 1000:9.2f} ms  "
+                      f"{plan(conn, sql, query_args)}")
+                conn.commit()
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
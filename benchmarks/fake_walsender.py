@@ -0,0 +1,639 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/fake_walsender.py
+"""
+A local stand-in for a Postgres walsender, for end-to-end load tests of the WAL
+listener without a source database.
+
+It speaks enough of the frontend/backend protocol (v3) for psycopg2's
+LogicalReplicationConnection: trust authentication, the simple queries
+SlotStream.open() issues (pg_backend_pid(), pg_replication_slots.active_pid,
+pg_terminate_backend()), IDENTIFY_SYSTEM and START_REPLICATION ... LOGICAL,
+after which it streams XLogData from captured segments (WAL_CAPTURE_DIR, see
+wal_capture.py) or a synthetic pgoutput_workload, at --rate messages/sec, with
+keepalives. Standby status updates are recorded per slot: like a real slot, a
+reconnect resumes after the highest flush position confirmed (or the client's
+start LSN, if further), skipping whole transactions, and RELATIONs are re-sent
+before a table's first change in every session. A client that sends no status
+update for --sender-timeout is disconnected, as with wal_sender_timeout.
+--disconnect-after N drops every connection after N messages, to exercise
+reconnects.
+
+  serve: listen on --port until interrupted; point a slot's connection details
+         (host 127.0.0.1, any user/password/dbname) at it and run the listener.
+  drive: also run --slots WALListenerService._wal_loop threads against it in
+         this process, with writers that acknowledge every transaction at once
+         instead of MySQL, and report throughput, reconnects and the feedback
+         cadence the server observed.
+
+Run from the repository root:
+    python -m benchmarks.fake_walsender serve --port 5433 --transactions 100000 --rate 20000
+    python -m benchmarks.fake_walsender drive --slots 20 --transactions 2000 --disconnect-after 5000
+    python -m benchmarks.fake_walsender drive --segments /var/tmp/wal-capture/ --slots 1
+"""
+import os
+import re
+import time
+import errno
+import select
+import socket
+import struct
+import logging
+import argparse
+import threading
+import socketserver
+
+# wal_listener_service reads its MySQL settings at import time.
+os.environ.setdefault("DB_PORT", "3306")
+
+from services.wal_listener.wal_capture import segment_paths, iter_records
+from benchmarks import pgoutput_workload
+
+logger = logging.getLogger(__name__)
+
+PG_EPOCH_OFFSET = 946684800
+SSL_REQUEST = 80877103
+GSSENC_REQUEST = 80877104
+CANCEL_REQUEST = 80877102
+PROTOCOL_3 = 196608
+SEND_CHUNK = 65536
+
+_INT32 = struct.Struct('!i')
+_HEADER = struct.Struct('!ci')
+_XLOG = struct.Struct('!cQQq')
+_KEEPALIVE = struct.Struct('!cQqB')
+_STATUS = struct.Struct('!QQQqB')
+
+_START_REPLICATION = re.compile(
+    r'START_REPLICATION\s+SLOT\s+"?([^"\s]+)"?\s+LOGICAL\s+([0-9A-Fa-f]+)/([0-9A-Fa-f]+)(?:\s*\((.*)\))?',
+    re.IGNORECASE | re.DOTALL)
+_ACTIVE_PID = re.compile(r"FROM\s+pg_replication_slots\s+WHERE\s+slot_name\s*=\s*'([^']*)'", re.IGNORECASE)
+_TERMINATE = re.compile(r"pg_terminate_backend\s*\(\s*(\d+)\s*\)", re.IGNORECASE)
+
+
+def _now_pg():
+    return int((time.time() - PG_EPOCH_OFFSET) * 1000000)
+
+
+def _message(kind, body=b''):
+    return _HEADER.pack(kind, len(body) + 4) + body
+
+
+class WalSource:
+    """
+    The stream every slot replays: transactions as (end_lsn, [(data_start, payload)]),
+    plus the latest RELATION of every table for re-sending after a skip.
+    """
+
+    def __init__(self, records):
+        self.transactions = []
+        self.relations = {}
+        current = []
+        for data_start, payload in records:
+            current.append((data_start, payload))
+            kind = payload[0]
+            if kind == 0x52:  # 'R'
+                self.relations.setdefault(_INT32.unpack_from(payload, 1)[0], payload)
+            elif kind in (0x43, 0x63):  # 'C' commit, 'c' stream commit
+                end_lsn = struct.unpack_from('!Q', payload, 10 if kind == 0x43 else 14)[0]
+                self.transactions.append((end_lsn, current))
+                current = []
+        if current:
+            self.transactions.append((current[-1][0], current))
+        self.end_lsn = self.transactions[-1][0] if self.transactions else 0
+        self.messages = sum(len(messages) for _, messages in self.transactions)
+
+
+class SlotState:
+    """
+    What the server remembers of a slot across connections.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.confirmed_flush = 0
+        self.active_pid = None
+        self.connections = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.status_updates = 0
+        self.replies_requested = 0
+        self.timeouts = 0
+        self.feedback_gaps = []   # seconds between status updates
+        self.last_status_at = None
+
+    def stats(self):
+        gaps = sorted(self.feedback_gaps)
+        return {
+            "slot": self.name,
+            "connections": self.connections,
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "confirmed_flush": self.confirmed_flush,
+            "status_updates": self.status_updates,
+            "replies_requested": self.replies_requested,
+            "timeouts": self.timeouts,
+            "feedback_gap_p50": gaps[len(gaps) // 2] if gaps else None,
+            "feedback_gap_max": gaps[-1] if gaps else None,
+        }
+
+
+class FakeWalSender(socketserver.ThreadingTCPServer):
+    """
+    Usage:
+        server = FakeWalSender(("127.0.0.1", 0), WalSource(records), rate=10000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        ...   # connect to server.server_address
+        server.slot_stats()
+        server.shutdown()
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, source, rate=0.0, keepalive_interval=1.0, sender_timeout=60.0,
+                 disconnect_after=0, server_version="16.0"):
+        super().__init__(address, _Session)
+        self.source = source
+        self.rate = rate
+        self.keepalive_interval = keepalive_interval
+        self.sender_timeout = sender_timeout
+        self.disconnect_after = disconnect_after
+        self.server_version = server_version
+        self.system_id = str(7300000000000000000 + os.getpid())
+        self.slots = {}
+        self.terminated = set()
+        self.lock = threading.Lock()
+        self._next_pid = 40000
+
+    def slot(self, name) -> SlotState:
+        with self.lock:
+            state = self.slots.get(name)
+            if state is None:
+                state = self.slots[name] = SlotState(name)
+            return state
+
+    def new_pid(self):
+        with self.lock:
+            self._next_pid += 1
+            return self._next_pid
+
+    def slot_stats(self):
+        with self.lock:
+            return [state.stats() for state in self.slots.values()]
+
+
+class _Disconnect(Exception):
+    pass
+
+
+class _Session(socketserver.BaseRequestHandler):
+    """
+    One client connection.
+    """
+
+    def setup(self):
+        self.sock = self.request
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.pid = self.server.new_pid()
+        self.inbox = b''
+
+    def handle(self):
+        try:
+            if not self.startup():
+                return
+            while True:
+                kind, body = self.read_message()
+                if kind == b'X':
+                    return
+                if kind == b'Q':
+                    self.query(body.rstrip(b'\x00').decode('utf-8', 'replace').strip().rstrip(';').strip())
+                else:
+                    self.error("08P01", f"unexpected message {kind!r}")
+                    self.ready()
+        except (_Disconnect, ConnectionError, OSError):
+            pass
+        finally:
+            with self.server.lock:
+                for state in self.server.slots.values():
+                    if state.active_pid == self.pid:
+                        state.active_pid = None
+                self.server.terminated.discard(self.pid)
+
+    # -- protocol plumbing --------------------------------------------------
+
+    def recv_exact(self, size):
+        while len(self.inbox) < size:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise _Disconnect()
+            self.inbox += chunk
+        data, self.inbox = self.inbox[:size], self.inbox[size:]
+        return data
+
+    def read_message(self):
+        kind, length = _HEADER.unpack(self.recv_exact(5))
+        return kind, self.recv_exact(length - 4)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def ready(self):
+        self.send(_message(b'Z', b'I'))
+
+    def error(self, code, text, severity="ERROR"):
+        fields = b''.join(tag + value.encode() + b'\x00' for tag, value in (
+            (b'S', severity), (b'V', severity), (b'C', code), (b'M', text)))
+        self.send(_message(b'E', fields + b'\x00'))
+
+    def rows(self, columns, rows, tag):
+        """
+        columns: [(name, type oid)]; rows: lists of text values (None for NULL).
+        """
+        description = [struct.pack('!h', len(columns))]
+        for name, oid in columns:
+            description.append(name.encode() + b'\x00' + struct.pack('!ihihih', 0, 0, oid, -1, -1, 0))
+        out = [_message(b'T', b''.join(description))]
+        for row in rows:
+            fields = [struct.pack('!h', len(row))]
+            for value in row:
+                if value is None:
+                    fields.append(_INT32.pack(-1))
+                else:
+                    encoded = str(value).encode()
+                    fields.append(_INT32.pack(len(encoded)) + encoded)
+            out.append(_message(b'D', b''.join(fields)))
+        out.append(_message(b'C', tag.encode() + b'\x00'))
+        self.send(b''.join(out))
+        self.ready()
+
+    def startup(self):
+        while True:
+            length, code = struct.unpack('!ii', self.recv_exact(8))
+            body = self.recv_exact(length - 8)
+            if code in (SSL_REQUEST, GSSENC_REQUEST):
+                self.send(b'N')
+                continue
+            if code == CANCEL_REQUEST:
+                return False
+            if code != PROTOCOL_3:
+                self.error("08P01", f"unsupported frontend protocol {code >> 16}.{code & 0xFFFF}", "FATAL")
+                return False
+            break
+        parts = body.split(b'\x00')
+        params = dict(zip(parts[0::2], parts[1::2]))
+        self.user = params.get(b'user', b'postgres').decode()
+        self.database = params.get(b'database', self.user.encode()).decode()
+        out = [_message(b'R', _INT32.pack(0))]
+        for name, value in (("server_version", self.server.server_version), ("server_encoding", "UTF8"),
+                            ("client_encoding", "UTF8"), ("DateStyle", "ISO, MDY"),
+                            ("integer_datetimes", "on"), ("standard_conforming_strings", "on"),
+                            ("TimeZone", "UTC"), ("is_superuser", "on"), ("session_authorization", self.user)):
+            out.append(_message(b'S', name.encode() + b'\x00' + value.encode() + b'\x00'))
+        out.append(_message(b'K', struct.pack('!ii', self.pid, self.pid * 7919)))
+        self.send(b''.join(out))
+        self.ready()
+        return True
+
+    # -- queries ------------------------------------------------------------
+
+    def query(self, sql):
+        upper = sql.upper()
+        if not sql:
+            self.send(_message(b'I'))
+            self.ready()
+        elif upper.startswith("START_REPLICATION"):
+            match = _START_REPLICATION.match(sql)
+            if not match:
+                self.error("42601", "only START_REPLICATION SLOT ... LOGICAL is supported")
+                self.ready()
+                return
+            slot, high, low = match.group(1), int(match.group(2), 16), int(match.group(3), 16)
+            self.replicate(slot, (high << 32) | low)
+        elif upper.startswith("IDENTIFY_SYSTEM"):
+            source = self.server.source
+            self.rows([("systemid", 25), ("timeline", 23), ("xlogpos", 25), ("dbname", 25)],
+                      [[self.server.system_id, 1, f"{source.end_lsn >> 32:X}/{source.end_lsn & 0xFFFFFFFF:X}",
+                        self.database]], "IDENTIFY_SYSTEM")
+        elif "PG_BACKEND_PID()" in upper:
+            self.rows([("pg_backend_pid", 23)], [[self.pid]], "SELECT 1")
+        elif _ACTIVE_PID.search(sql):
+            state = self.server.slot(_ACTIVE_PID.search(sql).group(1))
+            self.rows([("active_pid", 23)], [[state.active_pid]], "SELECT 1")
+        elif _TERMINATE.search(sql):
+            pid = int(_TERMINATE.search(sql).group(1))
+            with self.server.lock:
+                known = any(state.active_pid == pid for state in self.server.slots.values())
+                if known:
+                    self.server.terminated.add(pid)
+            self.rows([("pg_terminate_backend", 16)], [["t" if known else "f"]], "SELECT 1")
+        elif upper.startswith("SET "):
+            self.send(_message(b'C', b'SET\x00'))
+            self.ready()
+        else:
+            self.error("0A000", "not supported by the fake walsender")
+            self.ready()
+
+    # -- streaming ----------------------------------------------------------
+
+    def replicate(self, slot_name, start_lsn):
+        server = self.server
+        state = server.slot(slot_name)
+        with server.lock:
+            if state.active_pid is not None:
+                active = state.active_pid
+            else:
+                active = None
+                state.active_pid = self.pid
+                state.connections += 1
+        if active is not None:
+            self.error("55006", f'replication slot "{slot_name}" is active for PID {active}')
+            self.ready()
+            return
+        start = max(start_lsn, state.confirmed_flush)
+        logger.info("ℹ️ %s: START_REPLICATION from %X/%X (pid %s)", slot_name, start >> 32, start & 0xFFFFFFFF,
+                    self.pid)
+        self.send(_message(b'W', struct.pack('!bh', 0, 0)))
+        self.sock.setblocking(False)
+        self.state = state
+        self.status_at = time.monotonic()
+        self.reply_requested_at = None
+        self.out = bytearray()
+        try:
+            self.stream_from(start)
+            while True:
+                self.idle()
+        finally:
+            self.sock.setblocking(True)
+
+    def stream_from(self, start):
+        server = self.server
+        state = self.state
+        relations = server.source.relations
+        sent_relations = set()
+        interval = 1.0 / server.rate if server.rate else 0.0
+        due = time.monotonic()
+        sent = 0
+        in_stream = False
+        for end_lsn, messages in server.source.transactions:
+            if end_lsn <= start:
+                continue
+            for data_start, payload in messages:
+                kind = payload[0]
+                if kind == 0x53 or kind == 0x45:  # 'S' / 'E': changes in between carry an xid first
+                    in_stream = kind == 0x53
+                elif kind == 0x52 and not in_stream:
+                    sent_relations.add(_INT32.unpack_from(payload, 1)[0])
+                elif kind in (0x49, 0x55, 0x44) and not in_stream:  # 'I', 'U', 'D'
+                    relation_id = _INT32.unpack_from(payload, 1)[0]
+                    if relation_id not in sent_relations and relation_id in relations:
+                        sent_relations.add(relation_id)
+                        self.xlog(data_start, relations[relation_id])
+                self.xlog(data_start, payload)
+                sent += 1
+                if server.disconnect_after and sent >= server.disconnect_after:
+                    self.flush_out()
+                    logger.info("ℹ️ %s: Dropping the connection after %d messages", state.name, sent)
+                    raise _Disconnect()
+                if interval:
+                    due += interval
+                    if due - time.monotonic() > 0.001:
+                        self.flush_out()
+                        self.poll_client(due - time.monotonic())
+                if len(self.out) >= SEND_CHUNK:
+                    self.flush_out()
+                    self.poll_client(0)
+        self.flush_out()
+
+    def xlog(self, data_start, payload):
+        self.out += _message(b'd', _XLOG.pack(b'w', data_start, data_start, _now_pg()) + payload)
+        self.state.messages_sent += 1
+        self.state.bytes_sent += len(payload)
+
+    def flush_out(self):
+        view = memoryview(self.out)
+        while view:
+            try:
+                sent = self.sock.send(view)
+            except BlockingIOError:
+                # The client is not reading (a full writer queue): wait, but keep
+                # noticing status updates and terminations.
+                select.select([], [self.sock], [], 0.1)
+                self.check_alive()
+                continue
+            view = view[sent:]
+        self.out = bytearray()
+
+    def idle(self):
+        self.poll_client(self.server.keepalive_interval)
+        self.keepalive()
+
+    def keepalive(self):
+        since_status = time.monotonic() - self.status_at
+        reply = since_status >= self.server.sender_timeout / 2
+        if reply:
+            self.state.replies_requested += 1
+        self.out += _message(b'd', _KEEPALIVE.pack(b'k', self.server.source.end_lsn, _now_pg(), 1 if reply else 0))
+        self.flush_out()
+
+    def check_alive(self):
+        if self.pid in self.server.terminated:
+            self.error("57P01", "terminating connection due to administrator command", "FATAL")
+            raise _Disconnect()
+        if time.monotonic() - self.status_at > self.server.sender_timeout:
+            self.state.timeouts += 1
+            logger.warning("⚠️ %s: terminating walsender process due to replication timeout", self.state.name)
+            raise _Disconnect()
+
+    def poll_client(self, timeout):
+        """
+        Read what the client sent (status updates, Terminate), waiting up to `timeout`.
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            self.check_alive()
+            remaining = deadline - time.monotonic()
+            readable, _, _ = select.select([self.sock], [], [], max(0.0, min(remaining, 0.5)))
+            if readable:
+                try:
+                    chunk = self.sock.recv(65536)
+                except BlockingIOError:
+                    chunk = None
+                except OSError as e:
+                    if e.errno in (errno.ECONNRESET, errno.EPIPE):
+                        raise _Disconnect()
+                    raise
+                if chunk == b'':
+                    raise _Disconnect()
+                if chunk:
+                    self.inbox += chunk
+                    self.parse_client()
+            if remaining <= 0:
+                return
+
+    def parse_client(self):
+        while len(self.inbox) >= 5:
+            kind, length = _HEADER.unpack_from(self.inbox)
+            if len(self.inbox) < length + 1:
+                return
+            body, self.inbox = self.inbox[5:length + 1], self.inbox[length + 1:]
+            if kind == b'X':
+                raise _Disconnect()
+            if kind == b'c':  # CopyDone: end of streaming
+                raise _Disconnect()
+            if kind == b'd' and body[:1] == b'r':
+                _, flush, _, _, _ = _STATUS.unpack_from(body, 1)
+                now = time.monotonic()
+                state = self.state
+                state.status_updates += 1
+                if state.last_status_at is not None:
+                    state.feedback_gaps.append(now - state.last_status_at)
+                state.last_status_at = now
+                self.status_at = now
+                if flush > state.confirmed_flush:
+                    state.confirmed_flush = flush
+
+
+class AckingWriter:
+    """
+    Stands in for WalEventWriter (SlotStream.writer_factory) in `drive`: every
+    transaction counts as persisted as soon as it is submitted, and the position
+    is kept per slot so a reconnect resumes like it would from the checkpoint.
+    """
+    checkpoints = {}
+    fenced = False
+    max_pending_rows = 1
+
+    def __init__(self, db_id, slot_name, on_flush=None, **kwargs):
+        self.slot_name = slot_name
+        self.on_flush = on_flush
+        self.checkpoint_lsn = self.checkpoints.get(slot_name, 0)
+        self.rows = 0
+
+    def start(self):
+        return True
+
+    def has_room(self):
+        return True
+
+    def wait_for_room(self, max_pending_rows, timeout=None):
+        return True
+
+    def stats(self):
+        return {"rows_written": self.rows}
+
+    def _ack(self, ack_lsn):
+        if ack_lsn:
+            self.checkpoints[self.slot_name] = ack_lsn
+            if self.on_flush is not None:
+                self.on_flush(ack_lsn)
+
+    def submit_transaction(self, wal_events, ack_lsn=None):
+        self.rows += len(wal_events)
+        self._ack(ack_lsn)
+
+    def submit_stream(self, wal_events, ack_lsn=None, on_wait=None):
+        count = sum(1 for _ in wal_events)
+        self.rows += count
+        self._ack(ack_lsn)
+        return count
+
+    def stop(self):
+        pass
+
+
+def load_source(args):
+    if args.segments:
+        return WalSource(iter_records(segment_paths(args.segments)))
+    return WalSource(pgoutput_workload.from_arguments(args).records(args.transactions))
+
+
+def drive(server, source, slots, seconds):
+    from services.wal_listener.slot_stream import SlotStream
+    from services.wal_listener.wal_listener_service import WALListenerService
+
+    SlotStream.writer_factory = AckingWriter
+    host, port = server.server_address
+    loops = []
+    started = time.monotonic()
+    for db_id in range(slots):
+        run_status = {"running": True}
+        conn_details = {"host": host, "port": port, "user": "replicator", "dbname": "source",
+                        "connect_timeout": 5}
+        thread = threading.Thread(target=WALListenerService._wal_loop,
+                                  args=(db_id, conn_details, f"slot_{db_id}", "pub", run_status),
+                                  name=f"wal-{db_id}", daemon=True)
+        thread.start()
+        loops.append((thread, run_status))
+
+    deadline = started + seconds
+    while time.monotonic() < deadline:
+        states = server.slot_stats()
+        if len(states) == slots and all(s["confirmed_flush"] >= source.end_lsn for s in states):
+            break
+        time.sleep(0.05)
+    elapsed = time.monotonic() - started
+    for _, run_status in loops:
+        run_status["running"] = False
+    for thread, _ in loops:
+        thread.join(10)
+    return elapsed, [run_status["recovery"].stats() for _, run_status in loops if "recovery" in run_status]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("serve", "drive"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--segments", nargs="*", help="replay these segment files / capture directories")
+    parser.add_argument("--rate", type=float, default=0.0, help="messages/sec per connection; 0 = unthrottled")
+    parser.add_argument("--keepalive-interval", type=float, default=1.0)
+    parser.add_argument("--sender-timeout", type=float, default=60.0)
+    parser.add_argument("--disconnect-after", type=int, default=0, help="drop connections after N messages")
+    parser.add_argument("--server-version", default="16.0")
+    parser.add_argument("--slots", type=int, default=1, help="slots streamed by drive")
+    parser.add_argument("--seconds", type=float, default=60.0, help="drive stops after this long at most")
+    pgoutput_workload.add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.mode == "serve" else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    source = load_source(args)
+    server = FakeWalSender((args.host, args.port), source, rate=args.rate,
+                           keepalive_interval=args.keepalive_interval, sender_timeout=args.sender_timeout,
+                           disconnect_after=args.disconnect_after, server_version=args.server_version)
+    print(f"fake walsender on {server.server_address[0]}:{server.server_address[1]}: "
+          f"{source.messages:,} messages in {len(source.transactions):,} transactions per slot")
+    if args.mode == "serve":
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for state in server.slot_stats():
+                print(state)
+        return
+
+    threading.Thread(target=server.serve_forever, name="fake-walsender", daemon=True).start()
+    elapsed, recovery = drive(server, source, args.slots, args.seconds)
+    server.shutdown()
+    states = server.slot_stats()
+    sent = sum(s["messages_sent"] for s in states)
+    caught_up = sum(1 for s in states if s["confirmed_flush"] >= source.end_lsn)
+    gaps = [s["feedback_gap_max"] for s in states if s["feedback_gap_max"] is not None]
+    print(f"{args.slots} slots, {elapsed:.2f}s: {sent:,} messages sent ({sent / elapsed:,.0f} msgs/sec), "
+          f"{caught_up}/{args.slots} slots confirmed the end of the stream")
+    print(f"connections: {sum(s['connections'] for s in states)}, "
+          f"reconnect attempts: {sum(r['reconnect_attempts'] for r in recovery)}, "
+          f"max time to recover: {max((r['max_time_to_recover'] for r in recovery), default=0):.2f}s")
+    print(f"status updates: {sum(s['status_updates'] for s in states):,}, "
+          f"max gap between them: {max(gaps, default=0):.2f}s, "
+          f"replies requested: {sum(s['replies_requested'] for s in states)}, "
+          f"timeouts: {sum(s['timeouts'] for s in states)}")
+
+
+if __name__ == "__main__":
+    main()
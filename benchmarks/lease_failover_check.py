@@ -0,0 +1,175 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/lease_failover_check.py
+"""
+Two-node failover check for the slot leases (services/wal_listener/slot_leases.py).
+
+Runs two SlotLeaseManagers ("node-a", "node-b") in this process against a scratch
+MySQL/MariaDB database and checks that:
+
+  1. every slot is owned by exactly one node, split by the hash ring;
+  2. after node A stops heartbeating without releasing (a crash), node B owns all
+     slots again; reports how long that took (expected: about one TTL plus one
+     refresh interval);
+  3. A's old fencing tokens are rejected by the same share-locked check the
+     WalEventWriter runs before every batch.
+
+The tables are created if they do not exist (without the foreign key to
+postgres_replication_slots) and emptied first, so do NOT point it at a real
+application DB. A scratch MariaDB is in docker-compose.yml:
+
+    docker compose --profile local-db up -d smartcdc_mariadb
+    python -m benchmarks.lease_failover_check --port 3307 --password smartcdc
+"""
+import sys
+import time
+import uuid
+import logging
+import argparse
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+from services.wal_listener.slot_leases import SlotLeaseManager, lease_is_current
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS wal_listener_nodes (
+      node_id VARCHAR(255) NOT NULL PRIMARY KEY,
+      hostname VARCHAR(255) NULL,
+      pid INT NULL,
+      started_at DATETIME(6) NULL,
+      heartbeat_at DATETIME(6) NULL,
+      expires_at DATETIME(6) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS replication_slot_leases (
+      slot_id VARCHAR(36) NOT NULL PRIMARY KEY,
+      owner VARCHAR(255) NULL,
+      fencing_token BIGINT NOT NULL,
+      acquired_at DATETIME(6) NULL,
+      renewed_at DATETIME(6) NULL,
+      expires_at DATETIME(6) NOT NULL,
+      KEY ix_replication_slot_leases_owner (owner)
+    )
+    """,
+]
+
+
+def claim_until_stable(nodes, rows, interval, timeout):
+    """
+    Refresh every node until the owned sets stop changing and cover every slot.
+    Returns { node_id -> [owned rows] }.
+    """
+    deadline = time.monotonic() + timeout
+    previous = None
+    while True:
+        owned = {node.node_id: node.claim(rows) for node in nodes}
+        current = {node_id: sorted(row["slot_id"] for row in node_rows)
+                   for node_id, node_rows in owned.items()}
+        covered = sum(len(slot_ids) for slot_ids in current.values()) == len(rows)
+        if covered and current == previous:
+            return owned
+        if time.monotonic() > deadline:
+            raise AssertionError(f"ownership did not settle within {timeout}s: {current}")
+        previous = current
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3307)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="smartcdc_scratch")
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--ttl", type=float, default=2.0)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between refreshes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    def connect(**kwargs):
+        return pymysql.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                               database=args.database, cursorclass=DictCursor, **kwargs)
+
+    conn = connect(autocommit=True)
+    with conn.cursor() as cur:
+        for ddl in TABLES:
+            cur.execute(ddl)
+        cur.execute("DELETE FROM replication_slot_leases")
+        cur.execute("DELETE FROM wal_listener_nodes")
+
+    rows = [{"slot_id": str(uuid.uuid4())} for _ in range(args.slots)]
+    node_a = SlotLeaseManager("node-a", ttl=args.ttl, connect=connect)
+    node_b = SlotLeaseManager("node-b", ttl=args.ttl, connect=connect)
+    node_a.start()
+    node_b.start()
+    failures = []
+    try:
+        # 1. Split
+        owned = claim_until_stable([node_a, node_b], rows, args.interval, 10 * args.ttl)
+        a_ids = {row["slot_id"] for row in owned["node-a"]}
+        b_ids = {row["slot_id"] for row in owned["node-b"]}
+        print(f"split: node-a {len(a_ids)} slots, node-b {len(b_ids)} slots")
+        if a_ids & b_ids:
+            failures.append(f"{len(a_ids & b_ids)} slots owned by both nodes")
+        if len(a_ids | b_ids) != len(rows):
+            failures.append(f"{len(rows) - len(a_ids | b_ids)} slots owned by no node")
+
+        # 2. Failover: node A stops heartbeating but keeps its leases, like a crash.
+        stale = [row["lease"] for row in owned["node-a"]]
+        node_a.stop(release=False)
+        crashed_at = time.monotonic()
+        failover = None
+        while time.monotonic() - crashed_at < 10 * args.ttl:
+            if len(node_b.claim(rows)) == len(rows):
+                failover = time.monotonic() - crashed_at
+                break
+            time.sleep(args.interval)
+        if failover is None:
+            failures.append(f"node-b did not take over within {10 * args.ttl:.1f}s")
+        else:
+            print(f"failover: node-b owns all {len(rows)} slots {failover:.2f}s after node-a stopped "
+                  f"(ttl={args.ttl:.1f}s, refresh every {args.interval:.1f}s)")
+
+        # 3. Fencing: A's tokens must no longer pass the writer's check.
+        accepted = []
+        check = connect()
+        try:
+            for lease in stale:
+                with check.cursor() as cur:
+                    cur.execute(
+                        "SELECT 1 FROM replication_slot_leases "
+                        "WHERE slot_id = %s AND owner = %s AND fencing_token = %s "
+                        "AND expires_at >= NOW(6) LOCK IN SHARE MODE",
+                        (lease["slot_id"], lease["owner"], lease["token"])
+                    )
+                    held = cur.fetchone() is not None
+                check.rollback()
+                if held or lease_is_current(lease, connection=check):
+                    accepted.append(lease["slot_id"])
+        finally:
+            check.close()
+        print(f"fencing: {len(stale) - len(accepted)} of {len(stale)} stale node-a leases rejected")
+        if accepted:
+            failures.append(f"stale node-a tokens still accepted for slots {accepted}")
+    finally:
+        node_b.stop()
+        node_a.stop()
+        conn.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else "FAILED")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/pgoutput_workload.py
+"""
+Synthetic pgoutput (protocol v1, text format) workloads, reproducible from a seed.
+
+A Workload emits the (data_start, payload) stream a walsender would send for a
+run of transactions on `tables` tables: BEGIN, a RELATION before the first change
+of each table, INSERT / UPDATE / DELETE, COMMIT, with LSNs growing by the size of
+each message. Column types cycle through `types` (names of COLUMN_TYPES); column 0
+of every table is the `id int8` primary key. UPDATEs and DELETEs target rows
+inserted earlier and carry the old key (REPLICA IDENTITY DEFAULT) or the whole
+old row (`identity="full"`).
+
+    workload = Workload(tables=3, columns=12, width=64, tx_size=(1, 50), update_ratio=0.3)
+    for data_start, payload in workload.records(10000):
+        ...
+
+Used by bench_suite and replay_segments --synthetic.
+"""
+import json
+import uuid
+import random
+import string
+import struct
+import datetime
+
+from services.wal_listener import type_converters as tc
+
+PG_EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+BASE_TIME = datetime.datetime(2025, 2, 3, tzinfo=datetime.timezone.utc)
+FIRST_RELATION_ID = 16384
+DEFAULT_TYPES = ("text", "numeric", "varchar", "bool", "int4", "jsonb", "timestamptz", "float8", "date", "uuid")
+
+_BEGIN = struct.Struct('!QqI')
+_COMMIT = struct.Struct('!BQQq')
+_COLUMN = struct.Struct('!II')
+_LENGTH = struct.Struct('!I')
+_TEXT_POOL_SIZE = 65536
+
+
+def _text(rng, pool, width):
+    start = rng.randrange(0, len(pool) - width)
+    return pool[start:start + width]
+
+
+# type name -> (type OID, value(rng, pool, width) -> text representation)
+COLUMN_TYPES = {
+    "int2": (tc.INT2OID, lambda rng, pool, width: str(rng.randrange(32768))),
+    "int4": (tc.INT4OID, lambda rng, pool, width: str(rng.randrange(1 << 31))),
+    "int8": (tc.INT8OID, lambda rng, pool, width: str(rng.getrandbits(62))),
+    "float8": (tc.FLOAT8OID, lambda rng, pool, width: repr(rng.random() * 10000)),
+    "numeric": (tc.NUMERICOID, lambda rng, pool, width: f"{rng.randrange(100000)}.{rng.randrange(100):02d}"),
+    "bool": (tc.BOOLOID, lambda rng, pool, width: "t" if rng.getrandbits(1) else "f"),
+    "text": (tc.TEXTOID, _text),
+    "varchar": (tc.VARCHAROID, _text),
+    "jsonb": (tc.JSONBOID, lambda rng, pool, width: json.dumps(
+        {"channel": rng.choice(("web", "app", "pos")), "note": _text(rng, pool, max(1, width // 2))})),
+    "timestamptz": (tc.TIMESTAMPTZOID, lambda rng, pool, width: (
+        BASE_TIME + datetime.timedelta(microseconds=rng.getrandbits(40))).isoformat(sep=" ")),
+    "timestamp": (tc.TIMESTAMPOID, lambda rng, pool, width: (
+        BASE_TIME + datetime.timedelta(microseconds=rng.getrandbits(40))).replace(tzinfo=None).isoformat(sep=" ")),
+    "date": (tc.DATEOID, lambda rng, pool, width: (
+        BASE_TIME + datetime.timedelta(days=rng.randrange(3650))).date().isoformat()),
+    "uuid": (tc.UUIDOID, lambda rng, pool, width: str(uuid.UUID(int=rng.getrandbits(128), version=4))),
+}
+
+
+def _tuple_data(values):
+    parts = [struct.pack('!H', len(values))]
+    for value in values:
+        if value is None:
+            parts.append(b'n')
+        else:
+            encoded = value.encode('utf-8')
+            parts.append(b't' + _LENGTH.pack(len(encoded)) + encoded)
+    return b''.join(parts)
+
+
+class Table:
+    """
+    One synthetic table: its RELATION message and row generation.
+    """
+
+    def __init__(self, relation_id, name, types, width, null_ratio, schema="public", identity="default"):
+        self.relation_id = relation_id
+        self.name = name
+        self.schema = schema
+        self.identity = identity
+        self.width = width
+        self.null_ratio = null_ratio
+        self.columns = [("id", "int8")] + [(f"{type_name}_{i}", type_name) for i, type_name in enumerate(types, 1)]
+        self.next_id = 1
+        self.live_ids = []
+
+    def relation(self) -> bytes:
+        parts = [b'R', _LENGTH.pack(self.relation_id), self.schema.encode() + b'\x00',
+                 self.name.encode() + b'\x00', b'f' if self.identity == "full" else b'd',
+                 struct.pack('!H', len(self.columns))]
+        for i, (name, type_name) in enumerate(self.columns):
+            parts += [b'\x01' if i == 0 else b'\x00', name.encode() + b'\x00',
+                      _COLUMN.pack(COLUMN_TYPES[type_name][0], 0xFFFFFFFF)]
+        return b''.join(parts)
+
+    def row(self, rng, pool, row_id):
+        values = [str(row_id)]
+        for _, type_name in self.columns[1:]:
+            if self.null_ratio and rng.random() < self.null_ratio:
+                values.append(None)
+            else:
+                values.append(COLUMN_TYPES[type_name][1](rng, pool, self.width))
+        return values
+
+    def _old(self, rng, pool, row_id):
+        if self.identity == "full":
+            return b'O' + _tuple_data(self.row(rng, pool, row_id))
+        return b'K' + _tuple_data([str(row_id)] + [None] * (len(self.columns) - 1))
+
+    def insert(self, rng, pool) -> bytes:
+        row_id = self.next_id
+        self.next_id += 1
+        self.live_ids.append(row_id)
+        return b'I' + _LENGTH.pack(self.relation_id) + b'N' + _tuple_data(self.row(rng, pool, row_id))
+
+    def update(self, rng, pool) -> bytes:
+        row_id = rng.choice(self.live_ids)
+        old = self._old(rng, pool, row_id) if self.identity == "full" else b''
+        return b'U' + _LENGTH.pack(self.relation_id) + old + b'N' + _tuple_data(self.row(rng, pool, row_id))
+
+    def delete(self, rng, pool) -> bytes:
+        index = rng.randrange(len(self.live_ids))
+        self.live_ids[index], self.live_ids[-1] = self.live_ids[-1], self.live_ids[index]
+        row_id = self.live_ids.pop()
+        return b'D' + _LENGTH.pack(self.relation_id) + self._old(rng, pool, row_id)
+
+
+class Workload:
+    """
+    Usage:
+        workload = Workload(tables=2, columns=8, tx_size=(1, 20), update_ratio=0.2, delete_ratio=0.05)
+        records = list(workload.records(transactions=5000))   # [(data_start, payload), ...]
+
+    `tx_size` is a number of changes per transaction or an inclusive (min, max)
+    range; `width` the length of text values. UPDATE / DELETE fall back to INSERT
+    while a table has no rows yet.
+    """
+
+    def __init__(self, tables=1, columns=8, types=DEFAULT_TYPES, width=16, tx_size=10, update_ratio=0.0,
+                 delete_ratio=0.0, null_ratio=0.1, identity="default", seed=0, start_lsn=0x16B3748):
+        if not types or any(type_name not in COLUMN_TYPES for type_name in types):
+            raise ValueError(f"column types must be among {', '.join(COLUMN_TYPES)}")
+        if update_ratio < 0 or delete_ratio < 0 or update_ratio + delete_ratio > 1:
+            raise ValueError("update_ratio + delete_ratio must be within [0, 1]")
+        if identity not in ("default", "full"):
+            raise ValueError(f"unknown replica identity {identity!r}")
+        self.rng = random.Random(seed)
+        self.pool = "".join(self.rng.choices(string.ascii_letters + string.digits + "  ", k=_TEXT_POOL_SIZE))
+        self.width = max(1, min(int(width), _TEXT_POOL_SIZE - 1))
+        self.tx_size = (tx_size, tx_size) if isinstance(tx_size, int) else tuple(tx_size)
+        self.update_ratio = update_ratio
+        self.delete_ratio = delete_ratio
+        column_types = [types[i % len(types)] for i in range(max(0, columns - 1))]
+        self.tables = [
+            Table(FIRST_RELATION_ID + i, f"orders_{i}" if tables > 1 else "orders", column_types,
+                  self.width, null_ratio, identity=identity)
+            for i in range(tables)
+        ]
+        self.lsn = start_lsn
+        self.xid = 1000
+        self.sent_relations = set()
+        self.commit_time_us = (BASE_TIME - PG_EPOCH) // datetime.timedelta(microseconds=1)
+
+    def change(self, table) -> bytes:
+        draw = self.rng.random()
+        if table.live_ids and draw < self.delete_ratio:
+            return table.delete(self.rng, self.pool)
+        if table.live_ids and draw < self.delete_ratio + self.update_ratio:
+            return table.update(self.rng, self.pool)
+        return table.insert(self.rng, self.pool)
+
+    def transaction(self):
+        """
+        The payloads of the next transaction, BEGIN and COMMIT included, with
+        each message's data_start.
+        """
+        self.xid += 1
+        self.commit_time_us += self.rng.randrange(1, 2000)
+        body = []
+        for _ in range(self.rng.randint(*self.tx_size)):
+            table = self.rng.choice(self.tables)
+            if table.relation_id not in self.sent_relations:
+                # pgoutput sends the RELATION inside the first transaction touching the table.
+                self.sent_relations.add(table.relation_id)
+                body.append(table.relation())
+            body.append(self.change(table))
+
+        begin_lsn = self.lsn
+        commit_lsn = begin_lsn + sum(len(payload) for payload in body)
+        end_lsn = commit_lsn + 64
+        messages = [(begin_lsn, b'B' + _BEGIN.pack(commit_lsn, self.commit_time_us, self.xid))]
+        lsn = begin_lsn
+        for payload in body:
+            lsn += len(payload)
+            messages.append((lsn, payload))
+        messages.append((end_lsn, b'C' + _COMMIT.pack(0, commit_lsn, end_lsn, self.commit_time_us)))
+        self.lsn = end_lsn + 8
+        return messages
+
+    def records(self, transactions):
+        for _ in range(transactions):
+            yield from self.transaction()
+
+
+def add_arguments(parser):
+    """
+    The Workload options, shared by the benchmark command lines.
+    """
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--tables", type=int, default=1)
+    parser.add_argument("--columns", type=int, default=8, help="columns per table, the id included")
+    parser.add_argument("--types", default=",".join(DEFAULT_TYPES),
+                        help=f"column types, cycled over the columns ({', '.join(COLUMN_TYPES)})")
+    parser.add_argument("--width", type=int, default=16, help="length of text values")
+    parser.add_argument("--tx-size", default="10", help="changes per transaction: N or MIN-MAX")
+    parser.add_argument("--update-ratio", type=float, default=0.0)
+    parser.add_argument("--delete-ratio", type=float, default=0.0)
+    parser.add_argument("--null-ratio", type=float, default=0.1)
+    parser.add_argument("--identity", choices=("default", "full"), default="default")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(args):
+    low, _, high = args.tx_size.partition("-")
+    return Workload(tables=args.tables, columns=args.columns, types=tuple(args.types.split(",")),
+                    width=args.width, tx_size=(int(low), int(high or low)), update_ratio=args.update_ratio,
+                    delete_ratio=args.delete_ratio, null_ratio=args.null_ratio, identity=args.identity,
+                    seed=args.seed)
+
+
+def describe(args):
+    return {key: getattr(args, key) for key in ("transactions", "tables", "columns", "types", "width", "tx_size",
+                                                 "update_ratio", "delete_ratio", "null_ratio", "identity", "seed")}
@@ -0,0 +1,169 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# benchmarks/replay_segments.py
+"""
+Replay captured (or synthetic) pgoutput segments through the listener at full speed.
+
+Segments are written by a listener running with WAL_CAPTURE_DIR set (see
+services/wal_listener/wal_capture.py) or by --synthetic (a pgoutput_workload,
+same options as bench_suite). All messages are loaded
+into memory first, then fed through one of:
+
+  decode:   decode_message_view() / decode_message() only (--decoder);
+  pipeline: a SlotStream as in production (decode, transaction assembly,
+            wal_event building, feedback bookkeeping); events are discarded;
+  mysql:    the same, with the slot's real WalEventWriter persisting to the
+            configured MySQL (--db-id must have a wal_pipeline there). Use a
+            scratch database: rows already in wal_events are skipped, so only
+            the first replay of a capture inserts anything.
+
+Reports msgs/sec and MB/sec (best of --repeat) and, with --tracemalloc, the peak
+memory traced during an extra run, so runs on two commits can be compared.
+
+Run from the repository root:
+    python -m benchmarks.replay_segments --synthetic /tmp/orders.pgoseg --transactions 20000 --tx-size 1-50 --update-ratio 0.3
+    python -m benchmarks.replay_segments /tmp/orders.pgoseg --stage pipeline --repeat 3 --tracemalloc
+    python -m benchmarks.replay_segments /var/tmp/wal-capture/ --stage mysql --db-id 42
+"""
+import os
+import time
+import logging
+import argparse
+import resource
+import tracemalloc
+from types import SimpleNamespace
+
+# wal_listener_service reads its MySQL settings at import time.
+os.environ.setdefault("DB_PORT", "3306")
+
+from services.wal_listener.postgres_decoder import decode_message, decode_message_view
+from services.wal_listener.slot_stream import SlotStream
+from services.wal_listener.wal_capture import write_segment, segment_paths, segment_meta, iter_records
+from benchmarks import pgoutput_workload
+from benchmarks.bench_engines import DiscardingWriter
+
+
+class _NullCursor:
+    def send_feedback(self, **kwargs):
+        pass
+
+
+def load(paths, limit=None):
+    messages = []
+    for data_start, payload in iter_records(paths):
+        messages.append((data_start, payload))
+        if limit and len(messages) >= limit:
+            break
+    return messages
+
+
+def replay_decode(messages, decode):
+    in_stream = False
+    for _, payload in messages:
+        kind = payload[0]
+        if kind == 0x53:    # 'S' stream start
+            in_stream = True
+        elif kind == 0x45:  # 'E' stream stop
+            in_stream = False
+        decode(payload, in_stream)
+
+
+def replay_pipeline(messages, meta, decoder, writer=None):
+    db_id = meta.get("db_id", 0)
+    stream = SlotStream(db_id, {}, meta.get("slot_name", f"replay_{db_id}"), "replay")
+    stream.binary = bool(meta.get("binary"))
+    stream.decode = decode_message if decoder == "bytes" else decode_message_view
+    stream.writer = writer or DiscardingWriter()
+    cursor = _NullCursor()
+    handle = stream.handle
+    for data_start, payload in messages:
+        handle(SimpleNamespace(payload=payload, data_start=data_start, cursor=cursor))
+    # Persisting is part of the measured work on the mysql stage.
+    stream.writer.stop()
+
+
+def make_run(stage, messages, meta, decoder, db_id):
+    if stage == "decode":
+        decode = decode_message if decoder == "bytes" else decode_message_view
+        return lambda: replay_decode(messages, decode)
+    if stage == "pipeline":
+        return lambda: replay_pipeline(messages, meta, decoder)
+
+    from services.wal_listener.wal_event_writer import WalEventWriter
+
+    def run():
+        writer = WalEventWriter(db_id, meta.get("slot_name", f"replay_{db_id}"))
+        if not writer.start():
+            raise SystemExit(f"db_id={db_id} has no wal_pipeline in the configured MySQL")
+        replay_pipeline(messages, {**meta, "db_id": db_id}, decoder, writer)
+    return run
+
+
+def measure(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_traced(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("segments", nargs="*", help="segment files or capture directories")
+    parser.add_argument("--stage", choices=("decode", "pipeline", "mysql"), default="pipeline")
+    parser.add_argument("--decoder", choices=("memoryview", "bytes"), default="memoryview")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N messages")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report peak traced memory")
+    parser.add_argument("--db-id", type=int, help="slot whose wal_pipeline receives the events (mysql stage)")
+    parser.add_argument("--synthetic", metavar="PATH",
+                        help="write a synthetic segment (see pgoutput_workload) to PATH and exit")
+    pgoutput_workload.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        workload = pgoutput_workload.from_arguments(args)
+        count = write_segment(args.synthetic, workload.records(args.transactions),
+                              {"db_id": 0, "slot_name": "synthetic", "binary": False,
+                               "workload": pgoutput_workload.describe(args)})
+        print(f"wrote {count:,} messages to {args.synthetic}")
+        return
+    paths = segment_paths(args.segments)
+    if not paths:
+        parser.error("no segments given")
+    if args.stage == "mysql" and args.db_id is None:
+        parser.error("--stage mysql needs --db-id")
+
+    logging.disable(logging.WARNING)
+    meta = segment_meta(paths[0])
+    messages = load(paths, args.limit)
+    total_bytes = sum(len(payload) for _, payload in messages)
+    commits = sum(1 for _, payload in messages if payload[0] in (0x43, 0x63))  # 'C', 'c'
+    run = make_run(args.stage, messages, meta, args.decoder, args.db_id)
+
+    seconds = measure(run, 1 if args.stage == "mysql" else args.repeat)
+    print(f"{len(paths)} segment(s), {len(messages):,} messages, {total_bytes / 1048576:.1f} MB, "
+          f"{commits:,} transactions; stage={args.stage} decoder={args.decoder}")
+    print(f"{seconds:8.3f} s  {len(messages) / seconds:12,.0f} msgs/sec  "
+          f"{total_bytes / 1048576 / seconds:8.1f} MB/sec  {commits / seconds:10,.0f} tx/sec")
+    if args.tracemalloc and args.stage != "mysql":
+        print(f"peak traced memory: {peak_traced(run) / 1048576:.1f} MB")
+    print(f"max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,10 @@
 
 # config.py
 import os
+import json
 from flask_cors import CORS
 from datetime import timedelta
+from utils.json import json_default
 
 class Config:
     SECRET_KEY = 'your_secret_key'
@@ -20,6 +22,10 @@ class Config:
     DB_HOST = os.getenv('DB_HOST', 'DB_HOST NOT SET!')
     DB_NAME = os.getenv('DB_NAME', 'DB_NAME NOT SET!')
     SQLALCHEMY_DATABASE_URI = f'mysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
+    # WAL events carry typed column values (Decimal, datetime, ...) in JSON columns.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "json_serializer": lambda obj: json.dumps(obj, default=json_default),
+    }
 
 		# Frontend React App URL 
 		# ex: https://app.smart-cdc.space-rocket.com
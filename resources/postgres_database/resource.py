@@ -127,6 +127,7 @@ class PostgresDatabaseResource:
         database.username = data.get("username", database.username)
         database.password = data.get("password", database.password)
         db.session.commit()
+        WALListenerService.request_refresh()
         return jsonify({"message": "PostgresDatabase updated successfully"})
 
     @staticmethod
@@ -188,6 +189,7 @@ class PostgresDatabaseResource:
         # Delete the database record
         db.session.delete(database)
         db.session.commit()
+        WALListenerService.request_refresh(full=True)
 
         return jsonify({"message": "PostgresDatabase and associated replication slots deleted successfully"})
 
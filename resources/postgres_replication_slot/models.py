@@ -9,6 +9,7 @@ import uuid
 import enum
 from models import db
 from sqlalchemy import Enum, JSON
+from sqlalchemy.dialects import mysql
 
 class ReplicationSlotStatus(enum.Enum):
     active = "active"
@@ -17,7 +18,7 @@ class ReplicationSlotStatus(enum.Enum):
 class PostgresReplicationSlot(db.Model):
     __tablename__ = 'postgres_replication_slots'
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()), unique=True, nullable=False)
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()), nullable=False)
     publication_name = db.Column(db.String(255), nullable=False)
     slot_name = db.Column(db.String(255), nullable=False)
     status = db.Column(Enum(ReplicationSlotStatus), nullable=False, default=ReplicationSlotStatus.active)
@@ -30,7 +31,7 @@ class PostgresReplicationSlot(db.Model):
     postgres_database = db.relationship('PostgresDatabase', backref=db.backref('postgres_replication_slots', lazy=True))
 
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp(), index=True)
 
     @property
     def info(self):
@@ -43,3 +44,100 @@ class PostgresReplicationSlot(db.Model):
 
     def __repr__(self):
         return f"<PostgresReplicationSlot {self.slot_name} ({self.status.value})>"
+
+
+class ReplicationSlotLease(db.Model):
+    """
+    Which WAL listener node currently streams a slot (see services/wal_listener/slot_leases.py).
+    """
+    __tablename__ = 'replication_slot_leases'
+
+    slot_id = db.Column(db.String(36), db.ForeignKey('postgres_replication_slots.id', ondelete='CASCADE'), primary_key=True)
+    owner = db.Column(db.String(255), nullable=True, index=True)
+    fencing_token = db.Column(db.BigInteger, nullable=False, default=0)
+    acquired_at = db.Column(mysql.DATETIME(fsp=6), nullable=True)
+    renewed_at = db.Column(mysql.DATETIME(fsp=6), nullable=True)
+    expires_at = db.Column(mysql.DATETIME(fsp=6), nullable=False)
+
+    slot = db.relationship('PostgresReplicationSlot', backref=db.backref('lease', uselist=False, lazy=True))
+
+    def __repr__(self):
+        return f"<ReplicationSlotLease {self.slot_id} owner={self.owner} token={self.fencing_token}>"
+
+
+class ReplicationSlotCheckpoint(db.Model):
+    """
+    End LSN of the last source transaction persisted to wal_events for a slot,
+    written in the same MySQL transaction as its events; the slot resumes there.
+    """
+    __tablename__ = 'replication_slot_checkpoints'
+
+    slot_id = db.Column(db.String(36), db.ForeignKey('postgres_replication_slots.id', ondelete='CASCADE'), primary_key=True)
+    commit_lsn = db.Column(mysql.BIGINT(unsigned=True), nullable=False, default=0)
+    updated_at = db.Column(mysql.DATETIME(fsp=6), nullable=True)
+
+    slot = db.relationship('PostgresReplicationSlot', backref=db.backref('checkpoint', uselist=False, lazy=True))
+
+    def __repr__(self):
+        return f"<ReplicationSlotCheckpoint {self.slot_id} lsn={self.commit_lsn}>"
+
+
+class WalListenerNode(db.Model):
+    """
+    A running WAL listener node; rows whose expires_at passed belong to dead nodes.
+    """
+    __tablename__ = 'wal_listener_nodes'
+
+    node_id = db.Column(db.String(255), primary_key=True)
+    hostname = db.Column(db.String(255), nullable=True)
+    pid = db.Column(db.Integer, nullable=True)
+    started_at = db.Column(mysql.DATETIME(fsp=6), nullable=True)
+    heartbeat_at = db.Column(mysql.DATETIME(fsp=6), nullable=True)
+    expires_at = db.Column(mysql.DATETIME(fsp=6), nullable=False)
+
+    def __repr__(self):
+        return f"<WalListenerNode {self.node_id}>"
+
+
+class ReplicationSlotLagSample(db.Model):
+    """
+    One reading of a slot's lag and retained WAL on its source server
+    (see services/wal_listener/lag_monitor.py). LSNs are stored as integers.
+    """
+    __tablename__ = 'replication_slot_lag_samples'
+    __table_args__ = (
+        db.Index('ix_replication_slot_lag_samples_slot_sampled', 'slot_id', 'sampled_at'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    slot_id = db.Column(db.String(36), db.ForeignKey('postgres_replication_slots.id', ondelete='CASCADE'), nullable=False)
+    sampled_at = db.Column(mysql.DATETIME(fsp=6), nullable=False, index=True)
+    wal_lsn = db.Column(mysql.BIGINT(unsigned=True), nullable=True)
+    confirmed_flush_lsn = db.Column(mysql.BIGINT(unsigned=True), nullable=True)
+    restart_lsn = db.Column(mysql.BIGINT(unsigned=True), nullable=True)
+    lag_bytes = db.Column(db.BigInteger, nullable=True)
+    retained_bytes = db.Column(db.BigInteger, nullable=True)
+    lag_seconds = db.Column(db.Float, nullable=True)
+    active = db.Column(db.Boolean, nullable=True)
+    wal_status = db.Column(db.String(16), nullable=True)
+
+    @staticmethod
+    def _lsn(value):
+        return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}" if value is not None else None
+
+    @property
+    def info(self):
+        return {
+            "sampled_at": self.sampled_at,
+            "wal_lsn": self._lsn(self.wal_lsn),
+            "confirmed_flush_lsn": self._lsn(self.confirmed_flush_lsn),
+            "restart_lsn": self._lsn(self.restart_lsn),
+            "lag_bytes": self.lag_bytes,
+            "retained_bytes": self.retained_bytes,
+            "lag_seconds": self.lag_seconds,
+            "active": self.active,
+            "wal_status": self.wal_status
+        }
+
+    def __repr__(self):
+        return f"<ReplicationSlotLagSample {self.slot_id} at={self.sampled_at} lag={self.lag_bytes}>"
@@ -6,14 +6,46 @@
 
 # resources/postgres_replication_slot/resource.py
 import logging
+from datetime import datetime
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from resources.postgres_replication_slot.models 
-    import PostgresReplicationSlot, ReplicationSlotStatus
+from models import db
+from resources.postgres_replication_slot.models import (
+    PostgresReplicationSlot, ReplicationSlotStatus, ReplicationSlotLagSample
+)
+from services.wal_listener.wal_listener_service import WALListenerService
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LAG_SAMPLES = 360
+MAX_LAG_SAMPLES = 5000
+
+
+def latest_lag_samples(slot_ids):
+    """
+    { slot_id -> latest ReplicationSlotLagSample } for the given slots.
+    """
+    if not slot_ids:
+        return {}
+    latest = (
+        db.session.query(
+            ReplicationSlotLagSample.slot_id,
+            db.func.max(ReplicationSlotLagSample.sampled_at).label("sampled_at")
+        )
+        .filter(ReplicationSlotLagSample.slot_id.in_(slot_ids))
+        .group_by(ReplicationSlotLagSample.slot_id)
+        .subquery()
+    )
+    samples = (
+        ReplicationSlotLagSample.query
+        .join(latest, db.and_(ReplicationSlotLagSample.slot_id == latest.c.slot_id,
+                              ReplicationSlotLagSample.sampled_at == latest.c.sampled_at))
+        .all()
+    )
+    return {sample.slot_id: sample for sample in samples}
+
+
 class PostgresReplicationSlotResource:
     @staticmethod
     @jwt_required()
@@ -25,6 +57,7 @@ class PostgresReplicationSlotResource:
         logger.info("ℹ️  Listing replication slots for user %s", current_user_id)
 
         slots = PostgresReplicationSlot.query.filter_by(user_id=current_user_id).all()
+        lag = latest_lag_samples([slot.id for slot in slots])
         results = []
         for slot in slots:
             results.append({
@@ -33,6 +66,7 @@ class PostgresReplicationSlotResource:
                 "slot_name": slot.slot_name,
                 "status": slot.status.value,  # enum => string
                 "postgres_database_id": slot.postgres_database_id,
+                "lag": lag[slot.id].info if slot.id in lag else None,
                 "created_at": slot.created_at,
                 "updated_at": slot.updated_at
             })
@@ -60,6 +94,7 @@ class PostgresReplicationSlotResource:
         )
         db.session.add(new_slot)
         db.session.commit()
+        WALListenerService.request_refresh()
 
         return jsonify({
             "message": "ReplicationSlot created",
@@ -75,6 +110,7 @@ class PostgresReplicationSlotResource:
         """
         current_user_id = get_jwt_identity()
         slot = PostgresReplicationSlot.query.filter_by(id=slot_id, user_id=current_user_id).first_or_404()
+        lag = latest_lag_samples([slot.id]).get(slot.id)
         return jsonify({
             "id": slot.id,
             "publication_name": slot.publication_name,
@@ -82,10 +118,52 @@ class PostgresReplicationSlotResource:
             "status": slot.status.value,
             "annotations": slot.annotations,
             "postgres_database_id": slot.postgres_database_id,
+            "lag": lag.info if lag else None,
             "created_at": slot.created_at,
             "updated_at": slot.updated_at
         })
 
+    @staticmethod
+    @jwt_required()
+    def get_replication_slot_lag(slot_id):
+        """
+        Lag time series of a replication slot, sampled by the WAL listener's lag monitor.
+
+        Query Parameters:
+        -----------------
+        - `since` (ISO 8601 datetime, optional): Only samples taken at or after this time.
+        - `limit` (int, optional): Most recent samples to return (default 360, max 5000).
+
+        Returns:
+        --------
+        - `200 OK`: `{"slot_id", "latest", "samples"}`, samples oldest first, each with
+          `lag_bytes` (WAL not yet confirmed), `retained_bytes` (WAL the source keeps for
+          the slot), `lag_seconds` and the LSNs they were computed from.
+        - `400 Bad Request`: If `since` or `limit` is invalid.
+        """
+        current_user_id = get_jwt_identity()
+        slot = PostgresReplicationSlot.query.filter_by(id=slot_id, user_id=current_user_id).first_or_404()
+
+        try:
+            limit = min(int(request.args.get("limit", DEFAULT_LAG_SAMPLES)), MAX_LAG_SAMPLES)
+            since = request.args.get("since")
+            since = datetime.fromisoformat(since) if since else None
+        except ValueError:
+            return jsonify({"error": "Invalid since or limit"}), 400
+        if limit < 1:
+            return jsonify({"error": "Invalid since or limit"}), 400
+
+        query = ReplicationSlotLagSample.query.filter_by(slot_id=slot.id)
+        if since is not None:
+            query = query.filter(ReplicationSlotLagSample.sampled_at >= since)
+        samples = query.order_by(ReplicationSlotLagSample.sampled_at.desc()).limit(limit).all()
+        samples.reverse()
+        return jsonify({
+            "slot_id": slot.id,
+            "latest": samples[-1].info if samples else None,
+            "samples": [sample.info for sample in samples]
+        }), 200
+
     @staticmethod
     @jwt_required()
     def update_replication_slot(slot_id):
@@ -100,6 +178,11 @@ class PostgresReplicationSlotResource:
             slot.publication_name = data["publication_name"]
         if "slot_name" in data:
             slot.slot_name = data["slot_name"]
+        if "annotations" in data:
+            # Per-slot listener options, e.g. {"binary": true} (PostgreSQL 14+).
+            if not isinstance(data["annotations"], dict):
+                return jsonify({"error": "annotations must be an object"}), 400
+            slot.annotations = data["annotations"]
         if "status" in data:
             # Validate it's either 'active' or 'disabled':
             if data["status"] in ReplicationSlotStatus._value2member_map_:
@@ -108,6 +191,7 @@ class PostgresReplicationSlotResource:
                 return jsonify({"error": "Invalid status"}), 400
 
         db.session.commit()
+        WALListenerService.request_refresh()
         return jsonify({"message": "ReplicationSlot updated", "status": slot.status.value})
 
     @staticmethod
@@ -121,4 +205,6 @@ class PostgresReplicationSlotResource:
 
         db.session.delete(slot)
         db.session.commit()
+        # Deleted rows are invisible to the listener's incremental refresh.
+        WALListenerService.request_refresh(full=True)
         return jsonify({"message": "ReplicationSlot deleted"}), 200
@@ -25,6 +25,10 @@ def create_replication_slot():
 def get_replication_slot(slot_id):
     return PostgresReplicationSlotResource.get_replication_slot(slot_id)
 
+@replication_slot_bp.route('/<string:slot_id>/lag', methods=['GET'])
+def get_replication_slot_lag(slot_id):
+    return PostgresReplicationSlotResource.get_replication_slot_lag(slot_id)
+
 @replication_slot_bp.route('/<string:slot_id>', methods=['PUT'])
 def update_replication_slot(slot_id):
     return PostgresReplicationSlotResource.update_replication_slot(slot_id)
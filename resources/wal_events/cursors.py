@@ -0,0 +1,34 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# resources/wal_events/cursors.py
+"""
+Keyset cursors of the /api/wal-events listing: an opaque, URL-safe token for a
+position in (committed_at, seq, id) order.
+"""
+import json
+import uuid
+import base64
+from datetime import datetime
+
+
+def encode_cursor(event):
+    """
+    Opaque token for the position right after `event` in (committed_at, seq, id) order.
+    """
+    position = [event.committed_at.isoformat(), event.seq, event.id]
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    (committed_at, seq, id) of a token from `encode_cursor`; ValueError if malformed.
+    """
+    try:
+        committed_at, seq, event_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return datetime.fromisoformat(committed_at), int(seq), str(uuid.UUID(event_id))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
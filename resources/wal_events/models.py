@@ -5,11 +5,11 @@
 # ===================================================
 
 # resources/wal_events/models.py
-import uuid
 import enum
 from datetime import datetime
 from models import db
 from sqlalchemy import Enum, JSON
+from resources.wal_events.ids import BinaryUUID, uuid7
 
 class WalEventAction(enum.Enum):
     insert = "insert"
@@ -18,9 +18,23 @@ class WalEventAction(enum.Enum):
 
 class WalEvent(db.Model):
     __tablename__ = "wal_events"
+    # One row per source change: seq is the change's ordinal within the
+    # transaction committed at commit_lsn, so replays map onto existing rows.
+    # The indexes follow GET /api/wal-events: per pipeline, optionally per table
+    # and action, in (committed_at, seq, id) keyset order.
+    __table_args__ = (
+        db.UniqueConstraint("wal_pipeline_id", "commit_lsn", "seq", name="uq_wal_events_pipeline_commit_seq"),
+        db.Index("ix_wal_events_pipeline_committed", "wal_pipeline_id", "committed_at", "seq", "id"),
+        db.Index("ix_wal_events_pipeline_table_action_committed",
+                 "wal_pipeline_id", "source_table_name", "action", "committed_at", "seq", "id"),
+    )
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()), unique=True, nullable=False)
-    wal_pipeline_id = db.Column(db.String(36), db.ForeignKey('postgres_replication_slots.id'), nullable=False)
+    # Time-ordered, 16 bytes (see ids.py); the API still sees the string form.
+    id = db.Column(BinaryUUID, primary_key=True, default=uuid7, nullable=False)
+    # Stays VARCHAR(36): it has to match postgres_replication_slots.id, which the
+    # lease, checkpoint and lag tables reference too. Making it BINARY(16) means
+    # converting that parent table and all of its children together.
+    wal_pipeline_id = db.Column(db.String(36), db.ForeignKey('postgres_replication_slots.id', name='fk_wal_events_wal_pipeline_id'), nullable=False)
     commit_lsn = db.Column(db.BigInteger, nullable=False)
     seq = db.Column(db.BigInteger, nullable=False)
     record_pks = db.Column(JSON, nullable=False)
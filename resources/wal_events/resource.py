@@ -4,15 +4,59 @@
 # Not suitable for production use.
 # ===================================================
 
+import json
 import logging
-from flask import jsonify, request
+from datetime import datetime
+from flask import jsonify, request, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, or_
 
-from resources.wal_events.models 
-    import WalEvent, WalEventAction
+from models import db
+from resources.wal_events.models import WalEvent, WalEventAction
+from resources.wal_events.cursors import encode_cursor, decode_cursor
+from resources.postgres_replication_slot.models import PostgresReplicationSlot
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Rows fetched from MySQL per round trip while a page is streamed out.
+STREAM_BATCH = 200
+
+
+def serialize_wal_event(event):
+    return {
+        "id": event.id,
+        "wal_pipeline_id": event.wal_pipeline_id,
+        "commit_lsn": event.commit_lsn,
+        "seq": event.seq,
+        "record_pks": event.record_pks,
+        "record": event.record,
+        "changes": event.changes,
+        "action": event.action.value,  # Enum -> String
+        "committed_at": event.committed_at,
+        "source_table_oid": event.source_table_oid,
+        "source_table_schema": event.source_table_schema,
+        "source_table_name": event.source_table_name,
+        "inserted_at": event.inserted_at
+    }
+
+
+def owned_wal_events(user_id):
+    """
+    WalEvent query limited to the replication slots of `user_id`.
+
+    Ownership is a plain join on the slot's primary key, filtered on its user_id,
+    rather than `wal_pipeline.has(user_id=...)`: the correlated EXISTS that
+    produces keeps MySQL from driving the query off the wal_events indexes.
+    """
+    return (
+        WalEvent.query
+        .join(WalEvent.wal_pipeline)
+        .filter(PostgresReplicationSlot.user_id == user_id)
+    )
+
+
 class WalEventResource:
     """
     Resource class for handling WAL event-related operations.
@@ -23,43 +67,74 @@ class WalEventResource:
     @jwt_required()
     def list_wal_events():
         """
-        List all WAL events for the authenticated user with optional filtering.
+        List the WAL events of the authenticated user, one page at a time, with
+        optional filtering.
+
+        Events are ordered by (`committed_at`, `seq`, `id`) and paginated by keyset:
+        each page continues right after the last event of the previous one, so a
+        page deep into the history costs the same as the first one. The page is
+        streamed from MySQL and to the client as it is read. With `wal_pipeline_id`
+        it is read straight off the (pipeline, [table, action,] committed_at, seq, id)
+        indexes; across all slots MySQL has to sort the matching events first.
 
         Query Parameters:
         -----------------
+        - `wal_pipeline_id` (string, optional): Only the events of this replication slot.
         - `source_table_name` (string, optional): Filter WAL events by table name.
         - `action` (string, optional): Filter by action type (`insert`, `update`, or `delete`).
+        - `limit` (int, optional): Events per page (default 100, max 1000).
+        - `cursor` (string, optional): `next_cursor` of the previous page.
 
         Example Requests:
         -----------------
-        - Get all WAL events:
+        - Get the first page of WAL events:
           `GET /api/wal-events/`
 
+        - Get the next page:
+          `GET /api/wal-events/?cursor=<next_cursor>`
+
+        - Get the WAL events of one replication slot:
+          `GET /api/wal-events/?wal_pipeline_id=<slot_id>`
+
         - Get WAL events for a specific table:
           `GET /api/wal-events/?source_table_name=users`
 
         - Get WAL events of a specific action:
           `GET /api/wal-events/?action=update`
 
-        - Get WAL events for a table with a specific action:
-          `GET /api/wal-events/?source_table_name=orders&action=delete`
+        - Get WAL events for a table with a specific action, 500 at a time:
+          `GET /api/wal-events/?source_table_name=orders&action=delete&limit=500`
 
         Returns:
         --------
-        - `200 OK`: List of WAL events matching the filters.
-        - `400 Bad Request`: If an invalid `action` type is provided.
+        - `200 OK`: `{"events": [...], "next_cursor": "..."}`; `next_cursor` is null on
+          the last page. Pass the same filters along with the cursor.
+        - `400 Bad Request`: If an invalid `action`, `limit` or `cursor` is provided.
         """
         current_user_id = get_jwt_identity()
+        wal_pipeline_id = request.args.get("wal_pipeline_id")
         source_table_name = request.args.get("source_table_name")
         action = request.args.get("action")
 
+        try:
+            limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "Invalid limit"}), 400
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+        after = None
+        if request.args.get("cursor"):
+            try:
+                after = decode_cursor(request.args["cursor"])
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+
         logger.info("ℹ️ Listing WAL events for user %s", current_user_id)
 
-        query = (
-            WalEvent.query
-            .join(WalEvent.wal_pipeline)
-            .filter(WalEvent.wal_pipeline.has(user_id=current_user_id))
-        )
+        query = owned_wal_events(current_user_id)
+
+        if wal_pipeline_id:
+            query = query.filter(WalEvent.wal_pipeline_id == wal_pipeline_id)
 
         if source_table_name:
             query = query.filter(WalEvent.source_table_name == source_table_name)
@@ -72,27 +147,37 @@ class WalEventResource:
             except KeyError:
                 return jsonify({"error": "Invalid action type"}), 400
 
-        events = query.all()
-
-        results = []
-        for event in events:
-            results.append({
-                "id": event.id,
-                "wal_pipeline_id": event.wal_pipeline_id,
-                "commit_lsn": event.commit_lsn,
-                "seq": event.seq,
-                "record_pks": event.record_pks,
-                "record": event.record,
-                "changes": event.changes,
-                "action": event.action.value,  # Enum -> String
-                "committed_at": event.committed_at,
-                "replication_message_trace_id": event.replication_message_trace_id,
-                "source_table_oid": event.source_table_oid,
-                "source_table_schema": event.source_table_schema,
-                "source_table_name": event.source_table_name,
-                "inserted_at": event.inserted_at
-            })
-        return jsonify(results), 200
+        if after is not None:
+            # Spelled out rather than as a row comparison so MySQL turns it into
+            # a range scan on the ordering columns.
+            committed_at, seq, event_id = after
+            query = query.filter(or_(
+                WalEvent.committed_at > committed_at,
+                and_(WalEvent.committed_at == committed_at, or_(
+                    WalEvent.seq > seq,
+                    and_(WalEvent.seq == seq, WalEvent.id > event_id)
+                ))
+            ))
+
+        # One row more than the page tells whether there is a next one.
+        query = query.order_by(WalEvent.committed_at, WalEvent.seq, WalEvent.id).limit(limit + 1)
+
+        def generate():
+            dumps = current_app.json.dumps
+            yield '{"events": ['
+            last = None
+            count = 0
+            more = False
+            for event in query.yield_per(STREAM_BATCH):
+                if count == limit:
+                    more = True
+                    continue
+                yield ("," if count else "") + dumps(serialize_wal_event(event))
+                last = event
+                count += 1
+            yield '], "next_cursor": ' + json.dumps(encode_cursor(last) if more else None) + "}"
+
+        return Response(stream_with_context(generate()), mimetype="application/json")
 
     @staticmethod
     @jwt_required()
@@ -111,28 +196,12 @@ class WalEventResource:
         """
         current_user_id = get_jwt_identity()
         event = (
-            WalEvent.query
-            .join(WalEvent.wal_pipeline)
-            .filter(WalEvent.id == event_id, WalEvent.wal_pipeline.has(user_id=current_user_id))
+            owned_wal_events(current_user_id)
+            .filter(WalEvent.id == event_id)
             .first_or_404()
         )
 
-        return jsonify({
-            "id": event.id,
-            "wal_pipeline_id": event.wal_pipeline_id,
-            "commit_lsn": event.commit_lsn,
-            "seq": event.seq,
-            "record_pks": event.record_pks,
-            "record": event.record,
-            "changes": event.changes,
-            "action": event.action.value,
-            "committed_at": event.committed_at,
-            "replication_message_trace_id": event.replication_message_trace_id,
-            "source_table_oid": event.source_table_oid,
-            "source_table_schema": event.source_table_schema,
-            "source_table_name": event.source_table_name,
-            "inserted_at": event.inserted_at
-        })
+        return jsonify(serialize_wal_event(event))
 
     @staticmethod
     @jwt_required()
@@ -185,9 +254,8 @@ class WalEventResource:
         """
         current_user_id = get_jwt_identity()
         event = (
-            WalEvent.query
-            .join(WalEvent.wal_pipeline)
-            .filter(WalEvent.id == event_id, WalEvent.wal_pipeline.has(user_id=current_user_id))
+            owned_wal_events(current_user_id)
+            .filter(WalEvent.id == event_id)
             .first_or_404()
         )
         data = request.json
@@ -240,9 +308,8 @@ class WalEventResource:
         """
         current_user_id = get_jwt_identity()
         event = (
-            WalEvent.query
-            .join(WalEvent.wal_pipeline)
-            .filter(WalEvent.id == event_id, WalEvent.wal_pipeline.has(user_id=current_user_id))
+            owned_wal_events(current_user_id)
+            .filter(WalEvent.id == event_id)
             .first_or_404()
         )
 
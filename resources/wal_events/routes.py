@@ -6,6 +6,7 @@
 
 import logging
 from flask import Blueprint
+from flask_jwt_extended import jwt_required
 from .resource import WalEventResource
 
 logging.basicConfig(level=logging.DEBUG)
@@ -16,23 +17,27 @@ wal_event_bp = Blueprint('wal_event_routes', __name__, url_prefix='/api/wal-even
 @wal_event_bp.route('/', methods=['GET'])
 def list_wal_events():
     """
-    Retrieve a list of WAL events with optional filtering.
+    Retrieve a page of WAL events with optional filtering.
 
     Query Parameters:
     -----------------
+    - `wal_pipeline_id` (string, optional): Only the events of this replication slot.
     - `source_table_name` (string, optional): Filter by table name.
     - `action` (string, optional): Filter by action type (`insert`, `update`, `delete`).
+    - `limit` (int, optional): Events per page (default 100, max 1000).
+    - `cursor` (string, optional): `next_cursor` of the previous page.
 
     Example Requests:
     -----------------
     - `GET /api/wal-events/`
+    - `GET /api/wal-events/?cursor=<next_cursor>`
     - `GET /api/wal-events/?source_table_name=users`
     - `GET /api/wal-events/?action=update`
     - `GET /api/wal-events/?source_table_name=orders&action=delete`
     """
     return WalEventResource.list_wal_events()
 
-@wal_event_bp.route('/<string:event_id>', methods=['GET'])
+@wal_event_bp.route('/<uuid:event_id>', methods=['GET'])
 def get_wal_event(event_id):
     """
     Retrieve details of a specific WAL event.
@@ -51,7 +56,7 @@ def create_wal_event():
     """
     return WalEventResource.create_wal_event()
 
-@wal_event_bp.route('/<string:event_id>', methods=['PUT'])
+@wal_event_bp.route('/<uuid:event_id>', methods=['PUT'])
 @jwt_required()
 def update_wal_event(event_id):
     """
@@ -59,7 +64,7 @@ def update_wal_event(event_id):
     """
     return WalEventResource.update_wal_event(event_id)
 
-@wal_event_bp.route('/<string:event_id>', methods=['DELETE'])
+@wal_event_bp.route('/<uuid:event_id>', methods=['DELETE'])
 def delete_wal_event(event_id):
     """
     Delete a specific WAL event.
@@ -0,0 +1,99 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/appdb.py
+"""
+Connection settings for the "application DB" (MySQL) the listener reads its slots
+from, shared by everything in the listener that talks to it directly with PyMySQL.
+Reads the ENV variables DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME.
+"""
+import os
+import queue
+import logging
+import contextlib
+
+import pymysql
+from pymysql.cursors import DictCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+APPDB_USER = os.getenv('DB_USER', 'DB_USER NOT SET!')
+APPDB_PASSWORD = os.getenv('DB_PASSWORD', 'DB_PASSWORD NOT SET!')
+APPDB_HOST = os.getenv('DB_HOST', 'DB_HOST NOT SET!')
+APPDB_NAME = os.getenv('DB_NAME', 'DB_NAME NOT SET!')
+APPDB_PORT = int(os.getenv("DB_PORT", 'DB_PORT NOT SET!'))
+
+DEFAULT_POOL_SIZE = int(os.getenv("WAL_APPDB_POOL_SIZE", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+def connect(**kwargs):
+    """
+    Open a new PyMySQL connection to the application DB (DictCursor rows).
+    """
+    options = {
+        "host": APPDB_HOST,
+        "port": APPDB_PORT,
+        "user": APPDB_USER,
+        "password": APPDB_PASSWORD,
+        "database": APPDB_NAME,
+        "cursorclass": DictCursor,
+    }
+    options.update(kwargs)
+    return pymysql.connect(**options)
+
+
+class ConnectionPool:
+    """
+    A few long-lived autocommit connections, reused instead of opening a new one
+    per query. Autocommit matters: a pooled connection left inside a REPEATABLE
+    READ transaction would keep answering from its first snapshot.
+
+    Usage:
+        pool = ConnectionPool()
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(...)
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, connect_fn=None):
+        self.size = max(1, int(size))
+        self._connect = connect_fn or connect
+        self._idle = queue.LifoQueue(maxsize=self.size)
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+            conn.ping(reconnect=True)
+        except queue.Empty:
+            conn = self._connect(autocommit=True)
+        try:
+            yield conn
+        except Exception:
+            # The connection may be in an unknown state; do not hand it out again.
+            self._discard(conn)
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug("🐞 Closing pooled app DB connection failed: %s", e)
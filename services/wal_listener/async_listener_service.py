@@ -0,0 +1,306 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/async_listener_service.py
+"""
+Event-loop engine for the WAL listener.
+
+Instead of one OS thread per customer database, every active slot's SlotStream is
+registered on a single asyncio loop with `loop.add_reader()` on its connection's
+file descriptor. When a socket becomes readable the slot drains at most
+`max_batch` messages with the non-blocking `read_message()` and yields, so one busy
+slot cannot starve the others; idle slots cost nothing but a registered fd.
+
+Blocking work stays off the loop: connecting, START_REPLICATION and the final
+writer flush run in a small thread pool. Each slot still has its WalEventWriter
+thread, which sits blocked on its queue while the slot is idle. A transaction that
+spilled to disk is handed to its writer in bounded chunks, which can briefly hold
+up the loop while the writer catches up.
+
+Select it with WAL_ENGINE=asyncio when starting wal_listener_service.py.
+"""
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+try:
+    from .wal_listener_service import WALListenerService, STREAM_POLL_INTERVAL
+    from .slot_stream import SlotStream, StreamError
+    from .wal_event_writer import WriterStopped
+    from .reconnect import Backoff, RecoveryStats
+    from .metrics import REGISTRY
+except ImportError:
+    from wal_listener_service import WALListenerService, STREAM_POLL_INTERVAL
+    from slot_stream import SlotStream, StreamError
+    from wal_event_writer import WriterStopped
+    from reconnect import Backoff, RecoveryStats
+    from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Messages a slot may handle per readiness callback before yielding to the others.
+DEFAULT_MAX_BATCH = int(os.getenv("WAL_ASYNC_MAX_BATCH", "500"))
+# Threads for blocking slot setup/teardown (connect, START_REPLICATION, writer flush).
+DEFAULT_OPEN_WORKERS = int(os.getenv("WAL_ASYNC_OPEN_WORKERS", "8"))
+# How often a slot paused by a full writer queue is checked for room.
+PAUSE_CHECK_INTERVAL = 0.05
+
+
+class AsyncWALListenerService(WALListenerService):
+    """
+    Same contract as WALListenerService (slots come from fetch_active_slots every
+    `check_interval` seconds), but all slots share one event loop.
+    """
+
+    def __init__(self, check_interval=3, max_batch=DEFAULT_MAX_BATCH,
+                 open_workers=DEFAULT_OPEN_WORKERS):
+        super().__init__(check_interval)
+        self.max_batch = max(1, int(max_batch))
+        self.open_workers = open_workers
+        # track { db_id -> SlotStream } for slots registered on the loop
+        self.streams = {}
+        self._fds = {}
+        # track { db_id -> (Backoff, RecoveryStats) } and when a failed slot may reconnect
+        self.recovery = {}
+        self._retry_at = {}
+        self._paused = set()    # db_ids whose reader is parked by backpressure
+        self._opening = set()
+        self._tasks = set()
+        self._loop = None
+        self._executor = None
+        self._wake = None
+
+    def start(self):
+        logger.info("WAL Listener Service (asyncio) started.")
+        asyncio.run(self.run())
+
+    def stop(self):
+        logger.info("Stopping WAL Listener Service...")
+        self.run_flag = False
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def wake(self, full=False):
+        if full:
+            self.catalog.request_full()
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.open_workers,
+                                            thread_name_prefix="wal-open")
+        self._wake = asyncio.Event()
+        feedback = asyncio.create_task(self._feedback_ticker())
+        try:
+            while self.run_flag:
+                try:
+                    await self.refresh_subscriptions()
+                except Exception as e:
+                    logger.exception("Error refreshing subscriptions: %s", e)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.check_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            feedback.cancel()
+            await asyncio.gather(*(self.remove_stream(db_id) for db_id in list(self.streams)))
+            self._executor.shutdown(wait=True)
+            self.release_leases()
+
+    async def refresh_subscriptions(self):
+        """
+        Open streams for newly active (and owned) slots and close the ones no
+        longer active.
+        """
+        active_slots = await self._loop.run_in_executor(self._executor, self.owned_slots)
+        desired = {}
+        for row in active_slots:
+            desired.setdefault(row["db_id"], row)
+
+        for db_id in list(self.streams):
+            if db_id not in desired:
+                logger.info("db_id=%s: Stopping WAL stream", db_id)
+                await self.remove_stream(db_id)
+
+        for db_id in list(self.recovery):
+            if db_id not in desired:
+                self.recovery.pop(db_id, None)
+                self._retry_at.pop(db_id, None)
+        REGISTRY.retain(row["slot_name"] for row in desired.values())
+
+        now = self._loop.time()
+        for db_id, row in desired.items():
+            if db_id not in self.streams and db_id not in self._opening:
+                if self._retry_at.get(db_id, 0) > now:
+                    continue  # backing off after a failure
+                logger.info("Starting new WAL stream for db_id=%s", db_id)
+                self._opening.add(db_id)
+                self._spawn(self._open_stream(row))
+
+    async def _open_stream(self, row):
+        db_id = row["db_id"]
+        stream = SlotStream(db_id, row["conn_details"], row["slot_name"], row["publication_name"],
+                            annotations=row.get("annotations"), lease=row.get("lease"))
+        opened = False
+        try:
+            opened = await self._loop.run_in_executor(self._executor, stream.open)
+        except Exception as e:
+            delay = self._failed(db_id, e)
+            logger.error("🚨 db_id=%s: Could not start WAL stream: %s. Retrying in %.1fs", db_id, e, delay)
+        finally:
+            self._opening.discard(db_id)
+
+        if not opened or not self.run_flag:
+            await self._loop.run_in_executor(self._executor, stream.close)
+            return
+        if db_id in self.recovery:
+            elapsed = self.recovery[db_id][1].recovered()
+            if elapsed is not None:
+                logger.info("ℹ️ db_id=%s: Replication resumed after %.1fs", db_id, elapsed)
+        self.add_stream(db_id, stream)
+
+    def add_stream(self, db_id, stream):
+        """
+        Multiplex an opened stream (anything with fileno(), poll() and
+        send_feedback()) on the running loop.
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        fd = stream.fileno()
+        self.streams[db_id] = stream
+        stream.on_blocked = self._keepalive_others
+        self._fds[db_id] = fd
+        self._loop.add_reader(fd, self._on_readable, db_id, stream)
+        # libpq may already hold messages in its buffer that the fd will not signal.
+        self._loop.call_soon(self._on_readable, db_id, stream)
+
+    async def remove_stream(self, db_id):
+        stream = self.streams.pop(db_id, None)
+        fd = self._fds.pop(db_id, None)
+        if stream is None:
+            return
+        if fd is not None and db_id not in self._paused:
+            self._loop.remove_reader(fd)
+        self._paused.discard(db_id)
+        stream.run_status["running"] = False
+        if self._executor is not None:
+            await self._loop.run_in_executor(self._executor, stream.close)
+        else:
+            stream.close()
+
+    def _keepalive_others(self, blocked):
+        """
+        A stream is persisting a spilled transaction and blocks the loop until its
+        writer has taken all of it: keep the other slots' connections alive.
+        Their errors surface on their next poll().
+        """
+        for stream in list(self.streams.values()):
+            if stream is not blocked:
+                try:
+                    stream.send_keepalive()
+                except psycopg2.Error:
+                    pass
+
+    def _on_readable(self, db_id, stream):
+        if self.streams.get(db_id) is not stream:
+            return  # removed while this callback was pending
+        try:
+            handled = stream.poll(self.max_batch)
+        except RuntimeError as e:
+            logger.info("ℹ️ db_id=%s: Stopping WAL stream due to: %s", db_id, e)
+        except (psycopg2.Error, WriterStopped, StreamError) as e:
+            delay = self._failed(db_id, e)
+            logger.error("🚨 db_id=%s error in WAL stream: %s. Reconnecting in %.1fs", db_id, e, delay)
+        else:
+            if stream.paused:
+                self._pause_reader(db_id, stream)
+            elif handled >= self.max_batch:
+                # More may be buffered inside libpq; carry on after the other slots.
+                self._loop.call_soon(self._on_readable, db_id, stream)
+            return
+        self._spawn(self.remove_stream(db_id))
+
+    def _pause_reader(self, db_id, stream):
+        """
+        The slot's writer queue is full: stop watching its socket (it stays
+        readable, which would spin the loop) and check back for room later.
+        """
+        if db_id in self._paused:
+            return  # already parked, its check is scheduled
+        self._loop.remove_reader(self._fds[db_id])
+        self._paused.add(db_id)
+        self._loop.call_later(PAUSE_CHECK_INTERVAL, self._check_paused, db_id, stream)
+
+    def _check_paused(self, db_id, stream):
+        if self.streams.get(db_id) is not stream:
+            return  # removed meanwhile; remove_stream() cleaned up
+        if stream.paused:
+            try:
+                stream.keepalive()
+            except psycopg2.Error as e:
+                delay = self._failed(db_id, e)
+                logger.error("🚨 db_id=%s error in WAL stream: %s. Reconnecting in %.1fs", db_id, e, delay)
+                self._paused.discard(db_id)
+                self._spawn(self.remove_stream(db_id))
+                return
+            self._loop.call_later(PAUSE_CHECK_INTERVAL, self._check_paused, db_id, stream)
+            return
+        self._paused.discard(db_id)
+        self._loop.add_reader(self._fds[db_id], self._on_readable, db_id, stream)
+        self._loop.call_soon(self._on_readable, db_id, stream)
+
+    async def _feedback_ticker(self):
+        """
+        Confirm persisted positions of slots that have gone quiet; busy slots send
+        feedback from poll() already.
+        """
+        while True:
+            await asyncio.sleep(STREAM_POLL_INTERVAL)
+            for db_id, stream in list(self.streams.items()):
+                try:
+                    stream.send_feedback()
+                except psycopg2.Error as e:
+                    delay = self._failed(db_id, e)
+                    logger.error("🚨 db_id=%s error sending feedback: %s. Reconnecting in %.1fs",
+                                 db_id, e, delay)
+                    self._spawn(self.remove_stream(db_id))
+
+    def active_streams(self):
+        return list(self.streams.values())
+
+    def pipeline_stats(self):
+        return [stream.pipeline_stats() for stream in self.active_streams()]
+
+    def recovery_stats(self):
+        return [stats.stats() for _, stats in self.recovery.values()]
+
+    def _failed(self, db_id, error):
+        """
+        Record a failure of `db_id` and schedule its reconnect; returns the delay.
+        """
+        backoff, stats = self.recovery.setdefault(db_id, (Backoff(), RecoveryStats(db_id)))
+        if not stats.in_outage and backoff.attempts:
+            backoff.reset()  # a new outage after a successful reconnect
+        stats.failed(error)
+        delay = backoff.next()
+        self._retry_at[db_id] = self._loop.time() + delay
+        self._spawn(self._wake_after(delay))
+        return delay
+
+    async def _wake_after(self, delay):
+        await asyncio.sleep(delay)
+        self._wake.set()
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
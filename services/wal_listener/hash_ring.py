@@ -0,0 +1,78 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/hash_ring.py
+"""
+Consistent-hash ring used to assign replication slots (keyed by db_id) to
+listener workers. Each node is placed on the ring `replicas` times, so keys spread
+evenly, and adding or removing a node only moves the keys that land on (or leave)
+that node, roughly 1/N of them.
+"""
+import bisect
+import hashlib
+
+DEFAULT_REPLICAS = 128
+
+
+def _hash(value) -> int:
+    return int.from_bytes(hashlib.md5(str(value).encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Usage:
+        ring = HashRing(["worker-0", "worker-1"])
+        ring.node_for(db_id)    # -> "worker-1"
+        ring.add_node("worker-2")
+    """
+
+    def __init__(self, nodes=(), replicas=DEFAULT_REPLICAS):
+        self.replicas = replicas
+        self._points = []   # sorted hashes
+        self._owners = {}   # hash -> node
+        self._nodes = set()
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self):
+        return sorted(self._nodes, key=str)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    def add_node(self, node):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point in self._owners:
+                continue  # astronomically unlikely collision; first owner keeps it
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove_node(self, node):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                self._points.pop(bisect.bisect_left(self._points, point))
+
+    def node_for(self, key):
+        """
+        The node owning `key`, or None if the ring is empty.
+        """
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
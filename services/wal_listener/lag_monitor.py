@@ -0,0 +1,435 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/lag_monitor.py
+"""
+Background monitor of how far behind each slot is on its source server and how
+much WAL the slot makes that server keep.
+
+Every `interval` seconds the LagMonitor reads `pg_replication_slots` on every
+source database that has a tracked slot (one query per database, covering all of
+its slots) and stores a row per slot in `replication_slot_lag_samples`:
+
+  - lag_bytes:      server WAL position - confirmed_flush_lsn (not yet persisted by us)
+  - retained_bytes: server WAL position - restart_lsn (WAL the server cannot recycle;
+                    this is what fills the customer's disk)
+  - lag_seconds:    how long ago the server was at confirmed_flush_lsn, interpolated
+                    from earlier samples of the server's WAL position
+
+Source databases are sampled concurrently by `workers` threads over a SourcePool
+of reusable connections. Each source gets `timeout` seconds (connect timeout and
+statement_timeout); one that fails or hangs is skipped, with backoff, without
+delaying the others.
+"""
+import os
+import math
+import time
+import logging
+import threading
+import contextlib
+import collections
+import concurrent.futures
+
+import psycopg2
+
+try:
+    from .appdb import ConnectionPool
+    from .lsn_tracker import parse_lsn, format_lsn
+    from .reconnect import Backoff
+except ImportError:
+    from appdb import ConnectionPool
+    from lsn_tracker import parse_lsn, format_lsn
+    from reconnect import Backoff
+
+logger = logging.getLogger(__name__)
+
+LAG_MONITOR_ENABLED = os.getenv("WAL_LAG_MONITOR", "on").lower() not in ("off", "false", "0")
+DEFAULT_LAG_INTERVAL = float(os.getenv("WAL_LAG_INTERVAL_SECONDS", "30"))
+DEFAULT_LAG_WORKERS = int(os.getenv("WAL_LAG_WORKERS", "4"))
+DEFAULT_LAG_TIMEOUT = float(os.getenv("WAL_LAG_TIMEOUT_SECONDS", "5"))
+DEFAULT_SOURCE_POOL_SIZE = int(os.getenv("WAL_LAG_POOL_SIZE", "16"))
+DEFAULT_LAG_RETENTION = float(os.getenv("WAL_LAG_RETENTION_HOURS", "168")) * 3600.0
+
+# How far back the in-memory WAL position history (used for lag_seconds) goes;
+# older lags are reported as at least this long.
+HISTORY_SECONDS = 24 * 3600
+PURGE_INTERVAL = 3600
+PURGE_BATCH = 10000
+
+# One row per requested slot name; slots missing on the server come back with NULLs.
+# wal_status only exists on PostgreSQL 13+, hence to_jsonb().
+SLOT_LAG_QUERY = """
+SELECT n.slot_name,
+       s.active,
+       s.restart_lsn::text AS restart_lsn,
+       s.confirmed_flush_lsn::text AS confirmed_flush_lsn,
+       to_jsonb(s) ->> 'wal_status' AS wal_status,
+       w.wal_lsn
+FROM unnest(%s::text[]) AS n(slot_name)
+CROSS JOIN (
+  SELECT (CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()
+               ELSE pg_current_wal_lsn() END)::text AS wal_lsn
+) w
+LEFT JOIN pg_replication_slots s ON s.slot_name = n.slot_name
+"""
+
+INSERT_SAMPLE = """
+INSERT INTO replication_slot_lag_samples
+  (slot_id, sampled_at, wal_lsn, confirmed_flush_lsn, restart_lsn,
+   lag_bytes, retained_bytes, lag_seconds, active, wal_status)
+VALUES (%s, NOW(6), %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+PURGE_SAMPLES = """
+DELETE FROM replication_slot_lag_samples
+WHERE sampled_at < NOW(6) - INTERVAL %s SECOND
+LIMIT %s
+"""
+
+
+def source_key(conn_details):
+    """
+    Identifies one source database: connections and WAL positions are per database.
+    """
+    return (conn_details.get("host"), conn_details.get("port"),
+            conn_details.get("dbname"), conn_details.get("user"))
+
+
+class SourcePool:
+    """
+    Idle connections to source databases, one per source_key(), reused across
+    polls. At most `size` are kept; the least recently used is closed first.
+
+    Usage:
+        pool = SourcePool(timeout=5)
+        with pool.connection(conn_details) as conn:
+            ...
+    """
+
+    def __init__(self, size=DEFAULT_SOURCE_POOL_SIZE, timeout=DEFAULT_LAG_TIMEOUT):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self._idle = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def connection(self, conn_details):
+        key = source_key(conn_details)
+        with self._lock:
+            conn = self._idle.pop(key, None)
+        if conn is None or conn.closed:
+            conn = self._connect(conn_details)
+        try:
+            yield conn
+        except Exception:
+            self._discard(conn)
+            raise
+        evicted = []
+        with self._lock:
+            if key in self._idle:
+                evicted.append(conn)
+            else:
+                self._idle[key] = conn
+            while len(self._idle) > self.size:
+                evicted.append(self._idle.popitem(last=False)[1])
+        for stale in evicted:
+            self._discard(stale)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle.values()), collections.OrderedDict()
+        for conn in idle:
+            self._discard(conn)
+
+    def _connect(self, conn_details):
+        options = dict(conn_details)
+        options.update({
+            "connect_timeout": max(1, math.ceil(self.timeout)),
+            "options": f"-c statement_timeout={int(self.timeout * 1000)}",
+            "application_name": "smartcdc_lag_monitor",
+            # A source that vanishes mid-query is noticed by the kernel, not after hours.
+            "keepalives": 1,
+            "keepalives_idle": max(1, math.ceil(self.timeout)),
+            "keepalives_interval": 1,
+            "keepalives_count": 3,
+        })
+        conn = psycopg2.connect(**options)
+        conn.autocommit = True
+        return conn
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug("🐞 Closing source connection failed: %s", e)
+
+
+def lag_seconds(history, confirmed_lsn, wal_lsn, now):
+    """
+    Seconds since the server's WAL position passed `confirmed_lsn`, from
+    `history` [(time, wal_lsn), ...] oldest first (including the current sample).
+    """
+    if confirmed_lsn is None or wal_lsn is None:
+        return None
+    if confirmed_lsn >= wal_lsn:
+        return 0.0
+    later = None
+    for at, lsn in reversed(history):
+        if lsn <= confirmed_lsn:
+            if later is None:
+                return max(0.0, now - at)
+            # The server crossed confirmed_lsn between these two samples.
+            passed_at = at + (later[0] - at) * (confirmed_lsn - lsn) / (later[1] - lsn)
+            return max(0.0, now - passed_at)
+        later = (at, lsn)
+    # Behind everything we remember: at least as old as the oldest sample
+    # (unknown right after a restart, when that is the current one).
+    if len(history) < 2:
+        return None
+    return max(0.0, now - history[0][0])
+
+
+class LagMonitor:
+    """
+    Usage:
+        monitor = LagMonitor(app_db_pool)
+        monitor.track(rows)      # slot rows as returned by SlotCatalog; starts the thread
+        monitor.latest           # { slot_id -> last sample }
+        monitor.stop()
+    """
+
+    def __init__(self, pool=None, interval=DEFAULT_LAG_INTERVAL, workers=DEFAULT_LAG_WORKERS,
+                 timeout=DEFAULT_LAG_TIMEOUT, retention=DEFAULT_LAG_RETENTION, source_pool=None):
+        self.pool = pool or ConnectionPool()
+        self.interval = interval
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.retention = retention
+        self.source_pool = source_pool or SourcePool(timeout=timeout)
+
+        self.latest = {}
+        self._slots = []
+        # track { source_key -> deque of (time, wal_lsn) }
+        self._history = {}
+        # track { source_key -> (Backoff, retry_at, last_error) } of failing sources
+        self._failing = {}
+        # track { source_key -> monotonic time its query started, None while queued }
+        self._in_flight = {}
+        self._missing = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = self._new_executor()
+        self._purged_at = 0.0
+
+        self.polls = 0
+        self.samples_stored = 0
+        self.last_poll_seconds = None
+
+    def track(self, rows):
+        """
+        Monitor exactly these slots from the next poll on.
+        """
+        with self._lock:
+            self._slots = list(rows)
+        self.start()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        if self._executor is None:
+            self._executor = self._new_executor()
+        self._thread = threading.Thread(target=self._run, name="wal-lag-monitor", daemon=True)
+        self._thread.start()
+        logger.info("ℹ️ Lag monitor started (every %.0fs, %d workers)", self.interval, self.workers)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout * 2 + 1)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.source_pool.close()
+
+    def _new_executor(self):
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                     thread_name_prefix="wal-lag-source")
+
+    def stats(self):
+        with self._lock:
+            failing = {f"{key[0]}:{key[1]}/{key[2]}": error for key, (_, _, error) in self._failing.items()}
+        return {
+            "slots": len(self._slots),
+            "polls": self.polls,
+            "samples_stored": self.samples_stored,
+            "last_poll_seconds": self.last_poll_seconds,
+            "failing_sources": failing,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+                if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+                    self._purge()
+            except Exception as e:
+                logger.exception("Lag monitor poll failed: %s", e)
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def poll_once(self):
+        """
+        Sample every tracked slot once and store the samples. Returns them.
+        """
+        started = time.monotonic()
+        with self._lock:
+            slots = list(self._slots)
+        sources = collections.defaultdict(list)
+        for row in slots:
+            sources[source_key(row["conn_details"])].append(row)
+
+        futures = {}
+        for key, rows in sources.items():
+            if key in self._in_flight or self._backing_off(key):
+                continue
+            self._in_flight[key] = None
+            future = self._executor.submit(self._sample_source, key, rows)
+            future.add_done_callback(lambda _, key=key: self._in_flight.pop(key, None))
+            futures[future] = key
+
+        done, not_done = concurrent.futures.wait(futures, timeout=self.timeout * 2)
+        samples = []
+        for future in done:
+            key = futures[future]
+            try:
+                samples.extend(future.result())
+                self._succeeded(key)
+            except Exception as e:
+                self._failed(key, e)
+        now = time.monotonic()
+        for future in not_done:
+            key = futures[future]
+            if future.cancel():
+                continue  # still queued behind slower sources; sampled next time
+            started_at = self._in_flight.get(key)
+            if started_at is not None and now - started_at >= self.timeout:
+                # Its thread stays busy until the source answers or the keepalives
+                # give up; the source is skipped until then.
+                self._failed(key, TimeoutError(f"no answer within {self.timeout:g}s"))
+
+        for key in set(self._history) - set(sources):
+            self._history.pop(key, None)
+        tracked = {row["slot_id"] for row in slots}
+        with self._lock:
+            for slot_id in set(self.latest) - tracked:
+                del self.latest[slot_id]
+        self._store(samples)
+        self.polls += 1
+        self.last_poll_seconds = time.monotonic() - started
+        return samples
+
+    def _sample_source(self, key, rows):
+        self._in_flight[key] = time.monotonic()
+        with self.source_pool.connection(rows[0]["conn_details"]) as conn:
+            with conn.cursor() as cur:
+                cur.execute(SLOT_LAG_QUERY, (sorted({row["slot_name"] for row in rows}),))
+                found = {record[0]: record for record in cur.fetchall()}
+
+        now = time.time()
+        wal_lsn = parse_lsn(next(iter(found.values()))[5]) if found else None
+        history = self._history.get(key)
+        if history is None:
+            history = self._history[key] = collections.deque()
+        if wal_lsn is not None:
+            history.append((now, wal_lsn))
+            while history and now - history[0][0] > HISTORY_SECONDS:
+                history.popleft()
+
+        samples = []
+        for row in rows:
+            _, active, restart, confirmed, wal_status, _ = found[row["slot_name"]]
+            restart_lsn = parse_lsn(restart)
+            confirmed_lsn = parse_lsn(confirmed)
+            if active is None:
+                wal_status = "missing"
+                if row["slot_id"] not in self._missing:
+                    self._missing.add(row["slot_id"])
+                    logger.warning("⚠️ db_id=%s: Replication slot %s does not exist on its source",
+                                   row["db_id"], row["slot_name"])
+            else:
+                self._missing.discard(row["slot_id"])
+            if wal_status in ("unreserved", "lost"):
+                logger.warning("⚠️ db_id=%s: Slot %s wal_status=%s; the server is about to (or did) "
+                               "remove WAL the slot still needs", row["db_id"], row["slot_name"], wal_status)
+            sample = {
+                "slot_id": row["slot_id"],
+                "db_id": row["db_id"],
+                "sampled_at": now,
+                "wal_lsn": wal_lsn,
+                "confirmed_flush_lsn": confirmed_lsn,
+                "restart_lsn": restart_lsn,
+                "lag_bytes": (max(0, wal_lsn - confirmed_lsn)
+                              if wal_lsn is not None and confirmed_lsn is not None else None),
+                "retained_bytes": (max(0, wal_lsn - restart_lsn)
+                                   if wal_lsn is not None and restart_lsn is not None else None),
+                "lag_seconds": lag_seconds(history, confirmed_lsn, wal_lsn, now),
+                "active": active,
+                "wal_status": wal_status,
+            }
+            samples.append(sample)
+            logger.debug("🐞 db_id=%s: slot %s lag=%s bytes / %s s, retained=%s bytes (confirmed %s)",
+                         row["db_id"], row["slot_name"], sample["lag_bytes"], sample["lag_seconds"],
+                         sample["retained_bytes"],
+                         format_lsn(confirmed_lsn) if confirmed_lsn is not None else None)
+        return samples
+
+    def _store(self, samples):
+        if not samples:
+            return
+        values = [(s["slot_id"], s["wal_lsn"], s["confirmed_flush_lsn"], s["restart_lsn"],
+                   s["lag_bytes"], s["retained_bytes"], s["lag_seconds"], s["active"], s["wal_status"])
+                  for s in samples]
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(INSERT_SAMPLE, values)
+        except Exception as e:
+            logger.error("❌ Could not store %d lag samples: %s", len(values), e)
+        else:
+            self.samples_stored += len(values)
+        with self._lock:
+            for sample in samples:
+                self.latest[sample["slot_id"]] = sample
+
+    def _purge(self):
+        deleted = PURGE_BATCH
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                while deleted >= PURGE_BATCH and not self._stop.is_set():
+                    deleted = cur.execute(PURGE_SAMPLES, (int(self.retention), PURGE_BATCH))
+        self._purged_at = time.monotonic()
+
+    def _backing_off(self, key):
+        with self._lock:
+            failing = self._failing.get(key)
+        return failing is not None and time.monotonic() < failing[1]
+
+    def _succeeded(self, key):
+        with self._lock:
+            if self._failing.pop(key, None) is not None:
+                logger.info("ℹ️ Lag monitor: source %s:%s/%s answers again", *key[:3])
+
+    def _failed(self, key, error):
+        with self._lock:
+            backoff = self._failing[key][0] if key in self._failing else Backoff(self.interval, 10 * self.interval)
+            delay = backoff.next()
+            self._failing[key] = (backoff, time.monotonic() + delay, str(error))
+        logger.warning("⚠️ Lag monitor: source %s:%s/%s failed (%s); skipping it for %.0fs",
+                       key[0], key[1], key[2], error, delay)
@@ -0,0 +1,143 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/lsn_tracker.py
+"""
+Tracks how far a replication slot has been received and durably persisted, and
+decides when to acknowledge it to Postgres.
+
+The replication thread reports every message it receives; the WalEventWriter
+reports the end LSN of every transaction that reached `wal_events`. Feedback only
+ever confirms the persisted position, so Postgres never recycles WAL we have not
+written, and it is coalesced: sent once per `interval` or once `max_pending_bytes`
+of persisted WAL is waiting to be confirmed, instead of once per message.
+"""
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEEDBACK_INTERVAL = float(os.getenv("WAL_FEEDBACK_INTERVAL_MS", "1000")) / 1000.0
+DEFAULT_FEEDBACK_MAX_BYTES = int(os.getenv("WAL_FEEDBACK_MAX_BYTES", str(16 * 1024 * 1024)))
+# While reads are paused, a status update is sent at least this often so the
+# server's wal_sender_timeout (60s by default) does not drop the connection.
+DEFAULT_KEEPALIVE_INTERVAL = float(os.getenv("WAL_KEEPALIVE_INTERVAL_SECONDS", "10"))
+
+
+def format_lsn(lsn: int) -> str:
+    """
+    Render an integer LSN the way Postgres prints it, e.g. 16/B374D848.
+    """
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+def parse_lsn(text):
+    """
+    Inverse of format_lsn(): '16/B374D848' -> int. None stays None.
+    """
+    if text is None:
+        return None
+    high, low = text.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class FlushLsnTracker:
+    """
+    Received/flushed LSN bookkeeping for one slot.
+
+    `received()` and `maybe_send_feedback()` are called from the replication thread
+    (the only thread allowed to touch the replication cursor); `flushed()` is called
+    from the writer thread.
+    """
+
+    def __init__(self, db_id, interval=DEFAULT_FEEDBACK_INTERVAL,
+                 max_pending_bytes=DEFAULT_FEEDBACK_MAX_BYTES,
+                 keepalive_interval=DEFAULT_KEEPALIVE_INTERVAL):
+        self.db_id = db_id
+        self.interval = interval
+        self.max_pending_bytes = max_pending_bytes
+        self.keepalive_interval = keepalive_interval
+
+        self._lock = threading.Lock()
+        self.received_lsn = 0
+        self.flushed_lsn = 0
+        self.sent_lsn = 0
+        self._sent_at = time.monotonic()
+        self._feedback_count = 0
+        # When flushed_lsn first moved past sent_lsn; feedback delay is measured from it.
+        self._flushed_at = None
+        self.metrics = None
+
+    def received(self, lsn: int):
+        if lsn > self.received_lsn:
+            self.received_lsn = lsn
+
+    def flushed(self, lsn: int):
+        with self._lock:
+            if lsn > self.flushed_lsn:
+                self.flushed_lsn = lsn
+                if self._flushed_at is None:
+                    self._flushed_at = time.monotonic()
+
+    @property
+    def lag_bytes(self) -> int:
+        """
+        WAL received from Postgres but not yet persisted to `wal_events`.
+        """
+        return max(0, self.received_lsn - self.flushed_lsn)
+
+    def maybe_send_feedback(self, cursor, force=False) -> bool:
+        """
+        Confirm the persisted position to Postgres if it advanced and either the
+        interval elapsed or enough unconfirmed WAL has piled up. Returns True if a
+        standby status update was sent.
+        """
+        with self._lock:
+            flushed = self.flushed_lsn
+            flushed_at = self._flushed_at
+        if flushed <= self.sent_lsn and not force:
+            return False
+
+        now = time.monotonic()
+        if not force and (now - self._sent_at) < self.interval \
+                and (flushed - self.sent_lsn) < self.max_pending_bytes:
+            return False
+
+        cursor.send_feedback(flush_lsn=flushed, force=True)
+        self.sent_lsn = flushed
+        self._sent_at = now
+        self._feedback_count += 1
+        if flushed_at is not None:
+            with self._lock:
+                # Positions flushed after our snapshot are still waiting from about now.
+                self._flushed_at = None if self.flushed_lsn == flushed else now
+            if self.metrics is not None:
+                self.metrics.feedback_delay.observe(now - flushed_at)
+        logger.debug("🐞 db_id=%s: Sent feedback flush_lsn=%s (received=%s, lag=%d bytes)",
+                     self.db_id, format_lsn(flushed), format_lsn(self.received_lsn), self.lag_bytes)
+        return True
+
+    def keepalive(self, cursor) -> bool:
+        """
+        Send a status update if none was sent for `keepalive_interval`. Used while
+        the replication thread is not calling read_message(), which is what
+        normally answers the server's keepalive requests.
+        """
+        if time.monotonic() - self._sent_at < self.keepalive_interval:
+            return False
+        return self.maybe_send_feedback(cursor, force=True)
+
+    def stats(self):
+        return {
+            "db_id": self.db_id,
+            "received_lsn": format_lsn(self.received_lsn),
+            "flushed_lsn": format_lsn(self.flushed_lsn),
+            "confirmed_lsn": format_lsn(self.sent_lsn),
+            "lag_bytes": self.lag_bytes,
+            "feedback_sent": self._feedback_count,
+        }
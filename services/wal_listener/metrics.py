@@ -0,0 +1,280 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/metrics.py
+"""
+In-process metrics for the WAL pipeline, served in the Prometheus text format.
+
+Every slot gets a SlotMetrics (see `REGISTRY.slot()`), updated by the threads that
+already own the work being measured: the replication side (decode, transaction
+assembly, wal_event build, feedback) and the slot's WalEventWriter (MySQL writes,
+commit-to-persist lag). Each metric is only written by one thread, so updates are
+plain attribute/list increments without locks; a scrape reads them as they are.
+
+To stay well under 1% of throughput, the replication-side stages are sampled: only
+every `sample_every`-th message is timed (decode, assemble, and build when that
+message is a commit), so `wal_stage_seconds` counts samples, while the message and
+byte counters are exact. The writer's batches, commit-to-persist lag and feedback
+delay happen once per batch or transaction and are always recorded.
+
+Served by `start_metrics_server()` on WAL_METRICS_PORT (/metrics).
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("WAL_METRICS", "on").lower() not in ("off", "false", "0")
+METRICS_PORT = int(os.getenv("WAL_METRICS_PORT", "9108"))
+DEFAULT_SAMPLE_EVERY = max(1, int(os.getenv("WAL_METRICS_SAMPLE_EVERY", "32")))
+
+LATENCY_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+_MESSAGE_TYPES = {
+    ord('B'): "begin", ord('C'): "commit", ord('R'): "relation", ord('I'): "insert",
+    ord('U'): "update", ord('D'): "delete", ord('T'): "truncate", ord('Y'): "type",
+    ord('O'): "origin", ord('M'): "message", ord('S'): "stream_start", ord('E'): "stream_stop",
+    ord('c'): "stream_commit", ord('A'): "stream_abort",
+}
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; `observe()` is one bisect and three increments.
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels, out):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            out.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f'{name}_sum{{{labels}}} {self.sum:.9g}')
+        out.append(f'{name}_count{{{labels}}} {self.count}')
+
+
+class SlotMetrics:
+    """
+    Counters and histograms of one slot. Stage histograms are keyed by
+    (stage, message type); message type is "" for per-transaction stages.
+    """
+
+    def __init__(self, db_id, slot_name, sample_every=DEFAULT_SAMPLE_EVERY):
+        self.db_id = db_id
+        self.slot_name = slot_name
+        self.sample_every = sample_every
+        # Indexed by the message type byte and incremented inline by SlotStream.handle();
+        # two list increments are the whole per-message cost of the counters.
+        self.messages = [0] * 256
+        self.message_bytes = [0] * 256
+        self.stages = {}
+        self.rows_written = 0
+        self.write_batches = 0
+        self.feedback_delay = Histogram(LAG_BUCKETS)
+        self.commit_to_persist = Histogram(LAG_BUCKETS)
+        self._committed = deque()  # (ack_lsn, commit timestamp) awaiting persistence
+        # callable returning gauge values (SlotStream.pipeline_stats), set while streaming
+        self.gauges = None
+
+    def observe(self, stage, seconds, kind=""):
+        histogram = self.stages.get((stage, kind))
+        if histogram is None:
+            histogram = self.stages[(stage, kind)] = Histogram()
+        histogram.observe(seconds)
+
+    def committed(self, ack_lsn, commit_timestamp):
+        """
+        A source transaction was handed to the writer (replication side).
+        """
+        if commit_timestamp is not None:
+            self._committed.append((ack_lsn, commit_timestamp))
+
+    def persisted(self, lsn):
+        """
+        Everything up to `lsn` reached MySQL (writer side).
+        """
+        now = time.time()
+        committed = self._committed
+        while committed and committed[0][0] <= lsn:
+            _, commit_timestamp = committed.popleft()
+            self.commit_to_persist.observe(max(0.0, now - commit_timestamp.timestamp()))
+
+    def written(self, seconds, rows):
+        self.observe("write", seconds)
+        self.rows_written += rows
+        self.write_batches += 1
+
+    def render(self, out):
+        base = f'slot="{_escape(self.slot_name)}",db_id="{_escape(self.db_id)}"'
+        families = {}
+        for kind, count in enumerate(self.messages):
+            if not count:
+                continue
+            labels = f'{base},type="{_MESSAGE_TYPES.get(kind, chr(kind))}"'
+            families.setdefault("wal_messages_total", []).append(f"wal_messages_total{{{labels}}} {count}")
+            families.setdefault("wal_message_bytes_total", []).append(
+                f"wal_message_bytes_total{{{labels}}} {self.message_bytes[kind]}")
+        families["wal_rows_written_total"] = [f"wal_rows_written_total{{{base}}} {self.rows_written}"]
+        families["wal_write_batches_total"] = [f"wal_write_batches_total{{{base}}} {self.write_batches}"]
+
+        stage_lines = []
+        for (stage, kind), histogram in sorted(list(self.stages.items())):
+            labels = f'{base},stage="{stage}"' + (f',type="{_MESSAGE_TYPES.get(kind, kind)}"' if kind != "" else "")
+            histogram.render("wal_stage_seconds", labels, stage_lines)
+        families["wal_stage_seconds"] = stage_lines
+
+        feedback_lines = []
+        self.feedback_delay.render("wal_feedback_delay_seconds", base, feedback_lines)
+        families["wal_feedback_delay_seconds"] = feedback_lines
+        lag_lines = []
+        self.commit_to_persist.render("wal_commit_to_persist_seconds", base, lag_lines)
+        families["wal_commit_to_persist_seconds"] = lag_lines
+
+        gauges = self.gauges
+        if gauges is not None:
+            try:
+                values = gauges()
+            except Exception as e:
+                logger.debug("🐞 Could not read gauges of slot %s: %s", self.slot_name, e)
+                values = {}
+            for key, value in values.items():
+                if key == "db_id" or value is None:
+                    continue
+                families.setdefault(f"wal_{key}", []).append(f"wal_{key}{{{base}}} {float(value):g}")
+
+        for name, lines in families.items():
+            out.setdefault(name, []).extend(lines)
+
+
+class MetricsRegistry:
+    """
+    Usage:
+        metrics = REGISTRY.slot(db_id, slot_name)   # same object across reconnects
+        REGISTRY.render()                           # Prometheus text format
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def slot(self, db_id, slot_name):
+        with self._lock:
+            metrics = self._slots.get(slot_name)
+            if metrics is None:
+                metrics = self._slots[slot_name] = SlotMetrics(db_id, slot_name)
+            return metrics
+
+    def remove(self, slot_name):
+        with self._lock:
+            self._slots.pop(slot_name, None)
+
+    def retain(self, slot_names):
+        """
+        Drop the metrics of every slot not in `slot_names`.
+        """
+        keep = set(slot_names)
+        with self._lock:
+            for slot_name in [name for name in self._slots if name not in keep]:
+                del self._slots[slot_name]
+
+    def render(self) -> str:
+        with self._lock:
+            slots = list(self._slots.values())
+        families = {}
+        for metrics in slots:
+            metrics.render(families)
+        out = []
+        for name, lines in families.items():
+            kind = "histogram" if name in _HISTOGRAMS else "counter" if name.endswith("_total") else "gauge"
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+_HISTOGRAMS = {"wal_stage_seconds", "wal_feedback_delay_seconds", "wal_commit_to_persist_seconds"}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+    admin = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.admin is None:
+            self.send_error(404)
+            return
+        path, _, query = self.path.partition("?")
+        status, payload = self.admin(path, query)
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the log
+
+
+def start_metrics_server(port=METRICS_PORT, registry=REGISTRY, host="0.0.0.0", admin=None):
+    """
+    Serve `registry` on http://host:port/metrics from a daemon thread. POST
+    requests go to `admin(path, query) -> (status, dict)` when given (the
+    profiler's routes). Returns the server, or None if metrics are disabled or
+    the port is taken.
+    """
+    if not METRICS_ENABLED:
+        return None
+    handler = type("MetricsHandler", (_MetricsHandler,),
+                   {"registry": registry, "admin": staticmethod(admin) if admin else None})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.error("🚨 Could not serve metrics on port %s: %s", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="wal-metrics", daemon=True).start()
+    logger.info("ℹ️ Serving WAL listener metrics on :%s/metrics", port)
+    return server
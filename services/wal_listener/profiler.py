@@ -0,0 +1,321 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/profiler.py
+"""
+Opt-in profiling of a running listener (WAL_PROFILER=on), per slot and without a
+restart. Triggered with SIGUSR1 or the admin routes next to /metrics (see
+`handle_admin`); results are written to WAL_PROFILE_DIR.
+
+Modes of `profile_streams()`:
+
+  - "sample" (default): a sampler thread reads the stack of the slot's replication
+    work (only while that slot is inside `SlotStream.poll()`, so it also isolates one
+    slot on the asyncio engine) and of its WalEventWriter thread every `interval`
+    seconds, and writes collapsed stacks (`profile-<db_id>-<time>.collapsed`, one
+    "frame;frame;frame count" line per stack, for flamegraph.pl / speedscope).
+    Costs one sys._current_frames() call per interval; the slot itself only sets
+    one attribute per poll().
+  - "cprofile": runs cProfile around the slot's poll() calls and writes a pstats
+    file (`profile-<db_id>-<time>.pstats`). Exact call counts, but it slows the
+    profiled slot down noticeably and does not cover the writer thread.
+
+`tracemalloc_snapshot()` starts tracemalloc on the first call and, on each later
+call, writes the snapshot plus a report of the allocations that grew since the
+previous one, next to each slot's relation cache and transaction buffer sizes.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import cProfile
+import tempfile
+import threading
+import tracemalloc
+import collections
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILER_ENABLED = os.getenv("WAL_PROFILER", "off").lower() in ("on", "true", "1")
+PROFILE_DIR = os.getenv("WAL_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "smartcdc-profiles"))
+DEFAULT_PROFILE_SECONDS = float(os.getenv("WAL_PROFILE_SECONDS", "30"))
+DEFAULT_SAMPLE_INTERVAL = float(os.getenv("WAL_PROFILE_INTERVAL_MS", "5")) / 1000.0
+TRACEMALLOC_FRAMES = int(os.getenv("WAL_TRACEMALLOC_FRAMES", "25"))
+TRACEMALLOC_TOP = 40
+
+# Written next to the results; SIGUSR1 reads it (if present) for what to profile.
+REQUEST_FILE = "profile-request.json"
+
+_MODES = ("sample", "cprofile")
+
+
+class SlotProfile:
+    """
+    One profiling session of one slot. Attached as `stream.profile`; the stream
+    calls `enter()` / `leave()` around every poll(), from its own thread.
+    """
+
+    def __init__(self, stream, mode="sample"):
+        if mode not in _MODES:
+            raise ValueError(f"unknown profile mode {mode!r}")
+        self.stream = stream
+        self.mode = mode
+        self.samples = collections.Counter()
+        # Thread currently running this slot's poll(), None between polls.
+        self.thread = None
+        self.finished = False
+        self._profile = cProfile.Profile() if mode == "cprofile" else None
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def enter(self):
+        self._idle.clear()
+        if self._profile is not None:
+            self._profile.enable()
+        self.thread = threading.get_ident()
+
+    def leave(self):
+        self.thread = None
+        if self._profile is not None:
+            self._profile.disable()
+        self._idle.set()
+
+    def finish(self, timeout=5.0):
+        """
+        Detach from the stream and wait for a poll() in progress to leave.
+        Returns False if it did not (the cProfile data is then not safe to read).
+        """
+        self.finished = True
+        if self.stream.profile is self:
+            self.stream.profile = None
+        return self._idle.wait(timeout)
+
+    def write(self, directory, stamp):
+        name = f"profile-{self.stream.db_id}-{stamp}"
+        if self._profile is not None:
+            path = os.path.join(directory, f"{name}.pstats")
+            self._profile.dump_stats(path)
+        else:
+            path = os.path.join(directory, f"{name}.collapsed")
+            with open(path, "w") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        return path
+
+
+def _collapse(frame, root):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.append(root)
+    names.reverse()
+    return ";".join(names)
+
+
+def _sample(sessions, interval, deadline):
+    while time.monotonic() < deadline:
+        frames = sys._current_frames()
+        for session in sessions:
+            thread = session.thread
+            if thread is not None and thread in frames:
+                session.samples[_collapse(frames[thread], "replication")] += 1
+            writer_thread = getattr(session.stream.writer, "_thread", None)
+            if writer_thread is not None and writer_thread.ident in frames:
+                session.samples[_collapse(frames[writer_thread.ident], "writer")] += 1
+        del frames
+        time.sleep(interval)
+
+
+def profile_streams(streams, seconds=DEFAULT_PROFILE_SECONDS, mode="sample",
+                    interval=DEFAULT_SAMPLE_INTERVAL, directory=PROFILE_DIR):
+    """
+    Profile `streams` (SlotStreams) for `seconds`. Blocking; returns the paths
+    written, one per stream.
+    """
+    streams = [stream for stream in streams if getattr(stream, "profile", None) is None]
+    if not streams:
+        return []
+    os.makedirs(directory, exist_ok=True)
+    sessions = [SlotProfile(stream, mode) for stream in streams]
+    for session in sessions:
+        session.stream.profile = session
+    logger.info("ℹ️ Profiling db_id=%s for %gs (%s)",
+                ",".join(str(s.stream.db_id) for s in sessions), seconds, mode)
+    deadline = time.monotonic() + seconds
+    try:
+        if mode == "sample":
+            _sample(sessions, interval, deadline)
+        else:
+            time.sleep(seconds)
+    finally:
+        idle = [session.finish() for session in sessions]
+
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    paths = []
+    for session, left in zip(sessions, idle):
+        if not left:
+            logger.warning("⚠️ db_id=%s: poll() did not return; not writing its profile", session.stream.db_id)
+            continue
+        path = session.write(directory, stamp)
+        paths.append(path)
+        logger.info("ℹ️ db_id=%s: Wrote %s", session.stream.db_id, path)
+    return paths
+
+
+def pipeline_memory(streams):
+    """
+    Per-slot sizes of the structures that grow with traffic.
+    """
+    return [{
+        "db_id": stream.db_id,
+        "relation_cache": len(stream.relation_cache),
+        "tx_buffer": stream.tx_buffer.stats(),
+        "streamed_transactions": len(stream.streamed),
+        "streamed_changes": sum(len(buffer) for buffer in stream.streamed.values()),
+        "writer_pending_rows": stream.writer.stats().get("pending_rows") if stream.writer else None,
+    } for stream in streams]
+
+
+_last_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def tracemalloc_snapshot(streams=(), directory=PROFILE_DIR, frames=TRACEMALLOC_FRAMES, top=TRACEMALLOC_TOP):
+    """
+    Start tracing on the first call (returns None); afterwards write a snapshot
+    and a report of what grew since the previous call. Returns the report path.
+    """
+    global _last_snapshot
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            _last_snapshot = None
+            logger.info("ℹ️ tracemalloc started (%d frames); take another snapshot to see growth", frames)
+            return None
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        snapshot.dump(os.path.join(directory, f"tracemalloc-{stamp}.snapshot"))
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced: {current / 1048576:.1f} MiB (peak {peak / 1048576:.1f} MiB)", ""]
+        if _last_snapshot is not None:
+            lines.append(f"Top {top} growth since the previous snapshot:")
+            lines.extend(str(stat) for stat in snapshot.compare_to(_last_snapshot, "lineno")[:top])
+        else:
+            lines.append(f"Top {top} allocations:")
+            lines.extend(str(stat) for stat in snapshot.statistics("lineno")[:top])
+        lines += ["", "Per-slot pipeline sizes:"]
+        lines.extend(json.dumps(entry, default=str) for entry in pipeline_memory(streams))
+        _last_snapshot = snapshot
+
+    path = os.path.join(directory, f"tracemalloc-{stamp}.txt")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    logger.info("ℹ️ Wrote %s", path)
+    return path
+
+
+def stop_tracemalloc():
+    global _last_snapshot
+    with _snapshot_lock:
+        tracemalloc.stop()
+        _last_snapshot = None
+
+
+def _select(service, db_id):
+    streams = service.active_streams()
+    if db_id is None:
+        return streams
+    return [stream for stream in streams if str(stream.db_id) == str(db_id)]
+
+
+def start_profile(service, db_id=None, seconds=DEFAULT_PROFILE_SECONDS, mode="sample"):
+    """
+    Profile the slots of `service` (all, or the one of `db_id`) in a background
+    thread. Returns the number of slots being profiled.
+    """
+    if mode not in _MODES:
+        raise ValueError(f"unknown profile mode {mode!r}")
+    streams = _select(service, db_id)
+    if streams:
+        threading.Thread(target=profile_streams, args=(streams, seconds, mode),
+                         name="wal-profiler", daemon=True).start()
+    return len(streams)
+
+
+def handle_admin(service, path, query):
+    """
+    Admin routes served next to /metrics (POST):
+      /debug/profile?db_id=<id>&seconds=<n>&mode=sample|cprofile
+      /debug/tracemalloc?action=snapshot|stop
+    Returns (status, body dict).
+    """
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    try:
+        if path == "/debug/profile":
+            slots = start_profile(service, params.get("db_id"),
+                                  float(params.get("seconds", DEFAULT_PROFILE_SECONDS)),
+                                  params.get("mode", "sample"))
+            if not slots:
+                return 404, {"error": "no such slot on this listener"}
+            return 202, {"profiling": slots, "directory": PROFILE_DIR}
+        if path == "/debug/tracemalloc":
+            if params.get("action", "snapshot") == "stop":
+                stop_tracemalloc()
+                return 200, {"tracing": False}
+            report = tracemalloc_snapshot(_select(service, params.get("db_id")))
+            return 200, {"tracing": True, "report": report}
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    return 404, {"error": "not found"}
+
+
+def install_signal_handler(service, signum=getattr(signal, "SIGUSR1", None)):
+    """
+    On `signum`, profile what <WAL_PROFILE_DIR>/profile-request.json asks for
+    ({"db_id": ..., "seconds": ..., "mode": ..., "tracemalloc": true}) or, without
+    that file, every slot for WAL_PROFILE_SECONDS. Main thread only.
+    """
+    if signum is None:
+        return
+
+    def _handler(signo, frame):
+        request = {}
+        try:
+            with open(os.path.join(PROFILE_DIR, REQUEST_FILE)) as f:
+                request = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error("❌ Could not read %s: %s", REQUEST_FILE, e)
+            return
+        # Handlers run on the main thread between bytecodes; do the work elsewhere.
+        threading.Thread(target=_run_request, args=(service, request), daemon=True).start()
+
+    signal.signal(signum, _handler)
+    logger.info("ℹ️ Profiler armed: kill -%s %s", signal.Signals(signum).name, os.getpid())
+
+
+def _run_request(service, request):
+    try:
+        if request.get("tracemalloc"):
+            tracemalloc_snapshot(_select(service, request.get("db_id")))
+        else:
+            start_profile(service, request.get("db_id"),
+                          float(request.get("seconds", DEFAULT_PROFILE_SECONDS)),
+                          request.get("mode", "sample"))
+    except Exception as e:
+        logger.exception("Profiling request %s failed: %s", request, e)
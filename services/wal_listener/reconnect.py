@@ -0,0 +1,107 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/reconnect.py
+"""
+Reconnect pacing and time-to-recover bookkeeping for a slot's replication
+connection.
+
+Backoff grows exponentially from `base` up to `cap` and is jittered ("equal
+jitter": half the delay fixed, half random), so the slots of one source server
+that dropped together do not all reconnect in the same instant. RecoveryStats
+records each outage, from the first error until replication was started again,
+which is what `time_to_recover` reports.
+"""
+import os
+import time
+import random
+import threading
+
+DEFAULT_RECONNECT_BASE = float(os.getenv("WAL_RECONNECT_BASE_SECONDS", "1"))
+DEFAULT_RECONNECT_CAP = float(os.getenv("WAL_RECONNECT_MAX_SECONDS", "60"))
+
+
+class Backoff:
+    """
+    Usage:
+        backoff = Backoff()
+        delay = backoff.next()   # 0.5-1s, then 1-2s, 2-4s, ... up to `cap`
+        backoff.reset()          # after a successful reconnect
+    """
+
+    def __init__(self, base=DEFAULT_RECONNECT_BASE, cap=DEFAULT_RECONNECT_CAP, rng=None):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+        self._random = rng or random.Random()
+
+    def next(self) -> float:
+        delay = min(self.cap, self.base * (2 ** self.attempts))
+        self.attempts += 1
+        return delay / 2.0 + self._random.uniform(0, delay / 2.0)
+
+    def reset(self):
+        self.attempts = 0
+
+
+class RecoveryStats:
+    """
+    Outage/recovery counters for one slot. `failed()` marks the start of an outage
+    (repeated calls while it lasts only count attempts), `recovered()` its end.
+    """
+
+    def __init__(self, db_id):
+        self.db_id = db_id
+        self._lock = threading.Lock()
+        self.outage_started = None
+        self.attempts = 0
+        self.outages = 0
+        self.last_error = None
+        self.last_time_to_recover = None
+        self.max_time_to_recover = 0.0
+        self.total_time_to_recover = 0.0
+
+    @property
+    def in_outage(self) -> bool:
+        return self.outage_started is not None
+
+    def failed(self, error):
+        with self._lock:
+            if self.outage_started is None:
+                self.outage_started = time.monotonic()
+                self.outages += 1
+            self.attempts += 1
+            self.last_error = str(error)
+
+    def recovered(self):
+        """
+        End the current outage; returns its duration in seconds, or None if
+        there was none.
+        """
+        with self._lock:
+            if self.outage_started is None:
+                return None
+            elapsed = time.monotonic() - self.outage_started
+            self.outage_started = None
+            self.last_time_to_recover = elapsed
+            self.max_time_to_recover = max(self.max_time_to_recover, elapsed)
+            self.total_time_to_recover += elapsed
+            return elapsed
+
+    def stats(self):
+        with self._lock:
+            recovered = self.outages - (1 if self.outage_started is not None else 0)
+            return {
+                "db_id": self.db_id,
+                "outages": self.outages,
+                "reconnect_attempts": self.attempts,
+                "in_outage_for": (time.monotonic() - self.outage_started
+                                  if self.outage_started is not None else 0.0),
+                "last_time_to_recover": self.last_time_to_recover,
+                "max_time_to_recover": self.max_time_to_recover,
+                "avg_time_to_recover": (self.total_time_to_recover / recovered) if recovered else None,
+                "last_error": self.last_error,
+            }
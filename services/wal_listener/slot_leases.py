@@ -0,0 +1,303 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/slot_leases.py
+"""
+Slot ownership across listener nodes, backed by the application DB.
+
+Every listener node registers itself in `wal_listener_nodes` and keeps that row
+alive with a heartbeat. A slot is only streamed by the node holding its row in
+`replication_slot_leases`; the lease has to be renewed before `expires_at` or any
+other node may take it over. All times are MySQL's NOW(6), so node clocks do not
+matter.
+
+Which node should own a slot is decided by consistent hashing of the slot id over
+the live nodes (see HashRing): a node only acquires the slots that hash to it, hands
+a slot back when a new node it hashes to appears, and takes over slots of other
+nodes only once their lease has been expired for a full TTL (the preferred owner is
+gone, too). When a node dies its leases expire after `ttl` seconds and the
+surviving nodes pick its slots up on their next refresh.
+
+Each acquisition increments the slot's `fencing_token`. The token travels with
+the slot to its SlotStream and WalEventWriter: the writer only commits a batch
+while the lease row still carries its owner and token (checked and share-locked
+inside the same MySQL transaction), and a node only terminates another backend on
+the slot while its lease is current. A node that stalled past its TTL can
+therefore neither write events nor kick the new owner off the slot.
+"""
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+
+try:
+    from .appdb import connect as connect_appdb
+    from .hash_ring import HashRing
+except ImportError:
+    from appdb import connect as connect_appdb
+    from hash_ring import HashRing
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: needs the lease tables (alembic) and only matters with several nodes.
+LEASES_ENABLED = os.getenv("WAL_LEASES", "off").lower() in ("on", "true", "1")
+DEFAULT_LEASE_TTL = float(os.getenv("WAL_LEASE_TTL_SECONDS", "10"))
+
+
+def default_node_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def lease_is_current(lease, connection=None):
+    """
+    True if `lease` ({"slot_id", "owner", "token"}) is still held and unexpired.
+    """
+    conn = connection or connect_appdb(autocommit=True)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT 1 FROM replication_slot_leases "
+                "WHERE slot_id = %s AND owner = %s AND fencing_token = %s AND expires_at >= NOW(6)",
+                (lease["slot_id"], lease["owner"], lease["token"])
+            )
+            return cur.fetchone() is not None
+    finally:
+        if connection is None:
+            conn.close()
+
+
+class SlotLeaseManager:
+    """
+    Usage:
+        leases = SlotLeaseManager()
+        leases.start()                      # register the node, start heartbeats
+        rows = leases.claim(active_slots)   # every refresh: the rows this node owns
+        ...
+        leases.stop()                       # release everything for a fast handoff
+    """
+
+    def __init__(self, node_id=None, ttl=DEFAULT_LEASE_TTL, connect=connect_appdb):
+        self.node_id = node_id or default_node_id()
+        self.ttl = float(ttl)
+        self._connect = connect
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # track { slot_id -> fencing_token } for leases this node holds
+        self.held = {}
+        self._renewed_at = time.monotonic()
+
+    @property
+    def _ttl_us(self):
+        return int(self.ttl * 1000000)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._heartbeat()
+        self._thread = threading.Thread(target=self._run, name="wal-lease-heartbeat", daemon=True)
+        self._thread.start()
+        logger.info("ℹ️ Lease manager started as node %s (ttl=%.1fs)", self.node_id, self.ttl)
+
+    def stop(self, release=True):
+        """
+        Stop heartbeating. With `release` the node's leases are handed back right
+        away instead of expiring after the TTL.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if not release:
+            return
+        try:
+            with self._lock:
+                with self._cursor() as cur:
+                    cur.execute(
+                        "UPDATE replication_slot_leases SET owner = NULL, expires_at = NOW(6) WHERE owner = %s",
+                        (self.node_id,)
+                    )
+                    cur.execute("DELETE FROM wal_listener_nodes WHERE node_id = %s", (self.node_id,))
+                self.held = {}
+        except Exception as e:
+            logger.warning("⚠️ Could not release leases of node %s: %s", self.node_id, e)
+        finally:
+            self._close()
+
+    def claim(self, rows):
+        """
+        Reconcile this node's leases with the active slot rows (which must carry
+        `slot_id`) and return the rows it owns, each with a `lease` entry. Acquires
+        and releases at most what the hash ring over the live nodes calls for.
+        """
+        if time.monotonic() - self._renewed_at > self.ttl:
+            # Heartbeats have been failing for a whole TTL: other nodes may own
+            # these slots by now.
+            logger.error("🚨 Node %s could not renew its leases for %.1fs; dropping them",
+                         self.node_id, time.monotonic() - self._renewed_at)
+            with self._lock:
+                self.held = {}
+
+        with self._lock:
+            nodes = self._live_nodes()
+            states = self._lease_states()
+        nodes.add(self.node_id)
+        ring = HashRing(nodes)
+
+        owned = []
+        active = set()
+        for row in rows:
+            slot_id = row["slot_id"]
+            active.add(slot_id)
+            preferred = ring.node_for(slot_id)
+            token = self.held.get(slot_id)
+            if token is not None:
+                if preferred != self.node_id:
+                    logger.info("ℹ️ Handing slot %s over to node %s", slot_id, preferred)
+                    self.release(slot_id)
+                    continue
+                owned.append(self._with_lease(row, token))
+                continue
+
+            state = states.get(slot_id)
+            if state is not None and state["owner"] is not None and state["expired_us"] < 0:
+                continue  # leased by another node
+            if preferred != self.node_id:
+                # Give the preferred node a full TTL to take it first.
+                if state is None or state["expired_us"] < self._ttl_us:
+                    continue
+            token = self.acquire(slot_id)
+            if token is not None:
+                owned.append(self._with_lease(row, token))
+
+        for slot_id in list(self.held):
+            if slot_id not in active:
+                self.release(slot_id)
+        return owned
+
+    def acquire(self, slot_id):
+        """
+        Take the lease of `slot_id` if it is free or expired. Returns the new
+        fencing token, or None.
+        """
+        with self._lock:
+            with self._cursor() as cur:
+                cur.execute(
+                    "INSERT IGNORE INTO replication_slot_leases (slot_id, owner, fencing_token, expires_at) "
+                    "VALUES (%s, NULL, 0, NOW(6))",
+                    (slot_id,)
+                )
+                cur.execute(
+                    "UPDATE replication_slot_leases "
+                    "SET owner = %s, fencing_token = fencing_token + 1, acquired_at = NOW(6), "
+                    "    renewed_at = NOW(6), expires_at = NOW(6) + INTERVAL %s MICROSECOND "
+                    "WHERE slot_id = %s AND (owner IS NULL OR expires_at < NOW(6))",
+                    (self.node_id, self._ttl_us, slot_id)
+                )
+                if cur.rowcount != 1:
+                    return None
+                cur.execute(
+                    "SELECT fencing_token FROM replication_slot_leases WHERE slot_id = %s AND owner = %s",
+                    (slot_id, self.node_id)
+                )
+                row = cur.fetchone()
+            if row is None:
+                return None
+            self.held[slot_id] = row["fencing_token"]
+        logger.info("ℹ️ Node %s acquired slot %s (fencing token %s)",
+                    self.node_id, slot_id, row["fencing_token"])
+        return row["fencing_token"]
+
+    def release(self, slot_id):
+        with self._lock:
+            token = self.held.pop(slot_id, None)
+            if token is None:
+                return
+            with self._cursor() as cur:
+                cur.execute(
+                    "UPDATE replication_slot_leases SET owner = NULL, expires_at = NOW(6) "
+                    "WHERE slot_id = %s AND owner = %s AND fencing_token = %s",
+                    (slot_id, self.node_id, token)
+                )
+        logger.info("ℹ️ Node %s released slot %s", self.node_id, slot_id)
+
+    def _with_lease(self, row, token):
+        row = dict(row)
+        row["lease"] = {"slot_id": row["slot_id"], "owner": self.node_id, "token": token}
+        return row
+
+    def _run(self):
+        interval = self.ttl / 3.0
+        while not self._stop.wait(interval):
+            try:
+                self._heartbeat()
+            except Exception as e:
+                logger.error("🚨 Lease heartbeat of node %s failed: %s", self.node_id, e)
+                self._close()
+
+    def _heartbeat(self):
+        """
+        Extend the node row and every lease this node still holds, then drop the
+        ones that were lost (expired and taken over) from `held`.
+        """
+        with self._lock:
+            with self._cursor() as cur:
+                cur.execute(
+                    "INSERT INTO wal_listener_nodes (node_id, hostname, pid, started_at, heartbeat_at, expires_at) "
+                    "VALUES (%s, %s, %s, NOW(6), NOW(6), NOW(6) + INTERVAL %s MICROSECOND) "
+                    "ON DUPLICATE KEY UPDATE heartbeat_at = NOW(6), expires_at = NOW(6) + INTERVAL %s MICROSECOND",
+                    (self.node_id, socket.gethostname(), os.getpid(), self._ttl_us, self._ttl_us)
+                )
+                cur.execute(
+                    "UPDATE replication_slot_leases "
+                    "SET renewed_at = NOW(6), expires_at = NOW(6) + INTERVAL %s MICROSECOND "
+                    "WHERE owner = %s AND expires_at >= NOW(6)",
+                    (self._ttl_us, self.node_id)
+                )
+                cur.execute(
+                    "SELECT slot_id, fencing_token FROM replication_slot_leases "
+                    "WHERE owner = %s AND expires_at >= NOW(6)",
+                    (self.node_id,)
+                )
+                current = {row["slot_id"]: row["fencing_token"] for row in cur.fetchall()}
+            for slot_id, token in list(self.held.items()):
+                if current.get(slot_id) != token:
+                    logger.error("🚨 Node %s lost the lease of slot %s", self.node_id, slot_id)
+                    del self.held[slot_id]
+            self._renewed_at = time.monotonic()
+
+    def _live_nodes(self):
+        with self._cursor() as cur:
+            cur.execute("SELECT node_id FROM wal_listener_nodes WHERE expires_at >= NOW(6)")
+            return {row["node_id"] for row in cur.fetchall()}
+
+    def _lease_states(self):
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT slot_id, owner, fencing_token, "
+                "       TIMESTAMPDIFF(MICROSECOND, expires_at, NOW(6)) AS expired_us "
+                "FROM replication_slot_leases"
+            )
+            return {row["slot_id"]: row for row in cur.fetchall()}
+
+    def _cursor(self):
+        if self._conn is None:
+            self._conn = self._connect(autocommit=True)
+        else:
+            self._conn.ping(reconnect=True)
+        return self._conn.cursor()
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
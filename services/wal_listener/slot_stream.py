@@ -0,0 +1,493 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/slot_stream.py
+"""
+The replication pipeline of a single slot, independent of how it is scheduled.
+
+A SlotStream owns everything one slot needs: the LogicalReplicationConnection, the
+decoder, the TransactionBuffers, the relation cache, the WalEventWriter and the
+FlushLsnTracker. It never blocks waiting for the server: `poll()` drains the
+messages that are already available and returns, so the same object can be driven
+by a dedicated thread (select() on `fileno()`, see WALListenerService._wal_loop) or
+multiplexed with many others on one event loop (see async_listener_service).
+
+Per slot the work is a two-stage pipeline: reading, decoding and assembling
+transactions happen in `poll()`, persisting happens on the WalEventWriter thread,
+and the writer's queue between them is bounded. When it is full, `poll()` stops
+reading (the unread WAL waits in the socket and on the server) and only sends
+keepalive status updates until the writer has room again. `pipeline_stats()`
+reports each stage's depth and how long the slot spent paused; the per-stage
+latencies and throughput counters go to the slot's SlotMetrics (metrics.py).
+"""
+import os
+import time
+import select
+import logging
+
+import psycopg2
+from psycopg2.extras import LogicalReplicationConnection
+
+try:
+    from .postgres_decoder import decode_message, decode_message_view
+    from .wal_event_writer import WalEventWriter, WriterStopped
+    from .lsn_tracker import FlushLsnTracker, format_lsn
+    from .transaction_buffer import TransactionBuffer, CHANGE_TYPES
+    from .wal_event_builder import build_wal_events, iter_wal_events, lsn_to_int
+    from .slot_leases import lease_is_current
+    from .metrics import REGISTRY, METRICS_ENABLED
+    from .wal_capture import open_capture
+except ImportError:
+    from postgres_decoder import decode_message, decode_message_view
+    from wal_event_writer import WalEventWriter, WriterStopped
+    from lsn_tracker import FlushLsnTracker, format_lsn
+    from transaction_buffer import TransactionBuffer, CHANGE_TYPES
+    from wal_event_builder import build_wal_events, iter_wal_events, lsn_to_int
+    from slot_leases import lease_is_current
+    from metrics import REGISTRY, METRICS_ENABLED
+    from wal_capture import open_capture
+
+logger = logging.getLogger(__name__)
+
+
+class StreamError(Exception):
+    """
+    A message could not be decoded, assembled or built into wal_events. Nothing
+    after it may be acknowledged, so the slot is streamed again from the writer's
+    checkpoint; a message that can never be handled stalls the slot (its lag
+    keeps growing) instead of being skipped.
+    """
+
+# "memoryview" (default) uses the zero-copy decoder; "bytes" the original one.
+DECODER_MODE = os.getenv("WAL_DECODER_MODE", "memoryview")
+
+# Per-slot options live in PostgresReplicationSlot.annotations, e.g. {"binary": true}.
+BINARY_MIN_SERVER_VERSION = 140000
+STREAMING_MIN_SERVER_VERSION = 140000
+
+
+def build_replication_options(publication_name, annotations, server_version, db_id=None):
+    """
+    Build the pgoutput START_REPLICATION options for a slot from its annotations.
+    Returns (options, binary). `binary: true` is only requested from PG14+,
+    older servers reject the option so those slots fall back to text.
+    `streaming: true` switches the slot to protocol v2 with in-progress
+    transactions streamed in chunks (also PG14+).
+    """
+    annotations = annotations or {}
+    options = {
+        "proto_version": "1",
+        "publication_names": publication_name
+    }
+
+    binary = bool(annotations.get("binary"))
+    if binary and server_version < BINARY_MIN_SERVER_VERSION:
+        logger.warning("⚠️ db_id=%s: binary mode needs PostgreSQL 14+, server is %s; using text",
+                       db_id, server_version)
+        binary = False
+    if binary:
+        options["binary"] = "true"
+
+    streaming = bool(annotations.get("streaming"))
+    if streaming and server_version < STREAMING_MIN_SERVER_VERSION:
+        logger.warning("⚠️ db_id=%s: streaming needs PostgreSQL 14+, server is %s; not streaming",
+                       db_id, server_version)
+        streaming = False
+    if streaming:
+        options["proto_version"] = "2"
+        options["streaming"] = "on"
+    return options, binary
+
+
+class SlotStream:
+    """
+    Usage:
+        stream = SlotStream(db_id, conn_details, slot_name, publication_name, annotations)
+        if stream.open():
+            while ...:
+                if not stream.poll():
+                    select.select([stream], [], [], timeout)
+        stream.close()
+
+    `poll()` raises RuntimeError once `run_status["running"]` is cleared or the
+    writer was fenced off (its slot lease was lost), WriterStopped when the
+    writer thread died, StreamError when a message could not be handled, and
+    lets psycopg2.Error through when the connection breaks. In all but the
+    first case the slot has to be streamed again from its checkpoint.
+    """
+
+    # Builds the slot's writer in open(); load tests without MySQL swap it for a
+    # stand-in with the same interface (see benchmarks/fake_walsender.py).
+    writer_factory = WalEventWriter
+
+    def __init__(self, db_id, conn_details, slot_name, publication_name, annotations=None,
+                 run_status=None, lease=None):
+        self.db_id = db_id
+        self.conn_details = conn_details
+        self.slot_name = slot_name
+        self.publication_name = publication_name
+        self.annotations = annotations or {}
+        self.run_status = run_status if run_status is not None else {"running": True}
+        self.lease = lease
+
+        self.tracker = FlushLsnTracker(db_id)
+        # Kept across reconnects of the slot so counters keep growing.
+        self.metrics = REGISTRY.slot(db_id, slot_name) if METRICS_ENABLED else None
+        self.tracker.metrics = self.metrics
+        self.decode = decode_message if DECODER_MODE == "bytes" else decode_message_view
+        self.tx_buffer = TransactionBuffer(db_id, decode=self.decode)
+        # Transactions streamed while still in progress (protocol v2), by top-level
+        # xid. Chunks of several of them can interleave; each is buffered on its
+        # own until its Stream Commit or Stream Abort arrives.
+        self.streamed = {}
+        self.stream_xid = None
+        self.relation_cache = {}
+        self.binary = False
+        self.messages_handled = 0
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self._paused_since = None
+        # SlotProfile while this slot is being profiled (see profiler.py)
+        self.profile = None
+        # SegmentWriter recording the raw stream, with WAL_CAPTURE_DIR (see wal_capture.py)
+        self.capture = None
+        # Called with this stream while persist() blocks on the writer, so the
+        # engine can look after its other slots meanwhile (see async_listener_service).
+        self.on_blocked = None
+
+        self.writer = None
+        self.connection = None
+        self.cursor = None
+
+    def open(self) -> bool:
+        """
+        Start the writer, connect and issue START_REPLICATION. Blocking; returns
+        False if the slot cannot be streamed (the caller should still close()).
+        """
+        # One long-lived writer per slot: holds the app context and batches inserts.
+        # Postgres is only told about positions the writer has committed.
+        self.writer = self.writer_factory(self.db_id, self.slot_name, on_flush=self._flushed,
+                                          lease=self.lease, metrics=self.metrics)
+        if self.metrics is not None:
+            self.metrics.gauges = self.pipeline_stats
+        if not self.writer.start():
+            logger.error("🚨 db_id=%s: WAL writer could not start; not streaming slot %s",
+                         self.db_id, self.slot_name)
+            return False
+
+        self.connection = psycopg2.connect(
+            connection_factory=LogicalReplicationConnection,
+            **self.conn_details
+        )
+        cur = self.cursor = self.connection.cursor()
+
+        # Fetch the current backend process ID
+        cur.execute("SELECT pg_backend_pid();")
+        backend_pid = cur.fetchone()[0]
+
+        logger.info("ℹ️ db_id=%s: Backend PID=%s", self.db_id, backend_pid)
+
+        cur.execute("SELECT active_pid FROM pg_replication_slots WHERE slot_name = %s", (self.slot_name,))
+        result = cur.fetchone()
+        if result and result[0]:
+            # Only the current lease holder may kick another backend off the slot;
+            # a node whose lease expired would otherwise evict the new owner.
+            if self.lease is not None and not lease_is_current(self.lease):
+                logger.error("🚨 db_id=%s: Lease of slot %s was lost; not reclaiming it from PID %s",
+                             self.db_id, self.slot_name, result[0])
+                return False
+            logger.warning(f"Slot {self.slot_name} is already in use by PID {result[0]}. Reclaiming...")
+            cur.execute("SELECT pg_terminate_backend(%s);", (result[0],))
+            logger.info(f"ℹ️ Terminated PID {result[0]} using slot {self.slot_name}.")
+
+        logger.info("ℹ️ db_id=%s: START_REPLICATION slot=%s publication=%s pid=%s",
+                    self.db_id, self.slot_name, self.publication_name, backend_pid)
+
+        options, self.binary = build_replication_options(
+            self.publication_name, self.annotations, self.connection.server_version, self.db_id
+        )
+        # Resume after the last transaction the writer checkpointed. Postgres starts
+        # at the slot's confirmed_flush_lsn when that is further ahead; when it is
+        # behind (persisted but not yet confirmed), transactions committed before
+        # start_lsn are skipped instead of being written twice.
+        start_lsn = self.writer.checkpoint_lsn
+        if start_lsn:
+            self.tracker.flushed(start_lsn)
+            logger.info("ℹ️ db_id=%s: Resuming slot %s from checkpoint %s",
+                        self.db_id, self.slot_name, format_lsn(start_lsn))
+        cur.start_replication(
+            slot_name=self.slot_name,
+            options=options,
+            start_lsn=start_lsn
+        )
+        self.capture = open_capture(self.db_id, self.slot_name, binary=self.binary, start_lsn=start_lsn)
+        return True
+
+    def fileno(self):
+        return self.cursor.fileno()
+
+    @property
+    def paused(self) -> bool:
+        """
+        True while the writer's queue is full and reading is suspended.
+        """
+        try:
+            return self.writer is not None and not self.writer.has_room()
+        except WriterStopped:
+            return False  # not waiting on anything: poll() raises it
+
+    def poll(self, max_messages=None) -> int:
+        """
+        Handle the messages that are available right now, at most `max_messages`.
+        Returns how many were handled. read_message() answers server keepalives
+        itself, using the last position passed to send_feedback(); when there was
+        nothing to read, due feedback is sent so persisted positions are confirmed
+        even while the slot is idle. Stops early, without reading, while the writer
+        has no room (see `paused`).
+        """
+        profile = self.profile
+        if profile is None:
+            return self._poll(max_messages)
+        profile.enter()
+        try:
+            return self._poll(max_messages, profile)
+        finally:
+            profile.leave()
+
+    def _poll(self, max_messages, profile=None):
+        handled = 0
+        while max_messages is None or handled < max_messages:
+            if self.profile is not profile:
+                break  # a profile started or ended; the caller polls again right away
+            if not self.run_status["running"]:
+                raise RuntimeError("🪑 WAL loop stopping: run_status set to False.")
+            if self.writer.fenced:
+                raise RuntimeError("🪑 WAL loop stopping: slot lease lost.")
+            if not self.writer.has_room():
+                self.keepalive()
+                break
+            if self._paused_since is not None:
+                self.paused_seconds += time.monotonic() - self._paused_since
+                self._paused_since = None
+            msg = self.cursor.read_message()
+            if msg is None:
+                self.tracker.maybe_send_feedback(self.cursor)
+                break
+            self.handle(msg)
+            handled += 1
+        return handled
+
+    def wait(self, timeout):
+        """
+        Block until poll() may have work: data on the connection or, while paused,
+        room in the writer's queue. At most `timeout` seconds.
+        """
+        if self.paused:
+            self.writer.wait_for_room(self.writer.max_pending_rows - 1, timeout)
+        else:
+            select.select([self], [], [], timeout)
+
+    def keepalive(self):
+        """
+        While paused: confirm what the writer persisted and keep the connection
+        alive, since read_message() is not there to answer keepalive requests.
+        """
+        if self._paused_since is None:
+            self._paused_since = time.monotonic()
+            self.pauses += 1
+            logger.debug("🐞 db_id=%s: Writer queue full (%d rows); pausing reads",
+                         self.db_id, self.writer.max_pending_rows)
+        self.send_keepalive()
+
+    def send_keepalive(self):
+        """
+        Confirm what the writer persisted and send a status update if none was
+        sent for a while; for when nothing reads from the connection.
+        """
+        if self.cursor is not None and not self.connection.closed:
+            self.tracker.maybe_send_feedback(self.cursor)
+            self.tracker.keepalive(self.cursor)
+
+    def _writer_busy(self):
+        # persist() is blocked on a full writer queue, so read_message() is not
+        # answering the server's keepalive requests (wal_sender_timeout).
+        self.send_keepalive()
+        if self.on_blocked is not None:
+            self.on_blocked(self)
+
+    def pipeline_stats(self):
+        """
+        Depth of each stage, to tell which one limits throughput: a slot that is
+        often paused with a full writer queue is bound by MySQL; one with an empty
+        queue and growing `lag_bytes` by decoding.
+        """
+        writer = self.writer.stats() if self.writer is not None else {}
+        paused_seconds = self.paused_seconds
+        if self._paused_since is not None:
+            paused_seconds += time.monotonic() - self._paused_since
+        return {
+            "db_id": self.db_id,
+            "assembling_changes": len(self.tx_buffer) + sum(len(b) for b in self.streamed.values()),
+            "writer_pending_transactions": writer.get("pending_transactions", 0),
+            "writer_pending_rows": writer.get("pending_rows", 0),
+            "writer_max_pending_rows": writer.get("max_pending_rows", 0),
+            "paused": self._paused_since is not None,
+            "pauses": self.pauses,
+            "paused_seconds": paused_seconds,
+            "lag_bytes": self.tracker.lag_bytes,
+        }
+
+    def send_feedback(self, force=False):
+        if self.cursor is not None and not self.connection.closed:
+            self.tracker.maybe_send_feedback(self.cursor, force=force)
+
+    def _flushed(self, lsn):
+        # Writer thread: `lsn` and everything before it is in wal_events.
+        self.tracker.flushed(lsn)
+        if self.metrics is not None:
+            self.metrics.persisted(lsn)
+
+    def handle(self, msg):
+        capture = self.capture
+        if capture is not None and not capture.write(msg.data_start, msg.payload):
+            self.capture = None
+        self.tracker.received(msg.data_start)
+        self.messages_handled += 1
+        metrics = self.metrics
+        timed = False
+        if metrics is not None:
+            # Counters are exact, stage timings sampled (every sample_every-th message).
+            kind = msg.payload[0]
+            metrics.messages[kind] += 1
+            metrics.message_bytes[kind] += len(msg.payload)
+            timed = not self.messages_handled % metrics.sample_every
+        try:
+            in_stream = self.stream_xid is not None
+            if timed:
+                started = time.perf_counter()
+            decoded_message = self.decode(msg.payload, in_stream)
+            if "error" in decoded_message:
+                raise ValueError(f"malformed {decoded_message.get('type')} message: {decoded_message['error']}")
+            if timed:
+                decoded = time.perf_counter()
+                metrics.observe("decode", decoded - started, kind)
+            logger.debug("🐞 db_id=%s Decoded WAL msg: %s", self.db_id, decoded_message)
+
+            msg_type = decoded_message.get("type")
+            if msg_type == "relation" or msg_type in CHANGE_TYPES:
+                buffer = self.streamed[self.stream_xid] if in_stream else self.tx_buffer
+                buffer.append(decoded_message, msg.payload)
+                if timed:
+                    metrics.observe("assemble", time.perf_counter() - decoded, kind)
+            elif msg_type == "begin":
+                self.tx_buffer.begin(decoded_message)
+            elif msg_type == "commit":
+                self.persist(self.tx_buffer.commit(decoded_message), decoded_message, timed=timed)
+            elif msg_type == "stream_start":
+                self._stream_start(decoded_message)
+            elif msg_type == "stream_stop":
+                self.stream_xid = None
+            elif msg_type == "stream_commit":
+                buffer = self.streamed.pop(decoded_message["xid"], None)
+                if buffer is None:
+                    raise ValueError(f"stream commit for unknown xid={decoded_message['xid']}")
+                self.persist(buffer.commit(decoded_message), decoded_message, timed=timed)
+            elif msg_type == "stream_abort":
+                self._stream_abort(decoded_message)
+        except (WriterStopped, psycopg2.Error):
+            raise
+        except Exception as e:
+            raise StreamError(f"db_id={self.db_id}: could not handle the WAL message at "
+                              f"{format_lsn(msg.data_start)}: {e!r}") from e
+        self.tracker.maybe_send_feedback(msg.cursor)
+
+    def persist(self, tx, commit_msg, timed=False):
+        ack_lsn = lsn_to_int(commit_msg["end_lsn"])
+        # The whole transaction goes to the writer as one unit, and its end
+        # LSN is only acknowledged once all of it has been persisted.
+        # Spilled transactions are streamed back from disk in batches.
+        if self.metrics is not None:
+            self.metrics.committed(ack_lsn, commit_msg.get("commit_timestamp"))
+        if tx["spilled"]:
+            # Not timed as "build": submit_stream waits for the writer batch by batch.
+            # The count is checked before the last chunk, the one carrying ack_lsn.
+            built = self.writer.submit_stream(
+                self._checked(iter_wal_events(tx, self.relation_cache, binary=self.binary), tx),
+                ack_lsn=ack_lsn, on_wait=self._writer_busy
+            )
+        else:
+            started = time.perf_counter() if timed else None
+            wal_events = build_wal_events(tx, self.relation_cache, binary=self.binary)
+            built = len(wal_events)
+            if timed:
+                self.metrics.observe("build", time.perf_counter() - started)
+            self._check_built(built, tx)
+            self.writer.submit_transaction(wal_events, ack_lsn=ack_lsn)
+        logger.debug("🐞 db_id=%s: Constructed %d wal_events", self.db_id, built)
+
+    def _checked(self, wal_events, tx):
+        built = 0
+        for wal_event in wal_events:
+            built += 1
+            yield wal_event
+        self._check_built(built, tx)
+
+    @staticmethod
+    def _check_built(built, tx):
+        # A change without a wal_event (e.g. no RELATION for it) must not be acknowledged.
+        if built != tx["changes"]:
+            raise ValueError(f"built {built} of {tx['changes']} wal_events for "
+                             f"xid={(tx['begin'] or {}).get('xid')}")
+
+    def _stream_start(self, stream_start_msg):
+        self.stream_xid = stream_start_msg["xid"]
+        buffer = self.streamed.get(self.stream_xid)
+        if buffer is None:
+            if not stream_start_msg["first_segment"]:
+                logger.warning("⚠️ db_id=%s: Stream for xid=%s resumed without its first segment",
+                               self.db_id, self.stream_xid)
+            decode = self.decode
+            buffer = self.streamed[self.stream_xid] = TransactionBuffer(
+                self.db_id, decode=lambda payload: decode(payload, True)
+            )
+            buffer.begin(stream_start_msg)
+        elif stream_start_msg["first_segment"]:
+            # The transaction is being streamed again from the start.
+            buffer.begin(stream_start_msg)
+
+    def _stream_abort(self, stream_abort_msg):
+        xid = stream_abort_msg["xid"]
+        if stream_abort_msg["subxid"] == xid:
+            buffer = self.streamed.pop(xid, None)
+            if buffer is not None:
+                logger.info("ℹ️ db_id=%s: Discarding %d streamed changes of aborted xid=%s",
+                            self.db_id, len(buffer), xid)
+                buffer.discard()
+        elif xid in self.streamed:
+            self.streamed[xid].abort_subtransaction(stream_abort_msg["subxid"])
+
+    def close(self):
+        """
+        Flush the writer, confirm what it persisted and close the connection.
+        Blocking; safe to call on a stream that never opened. Leaves `run_status`
+        alone: _wal_loop shares it across reconnects of the slot.
+        """
+        for buffer in self.streamed.values():
+            buffer.discard()
+        self.streamed = {}
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+        if self.writer:
+            self.writer.stop()
+        if self.connection:
+            try:
+                # Confirm whatever the writer flushed on its way out.
+                self.send_feedback(force=True)
+            except psycopg2.Error as e:
+                logger.warning("⚠️ db_id=%s: Could not send final feedback: %s", self.db_id, e)
+            logger.info("ℹ️ db_id=%s: Closing replication connection. %s", self.db_id, self.tracker.stats())
+            self.connection.close()
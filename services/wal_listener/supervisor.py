@@ -0,0 +1,359 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/supervisor.py
+"""
+Multi-process mode for the WAL listener.
+
+Decoding is CPU-bound and a single listener process is limited to one core by the
+GIL. The ShardSupervisor starts N worker processes, each running an ordinary
+listener engine (threads or asyncio), and is the only process that reads the
+active slots from MySQL. Slots are assigned to workers by consistent hashing of
+db_id (see HashRing), so when a worker is added or removed only the slots that
+hash to it move; every other slot keeps streaming where it is.
+
+A slot that moves is first taken away from its old worker and only handed to the
+new one `handoff_delay` seconds later, so the old worker can flush its writer and
+release the replication connection instead of being terminated by the new owner.
+
+Workers report their load (slots, messages/sec, CPU, peak RSS, unpersisted WAL) every
+`check_interval`; the supervisor logs a per-worker summary every
+`report_interval` seconds and exposes the latest figures through `stats()`.
+Each worker serves its own slots' metrics on WAL_METRICS_PORT + 1 + n, where n is
+the lowest offset not taken by another live worker.
+
+Enable it with WAL_WORKERS=<n> when starting wal_listener_service.py.
+"""
+import os
+import time
+import queue
+import logging
+import signal
+import resource
+import multiprocessing
+
+try:
+    from .wal_listener_service import WALListenerService, serve_diagnostics
+    from .hash_ring import HashRing
+    from .metrics import METRICS_PORT
+    from .profiler import PROFILER_ENABLED
+except ImportError:
+    from wal_listener_service import WALListenerService, serve_diagnostics
+    from hash_ring import HashRing
+    from metrics import METRICS_PORT
+    from profiler import PROFILER_ENABLED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv("WAL_WORKERS", "0")) or os.cpu_count() or 1
+DEFAULT_REPORT_INTERVAL = float(os.getenv("WAL_SUPERVISOR_REPORT_INTERVAL", "30"))
+WORKER_ENGINE = os.getenv("WAL_ENGINE", "threads")
+
+_STOP = None
+_WAKE = None
+
+
+class ShardSupervisor(WALListenerService):
+    """
+    Usage:
+        supervisor = ShardSupervisor(workers=4)
+        supervisor.start()          # blocks; Ctrl-C / stop() shuts the workers down
+        supervisor.add_worker()     # from another thread: rebalance onto a new worker
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, check_interval=3, engine=WORKER_ENGINE,
+                 report_interval=DEFAULT_REPORT_INTERVAL, handoff_delay=None):
+        super().__init__(check_interval)
+        self.engine = engine
+        self.report_interval = report_interval
+        self.handoff_delay = handoff_delay if handoff_delay is not None else 2 * check_interval
+        self.ring = HashRing(f"worker-{i}" for i in range(max(1, int(workers))))
+
+        self._context = multiprocessing.get_context("spawn")
+        self._reports = self._context.Queue()
+        # track { worker_id -> (process, inbox) }
+        self.workers = {}
+        self.assignments = {}   # db_id -> worker_id
+        self.loads = {}         # worker_id -> latest load report
+        self._sent = {}         # worker_id -> rows last sent to it
+        self._metrics_ports = {}  # worker_id -> port its /metrics is served on
+        self._handoff = {}      # db_id -> monotonic time its new owner may start it
+        self._reported_at = time.monotonic()
+
+    def start(self):
+        logger.info("WAL Listener supervisor started with %d workers (%s engine).",
+                    len(self.ring), self.engine)
+        for worker_id in self.ring.nodes:
+            self._spawn(worker_id)
+        if PROFILER_ENABLED and hasattr(signal, "SIGUSR1"):
+            # The slots live in the workers; each handles the request for its own.
+            signal.signal(signal.SIGUSR1, self._forward_signal)
+        try:
+            while self.run_flag:
+                try:
+                    self._restart_dead_workers()
+                    self.refresh_subscriptions()
+                except Exception as e:
+                    logger.exception("Error refreshing subscriptions: %s", e)
+                self._collect_reports(self.check_interval)
+                self._maybe_log_loads()
+        finally:
+            self._shutdown()
+            self.release_leases()
+
+    def stop(self):
+        logger.info("Stopping WAL Listener supervisor...")
+        self.run_flag = False
+
+    def wake(self, full=False):
+        if full:
+            self.catalog.request_full()
+        # Interrupts the wait for load reports in _collect_reports().
+        self._reports.put(_WAKE)
+
+    def add_worker(self, worker_id=None):
+        """
+        Add a worker to the ring; only the slots that now hash to it move.
+        Takes effect on the next refresh.
+        """
+        worker_id = worker_id or f"worker-{len(self.ring)}"
+        while worker_id in self.ring:
+            worker_id = f"{worker_id}+"
+        self.ring.add_node(worker_id)
+        return worker_id
+
+    def remove_worker(self, worker_id):
+        """
+        Remove a worker from the ring; its slots move to their next owners and the
+        process is stopped once it has released them.
+        """
+        self.ring.remove_node(worker_id)
+
+    def refresh_subscriptions(self):
+        """
+        Assign every active slot owned by this node to a worker and send each
+        worker its slot list when it changed.
+        """
+        active_slots = self.owned_slots()
+        now = time.monotonic()
+        rows_by_worker = {worker_id: [] for worker_id in self.ring.nodes}
+        assignments = {}
+        moved = 0
+
+        for row in active_slots:
+            db_id = row["db_id"]
+            if db_id in assignments:
+                continue
+            worker_id = self.ring.node_for(db_id)
+            assignments[db_id] = worker_id
+            previous = self.assignments.get(db_id)
+            if previous is not None and previous != worker_id:
+                moved += 1
+                self._handoff[db_id] = now + self.handoff_delay
+                logger.info("db_id=%s: Moving slot from %s to %s", db_id, previous, worker_id)
+            if self._handoff.get(db_id, 0) > now:
+                continue  # the previous owner is still releasing it
+            self._handoff.pop(db_id, None)
+            rows_by_worker[worker_id].append(row)
+
+        if moved:
+            logger.info("ℹ️ Rebalanced %d of %d slots across %d workers",
+                        moved, len(assignments), len(self.ring))
+        self.assignments = assignments
+
+        for worker_id, rows in rows_by_worker.items():
+            if worker_id not in self.workers:
+                self._spawn(worker_id)
+            if self._sent.get(worker_id) != rows:
+                self.workers[worker_id][1].put(rows)
+                self._sent[worker_id] = rows
+
+        # Workers that left the ring are stopped once they have been emptied.
+        for worker_id in list(self.workers):
+            if worker_id not in self.ring:
+                if self._sent.get(worker_id):
+                    self.workers[worker_id][1].put([])
+                    self._sent[worker_id] = []
+                elif not any(until > now for until in self._handoff.values()):
+                    self._stop_worker(worker_id)
+
+    def stats(self):
+        """
+        Latest load report of every worker.
+        """
+        return {worker_id: dict(load) for worker_id, load in self.loads.items()}
+
+    def _spawn(self, worker_id):
+        inbox = self._context.Queue()
+        if worker_id not in self._metrics_ports:
+            taken = set(self._metrics_ports.values())
+            self._metrics_ports[worker_id] = next(
+                port for port in range(METRICS_PORT + 1, METRICS_PORT + 2 + len(taken)) if port not in taken
+            )
+        process = self._context.Process(
+            target=run_worker,
+            args=(worker_id, self.engine, self.check_interval, inbox, self._reports,
+                  self._metrics_ports[worker_id]),
+            name=f"wal-{worker_id}",
+            daemon=False
+        )
+        process.start()
+        self.workers[worker_id] = (process, inbox)
+        self._sent.pop(worker_id, None)
+        logger.info("ℹ️ Started %s (pid=%s)", worker_id, process.pid)
+
+    def _forward_signal(self, signum, frame):
+        for process, _ in list(self.workers.values()):
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    def _stop_worker(self, worker_id, timeout=30, signal=True):
+        process, inbox = self.workers.pop(worker_id)
+        if signal:
+            inbox.put(_STOP)
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning("⚠️ %s did not stop within %ss; terminating", worker_id, timeout)
+            process.terminate()
+            process.join()
+        self._sent.pop(worker_id, None)
+        self._metrics_ports.pop(worker_id, None)
+        self.loads.pop(worker_id, None)
+        logger.info("ℹ️ Stopped %s", worker_id)
+
+    def _restart_dead_workers(self):
+        for worker_id, (process, _) in list(self.workers.items()):
+            if not process.is_alive():
+                logger.error("🚨 %s (pid=%s) exited with code %s; restarting",
+                             worker_id, process.pid, process.exitcode)
+                del self.workers[worker_id]
+                if worker_id in self.ring:
+                    self._spawn(worker_id)
+
+    def _collect_reports(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                report = self._reports.get(timeout=remaining)
+            except queue.Empty:
+                return
+            if report is _WAKE:
+                return
+            if report["worker_id"] in self.workers:
+                self.loads[report["worker_id"]] = report
+
+    def _maybe_log_loads(self):
+        now = time.monotonic()
+        if now - self._reported_at < self.report_interval:
+            return
+        self._reported_at = now
+        for worker_id in self.ring.nodes:
+            load = self.loads.get(worker_id)
+            if load is None:
+                logger.info("ℹ️ %s: no report yet", worker_id)
+                continue
+            logger.info("ℹ️ %s: %d slots, %.0f msgs/sec, %.0f%% CPU, %.0f MB peak RSS, %d bytes unpersisted, "
+                        "%d paused by a full writer queue, %d reconnecting (max time to recover %.1fs)",
+                        worker_id, load["slots"], load["messages_per_sec"], load["cpu_percent"],
+                        load["max_rss_mb"], load["lag_bytes"], load["slots_paused"],
+                        load["slots_reconnecting"], load["max_time_to_recover"])
+
+    def _shutdown(self):
+        for worker_id, (_, inbox) in list(self.workers.items()):
+            inbox.put(_STOP)
+        for worker_id in list(self.workers):
+            self._stop_worker(worker_id, signal=False)
+
+
+class AssignedSlotsMixin:
+    """
+    Turns a listener engine into a supervisor worker: instead of querying MySQL,
+    `fetch_active_slots()` returns the slot rows last received from the supervisor,
+    and reports the worker's load back on every refresh. Slot leases are held by
+    the supervisor; the rows it sends already carry them. So does the lag monitor.
+    """
+
+    def setup_worker(self, worker_id, inbox, reports):
+        self.worker_id = worker_id
+        self.leases = None
+        self.lag_monitor = None  # the supervisor samples the lag of every slot
+        self._inbox = inbox
+        self._report_queue = reports
+        self._assigned = []
+        self._threads = set()
+        self._last_report = (time.monotonic(), time.process_time(), 0)
+
+    def fetch_active_slots(self):
+        # Remember slot threads, the thread engine forgets them once they are stopped.
+        self._threads.update(thread for thread, _ in list(self.subscriptions.values()))
+        while True:
+            try:
+                rows = self._inbox.get_nowait()
+            except queue.Empty:
+                break
+            if rows is _STOP:
+                self.stop()
+                self._assigned = []
+                break
+            self._assigned = rows
+        self._report_load()
+        return list(self._assigned)
+
+    def _report_load(self):
+        streams = self.active_streams()
+        now, cpu = time.monotonic(), time.process_time()
+        messages = sum(stream.messages_handled for stream in streams)
+        then, cpu_then, messages_then = self._last_report
+        elapsed = max(now - then, 1e-6)
+        recovery = self.recovery_stats()
+        self._last_report = (now, cpu, messages)
+        self._report_queue.put({
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "slots": len(streams),
+            "messages_per_sec": max(0, messages - messages_then) / elapsed,
+            "cpu_percent": 100.0 * (cpu - cpu_then) / elapsed,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+            "lag_bytes": sum(stream.tracker.lag_bytes for stream in streams),
+            "slots_paused": sum(1 for stream in streams if stream.paused),
+            "slots_reconnecting": sum(1 for stats in recovery if stats["in_outage_for"]),
+            "max_time_to_recover": max((stats["max_time_to_recover"] for stats in recovery), default=0.0),
+        })
+
+
+def run_worker(worker_id, engine, check_interval, inbox, reports, metrics_port=None):
+    """
+    Entry point of a worker process.
+    """
+    if engine == "asyncio":
+        try:
+            from .async_listener_service import AsyncWALListenerService as Engine
+        except ImportError:
+            from async_listener_service import AsyncWALListenerService as Engine
+    else:
+        Engine = WALListenerService
+
+    class ShardWorker(AssignedSlotsMixin, Engine):
+        pass
+
+    service = ShardWorker(check_interval=check_interval)
+    service.setup_worker(worker_id, inbox, reports)
+    if metrics_port is not None:
+        serve_diagnostics(service, metrics_port)
+    logger.info("ℹ️ %s started (pid=%s, %s engine)", worker_id, os.getpid(), engine)
+    try:
+        service.start()
+    except KeyboardInterrupt:
+        service.stop()
+    finally:
+        # The thread engine only flags its slot threads; wait for them to flush.
+        for _, run_status in list(service.subscriptions.values()):
+            run_status["running"] = False
+        for thread in service._threads:
+            thread.join(timeout=30)
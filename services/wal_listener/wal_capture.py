@@ -0,0 +1,199 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/wal_capture.py
+"""
+Capture of the raw pgoutput stream of a slot, for offline replay and benchmarks
+(see benchmarks/replay_segments.py).
+
+With WAL_CAPTURE_DIR set, every SlotStream (or only those of WAL_CAPTURE_DB_IDS)
+appends each message it reads, before decoding, to segment files in that
+directory: `<slot>-<time>-<n>.pgoseg`, a new one every WAL_CAPTURE_SEGMENT_MB,
+and capture stops once WAL_CAPTURE_MAX_MB were written for the connection.
+Capture starts with the connection, so the RELATION messages the later changes
+depend on are in the first segment; replay a capture's segments together, in order.
+
+Segment format (all integers big-endian):
+
+    b"PGOCAP1\\n"
+    u32 length, JSON metadata (db_id, slot_name, binary, segment, created_at)
+    records: u64 data_start, u32 payload length, payload
+
+A record cut short (the listener died mid-write) ends the segment.
+"""
+import os
+import json
+import glob
+import time
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_DIR = os.getenv("WAL_CAPTURE_DIR", "")
+CAPTURE_DB_IDS = {db_id.strip() for db_id in os.getenv("WAL_CAPTURE_DB_IDS", "").split(",") if db_id.strip()}
+SEGMENT_BYTES = int(float(os.getenv("WAL_CAPTURE_SEGMENT_MB", "64")) * 1048576)
+MAX_CAPTURE_BYTES = int(float(os.getenv("WAL_CAPTURE_MAX_MB", "1024")) * 1048576)
+
+MAGIC = b"PGOCAP1\n"
+SUFFIX = ".pgoseg"
+_META = struct.Struct("!I")
+_RECORD = struct.Struct("!QI")
+
+
+def _write_header(f, meta):
+    encoded = json.dumps(meta, default=str).encode("utf-8")
+    f.write(MAGIC)
+    f.write(_META.pack(len(encoded)))
+    f.write(encoded)
+
+
+class SegmentWriter:
+    """
+    Appends (data_start, payload) records to rotating segment files.
+
+    Usage:
+        capture = SegmentWriter(directory, f"{slot_name}-{stamp}", {"db_id": db_id, ...})
+        if not capture.write(msg.data_start, msg.payload):
+            capture = None   # limit reached or the disk failed; already closed
+        capture.close()
+    """
+
+    def __init__(self, directory, name, meta=None, segment_bytes=SEGMENT_BYTES, max_bytes=MAX_CAPTURE_BYTES):
+        self.directory = directory
+        self.name = name
+        self.meta = dict(meta or {})
+        self.segment_bytes = max(1, segment_bytes)
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.records = 0
+        self.bytes_written = 0
+        self._file = None
+        self._segment_written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"{self.name}-{len(self.paths):05d}{SUFFIX}")
+        self._file = open(path, "wb", buffering=1048576)
+        _write_header(self._file, {**self.meta, "segment": len(self.paths), "created_at": time.time()})
+        self.paths.append(path)
+        self._segment_written = 0
+
+    def write(self, data_start, payload) -> bool:
+        """
+        Append one message. Returns False once the capture has stopped.
+        """
+        size = _RECORD.size + len(payload)
+        if self.max_bytes and self.bytes_written + size > self.max_bytes:
+            logger.warning("⚠️ Capture %s reached %d bytes; stopping it", self.name, self.bytes_written)
+            self.close()
+            return False
+        try:
+            if self._file is None or self._segment_written + size > self.segment_bytes:
+                self._rotate()
+            self._file.write(_RECORD.pack(data_start, len(payload)))
+            self._file.write(payload)
+        except OSError as e:
+            logger.error("❌ Capture %s failed, stopping it: %s", self.name, e)
+            self.close()
+            return False
+        self._segment_written += size
+        self.bytes_written += size
+        self.records += 1
+        return True
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError as e:
+                logger.error("❌ Could not close capture %s: %s", self.name, e)
+            self._file = None
+            logger.info("ℹ️ Captured %d messages (%d bytes) to %s", self.records, self.bytes_written,
+                        ", ".join(self.paths))
+
+
+def open_capture(db_id, slot_name, **meta):
+    """
+    The SegmentWriter for a new connection of `slot_name`, or None when capture
+    is off for it.
+    """
+    if not CAPTURE_DIR or (CAPTURE_DB_IDS and str(db_id) not in CAPTURE_DB_IDS):
+        return None
+    name = f"{slot_name}-{time.strftime('%Y%m%dT%H%M%S')}"
+    logger.info("ℹ️ db_id=%s: Capturing the replication stream to %s/%s-*%s", db_id, CAPTURE_DIR, name, SUFFIX)
+    return SegmentWriter(CAPTURE_DIR, name, {"db_id": db_id, "slot_name": slot_name, **meta})
+
+
+def write_segment(path, records, meta=None):
+    """
+    Write (data_start, payload) `records` as a single segment file, e.g. a
+    synthetic workload. Returns the number of records.
+    """
+    count = 0
+    with open(path, "wb", buffering=1048576) as f:
+        _write_header(f, {**(meta or {}), "segment": 0, "created_at": time.time()})
+        for data_start, payload in records:
+            f.write(_RECORD.pack(data_start, len(payload)))
+            f.write(payload)
+            count += 1
+    return count
+
+
+def segment_paths(targets):
+    """
+    Expand files and directories (all their segments) into segment paths, in order.
+    """
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths.extend(sorted(glob.glob(os.path.join(target, f"*{SUFFIX}"))))
+        else:
+            paths.append(target)
+    return paths
+
+
+def _read_header(data, path):
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a capture segment")
+    offset = len(MAGIC)
+    (length,) = _META.unpack_from(data, offset)
+    offset += _META.size
+    return json.loads(data[offset:offset + length]), offset + length
+
+
+def segment_meta(path):
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC) + _META.size)
+        if len(head) < len(MAGIC) + _META.size:
+            raise ValueError(f"{path} is not a capture segment")
+        (length,) = _META.unpack_from(head, len(MAGIC))
+        return _read_header(head + f.read(length), path)[0]
+
+
+def iter_records(paths):
+    """
+    Yield (data_start, payload) of every record in `paths`, in order. Each file is
+    read whole, so only one segment is held in memory at a time.
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        _, offset = _read_header(data, path)
+        end = len(data)
+        unpack_from = _RECORD.unpack_from
+        size = _RECORD.size
+        while offset + size <= end:
+            data_start, length = unpack_from(data, offset)
+            offset += size
+            if offset + length > end:
+                break
+            yield data_start, data[offset:offset + length]
+            offset += length
+        if offset != end:
+            logger.warning("⚠️ %s ends with a truncated record; ignoring it", path)
@@ -0,0 +1,266 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/wal_event_builder.py
+"""
+Turns decoded, assembled source transactions into wal_event dicts ready for the
+WalEventWriter. Shared by the replication loop and anything else that needs to
+build events from decoded pgoutput messages.
+"""
+import logging
+
+try:
+    from .type_converters import compile_converters, compile_binary_converters, convert_values
+except ImportError:
+    from type_converters import compile_converters, compile_binary_converters, convert_values
+
+logger = logging.getLogger(__name__)
+
+
+def lsn_to_int(lsn_tuple):
+    """
+    Convert an LSN represented as a tuple (xlog_file, xlog_offset) into an integer.
+    (Your implementation may vary.)
+    """
+    xlog_file, xlog_offset = lsn_tuple
+    # For example, assume 32 bits for offset:
+    return (xlog_file << 32) | xlog_offset
+
+
+def cache_relation(relation_cache, relation_msg, binary=False):
+    """
+    Store a RELATION message by relation_id, compiling its per-column type
+    converter table once so every later row of the table reuses it. Slots
+    streaming in binary mode get converters that understand both formats.
+    """
+    compile_table = compile_binary_converters if binary else compile_converters
+    relation_msg["converters"] = compile_table(relation_msg.get("columns_meta", []))
+    relation_cache[relation_msg["relation_id"]] = relation_msg
+
+
+def convert_row(values, relation_msg):
+    """
+    Turn a row of text values into native Python types using the relation's
+    compiled converter table (values are returned as-is if there is none).
+    """
+    converters = relation_msg.get("converters")
+    if not converters or not values:
+        return values
+    return convert_values(values, converters)
+
+
+def decode_record_data(record_hex, relation_msg):
+    """
+    Decode the raw tuple hex string into a dictionary mapping column names
+    to their decoded (text) values. This assumes that the raw tuple was encoded
+    as a series of columns where each column is prefixed by:
+      - 1 byte marker: 't' for text, 'b' for binary, 'n' for null, or 'u' for unchanged
+      - If marker is 't' or 'b': 4 bytes (big-endian) indicating the length,
+        followed by that many bytes representing the value.
+    """
+    record_bytes = bytes.fromhex(record_hex)
+    columns = relation_msg.get("columns", [])
+    decoded = {}
+    offset = 0
+    for col in columns:
+        if offset >= len(record_bytes):
+            break  # no more data
+        # Read the 1-byte marker
+        marker = chr(record_bytes[offset])
+        offset += 1
+        if marker == 't':
+            if offset + 4 > len(record_bytes):
+                decoded[col] = None
+                break
+            length = int.from_bytes(record_bytes[offset:offset+4], byteorder='big')
+            offset += 4
+            value_bytes = record_bytes[offset:offset+length]
+            offset += length
+            try:
+                decoded[col] = value_bytes.decode('utf-8')
+            except Exception:
+                decoded[col] = value_bytes.hex()
+        elif marker == 'b':  # binary send format, decoded by the converter table
+            if offset + 4 > len(record_bytes):
+                decoded[col] = None
+                break
+            length = int.from_bytes(record_bytes[offset:offset+4], byteorder='big')
+            offset += 4
+            decoded[col] = record_bytes[offset:offset+length]
+            offset += length
+        elif marker == 'n':  # column is NULL
+            decoded[col] = None
+        elif marker == 'u':  # unchanged
+            decoded[col] = "unchanged"
+        else:
+            decoded[col] = None
+    if relation_msg.get("converters") and len(decoded) == len(columns):
+        decoded = dict(zip(decoded.keys(), convert_row(list(decoded.values()), relation_msg)))
+    return decoded
+
+
+def build_record(change_msg, relation_msg):
+    """
+    Build a record from the change message and relation metadata.
+
+    If the change message contains a raw tuple value (tuple_raw),
+    then return that raw hex string. Otherwise, if a decoded tuple
+    is provided, zip it with the column names from the relation message.
+    DELETEs carry no new tuple, so their old image (full row or key) is used.
+    """
+    logger.debug("🐞 [build_record] Received change_msg: %s", change_msg)
+    logger.debug("🐞 [build_record] Received relation_msg: %s", relation_msg)
+
+    # If a raw tuple exists, use it as the record.
+    tuple_raw = change_msg.get("tuple_raw")
+    if tuple_raw:
+        logger.debug("🐞 [build_record] Using raw tuple value as record: %s", tuple_raw)
+        return tuple_raw  # Return the raw hex string without decoding.
+
+    # Otherwise, try to use a decoded tuple (if present)
+    values = change_msg.get("tuple")
+    if not values and change_msg.get("type") == "delete":
+        values = change_msg.get("old_tuple") or change_msg.get("key_tuple")
+    columns = relation_msg.get("columns", [])
+
+    if not values:
+        logger.error("🚨 [build_record] No tuple or tuple_raw found in change_msg: %s", change_msg)
+        return None
+
+    record = dict(zip(columns, convert_row(values, relation_msg)))
+    if not record:
+        logger.error("🚨 [build_record] Record is empty after zipping columns: %s with values: %s", columns, values)
+    else:
+        logger.debug("🐞 [build_record] Constructed record: %s", record)
+    return record
+
+
+def build_old_fields(change_msg, relation_msg):
+    """
+    Map the old image of an UPDATE/DELETE onto column names. A full old row ('O',
+    replica identity full) is used as is; an old key ('K') only carries the key
+    columns, so the NULL placeholders for every other column are dropped.
+    Returns None when the message has no old image.
+    """
+    columns = relation_msg.get("columns", [])
+    old_tuple = change_msg.get("old_tuple")
+    if old_tuple is not None:
+        return dict(zip(columns, convert_row(old_tuple, relation_msg)))
+    key_tuple = change_msg.get("key_tuple")
+    if key_tuple is not None:
+        return {col: value for col, value in zip(columns, convert_row(key_tuple, relation_msg))
+                if value is not None}
+    return None
+
+
+def build_changes(old_fields, new_fields):
+    """
+    Compare old and new field values and return a dict of changes.
+    Unchanged TOASTed values are not sent by Postgres and never count as changes.
+    """
+    changes = {}
+    for key, old_value in old_fields.items():
+        new_value = new_fields.get(key)
+        if new_value == "unchanged":
+            continue
+        if new_value != old_value:
+            changes[key] = old_value  # or perhaps {old: old_value, new: new_value}
+    return changes
+
+
+def build_wal_event(begin_msg, commit_msg, change_msg, relation_msg):
+    """
+    Build the wal_event for a single change of a committed transaction.
+
+    (commit_lsn, seq) identifies the event within its slot: commit_lsn is unique
+    per transaction and seq is the change's ordinal within it (see
+    TransactionBuffer), so a transaction streamed again after a reconnect yields
+    the same keys and its events are not stored twice.
+    """
+    commit_lsn_int = lsn_to_int(commit_msg["lsn"])
+    seq = change_msg.get("ordinal", 0)
+
+    record = build_record(change_msg, relation_msg)
+
+    data = None
+    if isinstance(record, str):
+        try:
+            data = decode_record_data(record, relation_msg)
+        except Exception as e:
+            logger.error("Error decoding record data: %s", e)
+    elif isinstance(record, dict):
+        # If build_record already returned a dict, just use it.
+        data = record
+
+    changes = None
+    if change_msg["type"] == "update":
+        old_fields = change_msg.get("old_fields") or build_old_fields(change_msg, relation_msg)
+        if old_fields:
+            new_fields = change_msg.get("fields") or (record if isinstance(record, dict) else data) or {}
+            changes = build_changes(old_fields, new_fields)
+
+    # Retrieve schema and table names.
+    source_table_schema = (
+        relation_msg.get("nspname")
+        or relation_msg.get("schema")
+        or "public"
+    )
+    source_table_name = (
+        relation_msg.get("relation_name")
+        or relation_msg.get("table")
+        or "unknown"
+    )
+
+    return {
+        "commit_lsn": commit_lsn_int,
+        "seq": seq,
+        "record_pks": [str(x) for x in change_msg.get("ids", [])],
+        "record": record,
+        "data": data,
+        "changes": changes,
+        "action": change_msg["type"],
+        "committed_at": commit_msg["commit_timestamp"].isoformat(),
+        "source_table_oid": relation_msg.get("table_oid", relation_msg.get("relation_id")),
+        "source_table_schema": source_table_schema,
+        "source_table_name": source_table_name
+    }
+
+
+def iter_wal_events(tx, relation_cache, binary=False):
+    """
+    Lazily build every wal_event of an assembled transaction (see TransactionBuffer),
+    in source order. Spilled transactions are streamed this way so only one writer
+    batch of events is materialised at a time.
+
+    RELATION messages are applied to `relation_cache` as they are met, so each
+    change is built against the table definition that was current when it was
+    written, and the cache carries over to later transactions.
+    """
+    begin_msg = tx.get("begin")
+    commit_msg = tx.get("commit")
+    if begin_msg is None or commit_msg is None:
+        logger.error("Missing begin/commit for transaction: %s", tx)
+        return
+
+    for msg in tx["messages"]:
+        if msg["type"] == "relation":
+            cache_relation(relation_cache, msg, binary=binary)
+            continue
+
+        relation_id = msg.get("relation_id")
+        relation_msg = relation_cache.get(relation_id)
+        if relation_msg is None:
+            logger.error("Missing relation metadata for relation_id %s and no cached value.", relation_id)
+            continue
+
+        yield build_wal_event(begin_msg, commit_msg, msg, relation_msg)
+
+
+def build_wal_events(tx, relation_cache, binary=False):
+    """
+    Build every wal_event of an assembled transaction as a list.
+    """
+    return list(iter_wal_events(tx, relation_cache, binary=binary))
@@ -0,0 +1,600 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# services/wal_listener/wal_event_writer.py
+"""
+Batched writer stage for the WAL listener.
+
+Each replication thread hands its constructed wal_event dicts to a WalEventWriter.
+The writer runs on its own thread, keeps a single Flask app context (and therefore
+a single pooled MySQL connection) open for its whole lifetime, resolves the
+wal_pipeline_id of its slot once, and flushes events to `wal_events` as multi-row
+INSERTs whenever `batch_size` events are pending or the oldest pending event has
+waited `max_latency` seconds.
+
+Events of one source transaction are submitted together and always land in the
+same flush (one multi-row INSERT, one MySQL commit), even when the transaction is
+larger than `batch_size`. The exception are transactions that spilled to disk
+(see TransactionBuffer): those are streamed through `submit_stream()` in
+`batch_size` chunks, each committed on its own, with the ack_lsn attached to the
+last chunk only.
+
+Each submitted item may carry an `ack_lsn` (the end LSN of the source transaction).
+Once a batch is committed the writer reports the highest ack_lsn in it through
+`on_flush`, which is what the replication thread is allowed to confirm to Postgres.
+Nothing is reported for a batch that did not commit: while MySQL fails, the batch
+is retried with Backoff and the slot is held where it is. Only events that are
+rejected for their own data (a malformed event, a value MySQL refuses) are skipped,
+and those go to the dead-letter log (WAL_DEAD_LETTER_PATH) instead.
+
+The queue is bounded by `max_pending_rows`: `submit_*()` never blocks, but once
+that many rows are waiting `has_room()` turns False and the SlotStream stops
+reading from the replication connection until the writer catches up.
+
+Inserts are idempotent: `wal_events` has a unique key on (wal_pipeline_id,
+commit_lsn, seq) and rows that already exist are skipped (a no-op ON DUPLICATE KEY
+UPDATE), so events of a transaction that is streamed again are not stored twice.
+The same LSN is stored in `replication_slot_checkpoints` in the batch's own MySQL
+transaction, so after a crash or reconnect the slot resumes right after the last
+transaction that actually reached `wal_events` (see `checkpoint_lsn`), whether or
+not Postgres was told about it yet.
+
+When the slot is leased (see slot_leases), every batch first checks, inside its own
+MySQL transaction, that the lease still carries this node's fencing token. A writer
+whose lease was taken over drops the batch without acknowledging it, sets `fenced`
+and stops; the new owner re-streams those transactions from the slot.
+"""
+import os
+import json
+import time
+import queue
+import logging
+import datetime
+import threading
+
+try:
+    from .reconnect import Backoff
+except ImportError:
+    from reconnect import Backoff
+
+logger = logging.getLogger(__name__)
+dead_letter_logger = logging.getLogger(__name__ + ".dead_letter")
+
+DEFAULT_BATCH_SIZE = int(os.getenv("WAL_WRITER_BATCH_SIZE", "5000"))
+DEFAULT_MAX_LATENCY = float(os.getenv("WAL_WRITER_MAX_LATENCY_MS", "50")) / 1000.0
+DEFAULT_STATS_INTERVAL = float(os.getenv("WAL_WRITER_STATS_INTERVAL", "10"))
+# Rows queued but not yet flushed before the replication side stops reading.
+DEFAULT_MAX_PENDING_ROWS = int(os.getenv("WAL_WRITER_MAX_PENDING_ROWS", "20000"))
+# JSON lines file for skipped events, in addition to the dead_letter logger.
+DEAD_LETTER_PATH = os.getenv("WAL_DEAD_LETTER_PATH", "")
+# How often submit_stream() calls its `on_wait` while blocked on a full queue.
+ON_WAIT_INTERVAL = 1.0
+
+_STOP = object()
+
+
+class LeaseLost(Exception):
+    """
+    The slot lease this writer was started with is no longer held.
+    """
+
+
+class WriterStopped(Exception):
+    """
+    The writer thread is not running (it could not start, gave up a batch or
+    failed), so nothing submitted to it would be persisted. The slot has to be
+    streamed again from its checkpoint.
+    """
+
+
+def is_data_error(error) -> bool:
+    """
+    True if MySQL (or SQLAlchemy, before sending it) rejected a statement because
+    of the values in it, so retrying the same rows cannot succeed. Connection and
+    server errors are not data errors.
+    """
+    from sqlalchemy.exc import IntegrityError, DataError, StatementError, DBAPIError
+
+    if isinstance(error, (IntegrityError, DataError)):
+        return True
+    return isinstance(error, StatementError) and not isinstance(error, DBAPIError)
+
+
+class WalEventWriter:
+    """
+    Buffers wal_events for one replication slot and persists them in batches.
+
+    Usage:
+        writer = WalEventWriter(db_id, slot_name, on_flush=tracker.flushed)
+        writer.start()
+        writer.submit_transaction(wal_events, ack_lsn=end_lsn)
+        ...
+        writer.stop()   # flushes whatever is still pending
+    """
+
+    def __init__(self, db_id, slot_name, batch_size=DEFAULT_BATCH_SIZE,
+                 max_latency=DEFAULT_MAX_LATENCY, stats_interval=DEFAULT_STATS_INTERVAL,
+                 on_flush=None, lease=None, max_pending_rows=DEFAULT_MAX_PENDING_ROWS, metrics=None):
+        self.db_id = db_id
+        self.slot_name = slot_name
+        self.batch_size = max(1, int(batch_size))
+        self.max_pending_rows = max(1, int(max_pending_rows))
+        self.max_latency = max(0.0, float(max_latency))
+        self.stats_interval = stats_interval
+        self.on_flush = on_flush
+        self.lease = lease
+        self.fenced = False
+        # SlotMetrics of the slot (see metrics.py); only touched from the writer thread
+        self.metrics = metrics
+
+        self.wal_pipeline_id = None
+        # Last persisted ack_lsn of this slot when the writer started (0 if none).
+        self.checkpoint_lsn = 0
+        # SQLAlchemy session the batches are written with (db.session, set by the thread).
+        self.session = None
+        # Error that made the writer give up a batch, if any; it accepts nothing after.
+        self.error = None
+        # Pacing of whole-batch retries while MySQL fails.
+        self.retry_backoff = Backoff()
+        self._stopping = threading.Event()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._ready = threading.Event()
+        self._room = threading.Condition()
+        self._pending_rows = 0
+
+        self._lock = threading.Lock()
+        self._rows_written = 0
+        self._rows_failed = 0
+        self._flushes = 0
+        self._started_at = None
+        self._window_start = None
+        self._window_rows = 0
+        self._last_rate = 0.0
+
+    def start(self):
+        """
+        Start the writer thread and wait until it has resolved its wal_pipeline_id.
+        Returns True when the writer is ready to accept events.
+        """
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"wal-writer-{self.db_id}",
+            daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise WriterStopped(f"WAL writer of db_id={self.db_id} could not start: {self.error}")
+        return self.wal_pipeline_id is not None
+
+    def submit(self, wal_event, ack_lsn=None):
+        """
+        Queue a constructed wal_event for persistence. Never blocks.
+
+        `wal_event` may be None to only advance the acknowledged position, e.g. for
+        a source transaction that produced no events; it is still reported through
+        `on_flush` in order, after everything submitted before it.
+        """
+        self._enqueue([wal_event] if wal_event is not None else [], ack_lsn)
+
+    def submit_transaction(self, wal_events, ack_lsn=None):
+        """
+        Queue all wal_events of one source transaction as a single unit. Never blocks.
+        An empty list only advances the acknowledged position.
+        """
+        self._enqueue(list(wal_events), ack_lsn)
+
+    def submit_stream(self, wal_events, ack_lsn=None, on_wait=None):
+        """
+        Queue an arbitrarily large iterable of wal_events in `batch_size` chunks,
+        blocking while more than one batch is already waiting, so that the caller's
+        memory stays bounded. While blocked, `on_wait()` is called every
+        ON_WAIT_INTERVAL seconds (the SlotStream sends keepalives from it).
+        Returns the number of events submitted.
+        """
+        count = 0
+        chunk = []
+        for wal_event in wal_events:
+            chunk.append(wal_event)
+            if len(chunk) >= self.batch_size:
+                self._wait_for_batch_room(on_wait)
+                self._enqueue(chunk, None)
+                count += len(chunk)
+                chunk = []
+        self._wait_for_batch_room(on_wait)
+        self._enqueue(chunk, ack_lsn)
+        return count + len(chunk)
+
+    def _wait_for_batch_room(self, on_wait):
+        if on_wait is None:
+            self.wait_for_room(self.batch_size)
+            return
+        while not self.wait_for_room(self.batch_size, timeout=ON_WAIT_INTERVAL):
+            on_wait()
+
+    def wait_for_room(self, max_pending_rows, timeout=None):
+        """
+        Block until at most `max_pending_rows` rows are queued but not yet flushed,
+        or `timeout` seconds passed. Returns True if there is room.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._room:
+            while self._pending_rows > max_pending_rows and self._thread is not None \
+                    and self._thread.is_alive():
+                wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+                self._room.wait(wait)
+            return True
+
+    def has_room(self):
+        """
+        False while `max_pending_rows` or more rows wait to be flushed. Raises
+        WriterStopped once the writer thread has exited.
+        """
+        self._check_running()
+        return self._pending_rows < self.max_pending_rows
+
+    def _check_running(self):
+        if self._thread is not None and not self._thread.is_alive():
+            reason = "slot lease lost" if self.fenced else (self.error or "writer thread exited")
+            raise WriterStopped(f"WAL writer of db_id={self.db_id} stopped: {reason}")
+
+    def _enqueue(self, wal_events, ack_lsn):
+        self._check_running()
+        with self._room:
+            self._pending_rows += len(wal_events)
+        self._queue.put((wal_events, ack_lsn))
+
+    def stop(self, timeout=None):
+        """
+        Flush pending events and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        # A batch being retried gives up (unacknowledged) instead of blocking the stop.
+        self._stopping.set()
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """
+        Throughput counters for tuning `batch_size` / `max_latency` under load.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                "db_id": self.db_id,
+                "slot_name": self.slot_name,
+                "batch_size": self.batch_size,
+                "max_latency_ms": self.max_latency * 1000.0,
+                "rows_written": self._rows_written,
+                "rows_failed": self._rows_failed,
+                "flushes": self._flushes,
+                "avg_batch_rows": (self._rows_written / self._flushes) if self._flushes else 0.0,
+                "rows_per_sec": self._last_rate,
+                "rows_per_sec_lifetime": (self._rows_written / elapsed) if elapsed else 0.0,
+                "pending_transactions": self._queue.qsize(),
+                "pending_rows": self._pending_rows,
+                "max_pending_rows": self.max_pending_rows,
+            }
+
+    def _run(self):
+        """
+        Writer thread. MySQL errors while writing are retried inside `_flush`;
+        anything else (MySQL unreachable at start, a bug) ends the thread with
+        `error` set, which surfaces as WriterStopped on the replication side, and
+        the slot reconnects with backoff and resumes from the checkpoint.
+        """
+        try:
+            from app import create_app
+            app = create_app()
+        except Exception as e:
+            logger.exception("❌ db_id=%s: Could not create app for WAL writer: %s", self.db_id, e)
+            self.error = e
+            self._ready.set()
+            return
+
+        with app.app_context():
+            try:
+                from models import db
+
+                self.session = db.session
+                self.wal_pipeline_id = self._resolve_wal_pipeline_id()
+                if self.wal_pipeline_id is not None:
+                    self.checkpoint_lsn = self._load_checkpoint()
+            except Exception as e:
+                logger.error("❌ db_id=%s: WAL writer could not load its slot: %s", self.db_id, e)
+                self.error = e
+                self.wal_pipeline_id = None
+                return
+            finally:
+                self._started_at = self._window_start = time.monotonic()
+                self._ready.set()
+            if self.wal_pipeline_id is None:
+                return
+            try:
+                self._loop()
+            except Exception as e:
+                logger.exception("❌ db_id=%s: WAL writer failed; %d rows not written: %s",
+                                 self.db_id, self._pending_rows, e)
+                self.error = e
+
+    def _loop(self):
+        batch = []
+        batch_rows = 0
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.max_latency
+                batch.append(item)
+                batch_rows += len(item[0])
+                # Drain whatever is already queued without waiting.
+                while batch_rows < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    batch_rows += len(item[0])
+
+            if batch and (stopping or batch_rows >= self.batch_size
+                          or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                batch_rows = 0
+                deadline = None
+                if self.fenced or self.error is not None:
+                    return
+
+            self._maybe_log_stats()
+
+    def _resolve_wal_pipeline_id(self):
+        from resources.postgres_replication_slot.models import PostgresReplicationSlot
+
+        rep_slot = PostgresReplicationSlot.query.filter_by(
+            postgres_database_id=self.db_id,
+            slot_name=self.slot_name
+        ).first()
+        if not rep_slot:
+            logger.error("Could not find replication slot for db_id=%s and slot_name=%s",
+                         self.db_id, self.slot_name)
+            return None
+        return rep_slot.id
+
+    def _flush(self, batch):
+        """
+        Write `batch` and the slot's checkpoint in one MySQL transaction, then
+        report the batch's ack_lsn through `on_flush`. The rows go out as a single
+        executemany, which both MySQL drivers rewrite into multi-row
+        `INSERT ... VALUES (...), (...)` statements (split to fit max_allowed_packet).
+
+        If MySQL rejects the batch for its data, the rows are retried one by one
+        in the same transaction, each under a savepoint, and those rejected again
+        are dead-lettered. Any other error rolls the whole transaction back and the
+        batch is retried with `retry_backoff` until it commits; nothing is
+        acknowledged meanwhile. Gives up, unacknowledged, on a lost lease or when
+        the writer is stopped mid-retry; either way the writer stops after it.
+        """
+        rows = []
+        dead = 0
+        for wal_events, _ in batch:
+            for wal_event in wal_events:
+                try:
+                    rows.append(self._to_row(wal_event, self.wal_pipeline_id))
+                except Exception as e:
+                    # Missing keys, unparsable values: retrying cannot fix the event.
+                    self._dead_letter(wal_event, e)
+                    dead += 1
+        pending = dead + len(rows)
+        ack_lsn = max((lsn for _, lsn in batch if lsn is not None), default=None)
+        started = time.perf_counter()
+        while True:
+            try:
+                written, failed = self._write(rows, ack_lsn)
+                break
+            except LeaseLost as e:
+                self._rollback()
+                self.fenced = True
+                logger.error("🚨 db_id=%s: %s; dropping %d unwritten WAL events and stopping the writer",
+                             self.db_id, e, pending)
+                self._release(pending)
+                return
+            except Exception as e:
+                self._rollback()
+                if self._stopping.is_set():
+                    self.error = e
+                    logger.error("🚨 db_id=%s: Writer stopped while MySQL failed (%s); %d WAL events were "
+                                 "not written and not acknowledged", self.db_id, e, pending)
+                    self._release(pending)
+                    return
+                delay = self.retry_backoff.next()
+                logger.error("❌ db_id=%s: Writing %d WAL events failed (attempt %d): %s; retrying in %.1fs",
+                             self.db_id, len(rows), self.retry_backoff.attempts, e, delay)
+                self._stopping.wait(delay)
+        self.retry_backoff.reset()
+        failed += dead
+
+        with self._lock:
+            self._rows_written += written
+            self._rows_failed += failed
+            self._window_rows += written
+            self._flushes += 1
+        if self.metrics is not None:
+            self.metrics.written(time.perf_counter() - started, written)
+        logger.debug("🐞 db_id=%s: Flushed %d WAL events (%d dead-lettered)", self.db_id, written, failed)
+
+        self._release(pending)
+        if ack_lsn is not None and self.on_flush is not None:
+            self.on_flush(ack_lsn)
+
+    def _write(self, rows, ack_lsn):
+        """
+        One attempt at the batch transaction. Returns (written, dead-lettered);
+        raises LeaseLost or the first error that is not a data error, in which
+        case the caller rolls back.
+        """
+        session = self.session
+        self._check_lease()
+        failed = 0
+        if rows:
+            try:
+                with session.begin_nested():
+                    session.execute(self._insert_statement(), rows)
+            except Exception as e:
+                if not is_data_error(e):
+                    raise
+                logger.warning("⚠️ db_id=%s: Batch insert of %d WAL events rejected (%s); retrying row by row",
+                               self.db_id, len(rows), e)
+                for row in rows:
+                    try:
+                        with session.begin_nested():
+                            session.execute(self._insert_statement(), [row])
+                    except Exception as row_error:
+                        if not is_data_error(row_error):
+                            raise
+                        self._dead_letter(row, row_error)
+                        failed += 1
+        self._save_checkpoint(ack_lsn)
+        session.commit()
+        return len(rows) - failed, failed
+
+    def _rollback(self):
+        try:
+            self.session.rollback()
+        except Exception as e:
+            logger.warning("⚠️ db_id=%s: Rollback failed: %s", self.db_id, e)
+
+    def _release(self, rows):
+        with self._room:
+            self._pending_rows -= rows
+            self._room.notify_all()
+
+    def _dead_letter(self, event, error):
+        """
+        Record an event that is skipped because of its own data.
+        """
+        dead_letter_logger.error("❌ db_id=%s: Skipping WAL event commit_lsn=%s seq=%s: %r",
+                                 self.db_id, event.get("commit_lsn"), event.get("seq"), error)
+        if not DEAD_LETTER_PATH:
+            return
+        record = {"db_id": self.db_id, "slot_name": self.slot_name, "error": repr(error),
+                  "at": datetime.datetime.utcnow().isoformat(), "event": event}
+        try:
+            with open(DEAD_LETTER_PATH, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            logger.error("❌ db_id=%s: Could not write to %s: %s", self.db_id, DEAD_LETTER_PATH, e)
+
+    @staticmethod
+    def _insert_statement():
+        """
+        Multi-row INSERT that skips events already stored under the same
+        (wal_pipeline_id, commit_lsn, seq). Unlike INSERT IGNORE this does not turn
+        other errors (bad values, missing FKs) into warnings.
+        """
+        from sqlalchemy.dialects.mysql import insert
+        from resources.wal_events.models import WalEvent
+
+        table = WalEvent.__table__
+        return insert(table).on_duplicate_key_update(id=table.c.id)
+
+    def _load_checkpoint(self):
+        from sqlalchemy import text
+
+        lsn = self.session.execute(
+            text("SELECT commit_lsn FROM replication_slot_checkpoints WHERE slot_id = :slot_id"),
+            {"slot_id": self.wal_pipeline_id}
+        ).scalar()
+        self.session.commit()
+        return int(lsn or 0)
+
+    def _save_checkpoint(self, ack_lsn):
+        """
+        Record `ack_lsn` as the slot's resume point, in the current transaction.
+        """
+        if ack_lsn is None:
+            return
+        from sqlalchemy import text
+
+        self.session.execute(
+            text("INSERT INTO replication_slot_checkpoints (slot_id, commit_lsn, updated_at) "
+                 "VALUES (:slot_id, :lsn, NOW(6)) "
+                 "ON DUPLICATE KEY UPDATE commit_lsn = GREATEST(commit_lsn, VALUES(commit_lsn)), "
+                 "updated_at = NOW(6)"),
+            {"slot_id": self.wal_pipeline_id, "lsn": ack_lsn}
+        )
+
+    def _check_lease(self):
+        """
+        Share-lock this node's lease row for the current transaction, so it cannot
+        be taken over before the batch commits. Raises LeaseLost if it is gone.
+        """
+        if self.lease is None:
+            return
+        from sqlalchemy import text
+
+        held = self.session.execute(
+            text("SELECT 1 FROM replication_slot_leases "
+                 "WHERE slot_id = :slot_id AND owner = :owner AND fencing_token = :token "
+                 "AND expires_at >= NOW(6) LOCK IN SHARE MODE"),
+            self.lease
+        ).first()
+        if held is None:
+            raise LeaseLost(f"lease of slot {self.lease['slot_id']} (token {self.lease['token']}) was lost")
+
+    def _maybe_log_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            elapsed = now - self._window_start
+            if elapsed < self.stats_interval:
+                return
+            self._last_rate = self._window_rows / elapsed
+            self._window_rows = 0
+            self._window_start = now
+        if self._last_rate:
+            logger.info("ℹ️ db_id=%s: WAL writer %.1f rows/sec (batch_size=%d, max_latency=%.0fms, pending_tx=%d)",
+                        self.db_id, self._last_rate, self.batch_size,
+                        self.max_latency * 1000.0, self._queue.qsize())
+
+    @staticmethod
+    def _to_row(wal_event, wal_pipeline_id):
+        from resources.wal_events.models import WalEventAction
+
+        # Convert committed_at to a datetime if needed.
+        committed_at = wal_event.get("committed_at")
+        if isinstance(committed_at, str):
+            committed_at = datetime.datetime.fromisoformat(committed_at)
+
+        return {
+            "wal_pipeline_id": wal_pipeline_id,
+            "commit_lsn": wal_event["commit_lsn"],
+            "seq": wal_event["seq"],
+            "record_pks": wal_event["record_pks"],
+            "record": wal_event["record"],
+            "data": wal_event["data"],
+            "changes": wal_event["changes"],
+            "action": WalEventAction[wal_event["action"]],
+            "committed_at": committed_at,
+            "source_table_oid": wal_event["source_table_oid"],
+            "source_table_schema": wal_event["source_table_schema"],
+            "source_table_name": wal_event["source_table_name"],
+        }
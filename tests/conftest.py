@@ -0,0 +1,11 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/conftest.py
+import os
+
+# appdb reads the application DB port at import time; nothing here connects.
+os.environ.setdefault("DB_PORT", "3306")
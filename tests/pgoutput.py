@@ -0,0 +1,93 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/pgoutput.py
+"""
+Builds raw pgoutput messages for the tests, the way the walsender sends them.
+Column values: str -> text, bytes -> binary, None -> NULL, UNCHANGED -> unchanged
+TOAST. `xid` prefixes change/relation messages as inside a stream block.
+"""
+import struct
+
+UNCHANGED = object()
+
+
+def _lsn(lsn):
+    return struct.pack('!II', lsn >> 32, lsn & 0xFFFFFFFF)
+
+
+def _xid(xid):
+    return b'' if xid is None else struct.pack('!I', xid)
+
+
+def tuple_data(values):
+    out = [struct.pack('!H', len(values))]
+    for value in values:
+        if value is None:
+            out.append(b'n')
+        elif value is UNCHANGED:
+            out.append(b'u')
+        elif isinstance(value, bytes):
+            out.append(b'b' + struct.pack('!I', len(value)) + value)
+        else:
+            encoded = value.encode('utf-8')
+            out.append(b't' + struct.pack('!I', len(encoded)) + encoded)
+    return b''.join(out)
+
+
+def begin(xid, final_lsn=0x16B3748, timestamp=0):
+    return b'B' + _lsn(final_lsn) + struct.pack('!QI', timestamp, xid)
+
+
+def commit(lsn=0x16B3748, end_lsn=0x16B3778, timestamp=0):
+    return b'C' + struct.pack('!B', 0) + _lsn(lsn) + _lsn(end_lsn) + struct.pack('!Q', timestamp)
+
+
+def relation(relation_id, name, columns, namespace="public", identity="d", xid=None):
+    """
+    `columns`: (name, type_oid) pairs, the first one flagged as the key.
+    """
+    out = [b'R', _xid(xid), struct.pack('!I', relation_id),
+           namespace.encode() + b'\x00', name.encode() + b'\x00', identity.encode(),
+           struct.pack('!H', len(columns))]
+    for i, (column, type_oid) in enumerate(columns):
+        out.append(struct.pack('!B', 1 if i == 0 else 0) + column.encode() + b'\x00'
+                   + struct.pack('!Ii', type_oid, -1))
+    return b''.join(out)
+
+
+def insert(relation_id, values, xid=None):
+    return b'I' + _xid(xid) + struct.pack('!I', relation_id) + b'N' + tuple_data(values)
+
+
+def update(relation_id, values, key=None, old=None, xid=None):
+    out = b'U' + _xid(xid) + struct.pack('!I', relation_id)
+    if key is not None:
+        out += b'K' + tuple_data(key)
+    if old is not None:
+        out += b'O' + tuple_data(old)
+    return out + b'N' + tuple_data(values)
+
+
+def delete(relation_id, key=None, old=None, xid=None):
+    tag, values = (b'K', key) if key is not None else (b'O', old)
+    return b'D' + _xid(xid) + struct.pack('!I', relation_id) + tag + tuple_data(values)
+
+
+def stream_start(xid, first_segment=True):
+    return b'S' + struct.pack('!IB', xid, 1 if first_segment else 0)
+
+
+def stream_stop():
+    return b'E'
+
+
+def stream_commit(xid, lsn=0x16B3748, end_lsn=0x16B3778, timestamp=0):
+    return b'c' + struct.pack('!I', xid) + commit(lsn, end_lsn, timestamp)[1:]
+
+
+def stream_abort(xid, subxid):
+    return b'A' + struct.pack('!II', xid, subxid)
@@ -0,0 +1,61 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_hash_ring.py
+from services.wal_listener.hash_ring import HashRing
+
+KEYS = [f"slot-{i}" for i in range(2000)]
+
+
+def owners(ring):
+    return {key: ring.node_for(key) for key in KEYS}
+
+
+def test_empty_ring():
+    assert HashRing().node_for("slot-1") is None
+
+
+def test_every_node_gets_a_share():
+    counts = {}
+    for node in owners(HashRing(["a", "b", "c", "d"])).values():
+        counts[node] = counts.get(node, 0) + 1
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(KEYS) / 4 / 2
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    ring = HashRing(["a", "b", "c"])
+    before = owners(ring)
+    ring.add_node("d")
+    after = owners(ring)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert moved
+    assert all(after[key] == "d" for key in moved)
+    assert len(moved) < len(KEYS) / 2
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(["a", "b", "c", "d"])
+    before = owners(ring)
+    ring.remove_node("b")
+    after = owners(ring)
+    assert "b" not in ring
+    for key in KEYS:
+        if before[key] == "b":
+            assert after[key] in ("a", "c", "d")
+        else:
+            assert after[key] == before[key]
+
+
+def test_add_and_remove_are_idempotent_and_reversible():
+    ring = HashRing(["a", "b"])
+    before = owners(ring)
+    ring.add_node("a")
+    ring.add_node("c")
+    ring.remove_node("c")
+    ring.remove_node("c")
+    assert ring.nodes == ["a", "b"]
+    assert owners(ring) == before
@@ -0,0 +1,70 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_lsn_tracker.py
+from services.wal_listener.lsn_tracker import FlushLsnTracker, format_lsn, parse_lsn
+
+
+class Cursor:
+    def __init__(self):
+        self.sent = []
+
+    def send_feedback(self, flush_lsn=0, force=False):
+        self.sent.append(flush_lsn)
+
+
+def test_received_wal_is_not_confirmed_until_persisted():
+    tracker, cursor = FlushLsnTracker(1, interval=0), Cursor()
+    tracker.received(0x500)
+    assert not tracker.maybe_send_feedback(cursor)
+    assert cursor.sent == []
+    assert tracker.lag_bytes == 0x500
+
+    tracker.flushed(0x300)
+    assert tracker.maybe_send_feedback(cursor)
+    assert cursor.sent == [0x300]
+    assert tracker.lag_bytes == 0x200
+
+
+def test_forced_feedback_still_confirms_only_the_persisted_position():
+    tracker, cursor = FlushLsnTracker(1), Cursor()
+    tracker.received(0x500)
+    tracker.flushed(0x100)
+    assert tracker.maybe_send_feedback(cursor, force=True)
+    assert cursor.sent == [0x100]
+
+
+def test_persisted_position_never_moves_back():
+    tracker, cursor = FlushLsnTracker(1, interval=0), Cursor()
+    tracker.flushed(0x300)
+    tracker.flushed(0x200)
+    tracker.maybe_send_feedback(cursor)
+    assert cursor.sent == [0x300]
+
+
+def test_feedback_is_coalesced_by_interval_and_bytes():
+    tracker, cursor = FlushLsnTracker(1, interval=3600, max_pending_bytes=0x1000), Cursor()
+    tracker.flushed(0x100)
+    assert not tracker.maybe_send_feedback(cursor)
+    tracker.flushed(0x1100)
+    assert tracker.maybe_send_feedback(cursor)
+    tracker.flushed(0x1200)
+    assert not tracker.maybe_send_feedback(cursor)
+    assert cursor.sent == [0x1100]
+
+
+def test_keepalive_resends_the_persisted_position():
+    tracker, cursor = FlushLsnTracker(1, interval=3600, keepalive_interval=0), Cursor()
+    tracker.received(0x900)
+    tracker.flushed(0x100)
+    assert tracker.keepalive(cursor)
+    assert tracker.keepalive(cursor)
+    assert cursor.sent == [0x100, 0x100]
+
+
+def test_lsn_text_form():
+    assert format_lsn(0x16_B374D848) == "16/B374D848"
+    assert parse_lsn("16/B374D848") == 0x16_B374D848
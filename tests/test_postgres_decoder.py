@@ -0,0 +1,139 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_postgres_decoder.py
+import datetime
+
+import pytest
+
+from services.wal_listener.postgres_decoder import decode_message, decode_message_view
+from tests import pgoutput
+from tests.pgoutput import UNCHANGED
+
+DECODERS = [decode_message, decode_message_view]
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_begin_and_commit(decode):
+    begin = decode(pgoutput.begin(xid=742, final_lsn=0x1_0000_0010, timestamp=1_500_000))
+    assert begin == {
+        "type": "begin",
+        "final_lsn": (1, 0x10),
+        "commit_timestamp": datetime.datetime(2000, 1, 1, 0, 0, 1, 500000, tzinfo=datetime.timezone.utc),
+        "xid": 742,
+    }
+    commit = decode(pgoutput.commit(lsn=0x20, end_lsn=0x48))
+    assert commit["type"] == "commit"
+    assert commit["lsn"] == (0, 0x20)
+    assert commit["end_lsn"] == (0, 0x48)
+
+
+def test_insert_bytes_decoder_returns_raw_tuple():
+    msg = decode_message(pgoutput.insert(16384, ["1", None, "ä"]))
+    assert msg["type"] == "insert"
+    assert msg["relation_id"] == 16384
+    assert msg["columns"] == 3
+    assert bytes.fromhex(msg["tuple_raw"]) == pgoutput.tuple_data(["1", None, "ä"])[2:]
+
+
+@pytest.mark.parametrize("payload", [
+    pgoutput.insert(16384, ["1", None, "ä", b"\x00\x01"]),
+    bytearray(pgoutput.insert(16384, ["1", None, "ä", b"\x00\x01"])),
+    memoryview(pgoutput.insert(16384, ["1", None, "ä", b"\x00\x01"])),
+])
+def test_insert_view_decoder_parses_tuple(payload):
+    msg = decode_message_view(payload)
+    assert msg["type"] == "insert"
+    assert msg["tag"] == "N"
+    assert msg["tuple"] == ["1", None, "ä", b"\x00\x01"]
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_update_with_old_key_and_unchanged_toast(decode):
+    msg = decode(pgoutput.update(16384, ["2", UNCHANGED], key=["1", None]))
+    assert msg == {
+        "type": "update",
+        "relation_id": 16384,
+        "key_tuple": ["1", None],
+        "old_tuple": None,
+        "tuple": ["2", "unchanged"],
+    }
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_update_with_full_old_row(decode):
+    msg = decode(pgoutput.update(16384, ["1", "new"], old=["1", "old"]))
+    assert msg["key_tuple"] is None
+    assert msg["old_tuple"] == ["1", "old"]
+    assert msg["tuple"] == ["1", "new"]
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_delete(decode):
+    assert decode(pgoutput.delete(16384, key=["7", None]))["key_tuple"] == ["7", None]
+    msg = decode(pgoutput.delete(16384, old=["7", "x"]))
+    assert msg["type"] == "delete"
+    assert msg["key_tuple"] is None
+    assert msg["old_tuple"] == ["7", "x"]
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_truncated_update_is_reported(decode):
+    payload = pgoutput.update(16384, ["1", "new"], key=["1", None])
+    msg = decode(payload[:12])
+    assert msg["type"] == "update"
+    assert "error" in msg
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_relation(decode):
+    msg = decode(pgoutput.relation(16384, "orders", [("id", 23), ("note", 25)], identity="f"))
+    assert msg["type"] == "relation"
+    assert msg["namespace"] == "public"
+    assert msg["relation_name"] == "orders"
+    assert msg["replica_identity"] == "f"
+    assert msg["columns"] == ["id", "note"]
+    assert [c["type_oid"] for c in msg["columns_meta"]] == [23, 25]
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_stream_control_messages(decode):
+    assert decode(pgoutput.stream_start(900, first_segment=False)) == {
+        "type": "stream_start", "xid": 900, "first_segment": False,
+    }
+    assert decode(pgoutput.stream_stop()) == {"type": "stream_stop"}
+    commit = decode(pgoutput.stream_commit(900, lsn=0x30, end_lsn=0x60))
+    assert commit["type"] == "stream_commit"
+    assert commit["xid"] == 900
+    assert commit["end_lsn"] == (0, 0x60)
+    assert decode(pgoutput.stream_abort(900, 901)) == {"type": "stream_abort", "xid": 900, "subxid": 901}
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_changes_inside_a_stream_carry_their_xid(decode):
+    msg = decode(pgoutput.update(16384, ["1", "b"], key=["1", None], xid=901), in_stream=True)
+    assert msg["xid"] == 901
+    assert msg["relation_id"] == 16384
+    assert msg["tuple"] == ["1", "b"]
+
+    relation = decode(pgoutput.relation(16384, "orders", [("id", 23)], xid=901), in_stream=True)
+    assert relation["xid"] == 901
+    assert relation["relation_name"] == "orders"
+
+
+def test_view_decoder_matches_bytes_decoder_on_streamed_insert():
+    payload = pgoutput.insert(16384, ["1", "x"], xid=901)
+    by_bytes = decode_message(payload, in_stream=True)
+    by_view = decode_message_view(payload, in_stream=True)
+    assert by_view["xid"] == by_bytes["xid"] == 901
+    assert by_view["tuple"] == ["1", "x"]
+    assert by_bytes["tuple_raw"] == pgoutput.tuple_data(["1", "x"])[2:].hex()
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_empty_and_unknown_messages(decode):
+    assert decode(b"")["type"] == "empty_or_unsupported"
+    assert decode(b"Zxyz")["type"] == "unsupported"
@@ -0,0 +1,34 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_reconnect.py
+import random
+
+from services.wal_listener.reconnect import Backoff
+
+
+def test_delays_grow_within_equal_jitter_bounds():
+    backoff = Backoff(base=1, cap=60, rng=random.Random(7))
+    for attempt in range(10):
+        delay = min(60, 2 ** attempt)
+        assert delay / 2 <= backoff.next() <= delay
+    assert backoff.attempts == 10
+
+
+def test_delay_never_exceeds_cap():
+    backoff = Backoff(base=1, cap=5, rng=random.Random(7))
+    delays = [backoff.next() for _ in range(50)]
+    assert max(delays) <= 5
+    assert min(delays[5:]) >= 2.5
+
+
+def test_reset_starts_over():
+    backoff = Backoff(base=2, cap=60, rng=random.Random(7))
+    for _ in range(4):
+        backoff.next()
+    backoff.reset()
+    assert backoff.attempts == 0
+    assert 1 <= backoff.next() <= 2
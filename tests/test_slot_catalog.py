@@ -0,0 +1,174 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_slot_catalog.py
+"""
+SlotCatalog against an in-memory pool: deltas merge changed rows into the
+catalog, re-read the overlap window, and a full sync drops deleted slots.
+"""
+import contextlib
+import datetime
+
+import pytest
+
+from services.wal_listener.slot_catalog import ACTIVE_SLOTS_QUERY, CHANGED_SLOTS_QUERY, SlotCatalog
+
+T0 = datetime.datetime(2024, 5, 1, 12, 0, 0)
+
+
+def seconds(n):
+    return datetime.timedelta(seconds=n)
+
+
+class Tables:
+    """
+    The joined slot rows, each with the `updated_at` of its slot row and of its
+    database row. `now` is MySQL's NOW().
+    """
+
+    def __init__(self):
+        self.now = T0
+        self.rows = {}
+        self.down = False
+        self.queries = []
+
+    def put(self, slot_id, status="active", hostname="pg-1", slot_updated_at=None, db_updated_at=T0):
+        self.rows[slot_id] = {
+            "db_id": f"db-{slot_id}", "slot_id": slot_id, "dbname": "app", "hostname": hostname,
+            "port": 5432, "username": "u", "password": "p", "slot_name": f"slot_{slot_id}",
+            "publication_name": "pub", "annotations": '{"binary": false}', "status": status,
+            "slot_updated_at": slot_updated_at or self.now, "db_updated_at": db_updated_at,
+        }
+
+    def execute(self, sql, params):
+        if self.down:
+            raise ConnectionError("MySQL is down")
+        if sql == "SELECT NOW() AS now":
+            return [{"now": self.now}]
+        self.queries.append(sql)
+        if sql == ACTIVE_SLOTS_QUERY:
+            return [row for row in self.rows.values() if row["status"] == "active"]
+        if sql == CHANGED_SLOTS_QUERY:
+            since, _ = params
+            return [row for row in self.rows.values()
+                    if row["slot_updated_at"] >= since or row["db_updated_at"] >= since]
+        raise AssertionError(f"unexpected statement: {sql}")
+
+
+class Pool:
+    def __init__(self, tables):
+        self.tables = tables
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self
+
+    @contextlib.contextmanager
+    def cursor(self):
+        yield Cursor(self.tables)
+
+
+class Cursor:
+    def __init__(self, tables):
+        self.tables = tables
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self._rows = self.tables.execute(sql, params)
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+@pytest.fixture
+def tables():
+    tables = Tables()
+    for slot_id in ("a", "b", "c"):
+        tables.put(slot_id)
+    tables.put("paused", status="paused")
+    return tables
+
+
+@pytest.fixture
+def catalog(tables):
+    catalog = SlotCatalog(pool=Pool(tables), full_resync_interval=3600, overlap=5)
+    catalog.active_slots()
+    tables.queries.clear()
+    return catalog
+
+
+def slot_ids(rows):
+    return sorted(row["slot_id"] for row in rows)
+
+
+def test_first_read_is_full(catalog):
+    assert slot_ids(catalog.slots.values()) == ["a", "b", "c"]
+    assert catalog.full_syncs == 1
+    assert catalog.high_water == T0
+    assert catalog.slots["a"]["conn_details"]["host"] == "pg-1"
+    assert catalog.slots["a"]["annotations"] == {"binary": False}
+
+
+def test_delta_merges_added_changed_and_deactivated_slots(tables, catalog):
+    tables.now = T0 + seconds(60)
+    tables.put("d")
+    tables.put("b", hostname="pg-2")
+    tables.put("c", status="inactive")
+    tables.put("paused")
+
+    assert slot_ids(catalog.active_slots()) == ["a", "b", "d", "paused"]
+    assert catalog.slots["b"]["conn_details"]["host"] == "pg-2"
+    assert tables.queries == [CHANGED_SLOTS_QUERY]
+    assert catalog.full_syncs == 1
+    assert catalog.delta_syncs == 1
+    assert catalog.high_water == T0 + seconds(60)
+
+
+def test_database_change_reaches_its_slot(tables, catalog):
+    tables.now = T0 + seconds(60)
+    tables.rows["a"].update(hostname="pg-9", db_updated_at=tables.now)
+    catalog.active_slots()
+    assert catalog.slots["a"]["conn_details"]["host"] == "pg-9"
+
+
+def test_delta_reads_back_the_overlap_window(tables, catalog):
+    tables.now = T0 + seconds(60)
+    catalog.active_slots()
+    # A transaction that wrote updated_at 3s before the last high-water mark
+    # but committed after that read.
+    tables.put("late", slot_updated_at=T0 + seconds(57))
+    tables.now = T0 + seconds(120)
+    catalog.active_slots()
+    assert "late" in catalog.slots
+
+    # Rows older than the overlap are not read again.
+    catalog.rows_read = 0
+    tables.now = T0 + seconds(180)
+    catalog.active_slots()
+    assert catalog.rows_read == 0
+
+
+def test_deleted_slot_disappears_on_the_next_full_sync(tables, catalog):
+    del tables.rows["a"]
+    tables.now = T0 + seconds(60)
+    assert "a" in slot_ids(catalog.active_slots())
+
+    catalog.request_full()
+    assert slot_ids(catalog.active_slots()) == ["b", "c"]
+    assert catalog.full_syncs == 2
+
+
+def test_mysql_outage_keeps_the_last_rows_and_resyncs_fully(tables, catalog):
+    tables.down = True
+    assert slot_ids(catalog.active_slots()) == ["a", "b", "c"]
+
+    tables.down = False
+    tables.put("d")
+    assert slot_ids(catalog.active_slots()) == ["a", "b", "c", "d"]
+    assert tables.queries == [ACTIVE_SLOTS_QUERY]
@@ -0,0 +1,191 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_slot_leases.py
+"""
+SlotLeaseManager against an in-memory stand-in for the two lease tables: every
+acquisition bumps the fencing token, and a node whose lease was taken over can
+neither pass lease_is_current() nor release the new owner's lease.
+"""
+import pytest
+
+from services.wal_listener.slot_leases import SlotLeaseManager, lease_is_current
+
+TTL = 10
+TTL_US = TTL * 1000000
+
+
+class LeaseTables:
+    """
+    Just enough of MySQL for the statements SlotLeaseManager runs. `now` is
+    NOW(6) in microseconds.
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.nodes = {}    # node_id -> expires_at
+        self.leases = {}   # slot_id -> {"owner", "fencing_token", "expires_at"}
+
+    def connect(self, autocommit=True):
+        return Connection(self)
+
+    def execute(self, sql, params):
+        """
+        Returns (rowcount, rows).
+        """
+        now = self.now
+        if sql.startswith("INSERT INTO wal_listener_nodes"):
+            self.nodes[params[0]] = now + params[3]
+            return 1, []
+        if sql.startswith("DELETE FROM wal_listener_nodes"):
+            return int(self.nodes.pop(params[0], None) is not None), []
+        if sql.startswith("SELECT node_id FROM wal_listener_nodes"):
+            return 0, [{"node_id": node} for node, expires_at in self.nodes.items() if expires_at >= now]
+        if sql.startswith("INSERT IGNORE INTO replication_slot_leases"):
+            self.leases.setdefault(params[0], {"owner": None, "fencing_token": 0, "expires_at": now})
+            return 1, []
+        if sql.startswith("UPDATE replication_slot_leases SET owner = %s"):
+            owner, ttl_us, slot_id = params
+            lease = self.leases[slot_id]
+            if lease["owner"] is not None and lease["expires_at"] >= now:
+                return 0, []
+            lease.update(owner=owner, fencing_token=lease["fencing_token"] + 1, expires_at=now + ttl_us)
+            return 1, []
+        if sql.startswith("UPDATE replication_slot_leases SET renewed_at"):
+            ttl_us, owner = params
+            held = [lease for lease in self.leases.values() if lease["owner"] == owner and lease["expires_at"] >= now]
+            for lease in held:
+                lease["expires_at"] = now + ttl_us
+            return len(held), []
+        if sql.startswith("UPDATE replication_slot_leases SET owner = NULL"):
+            if len(params) == 1:
+                match = [lease for lease in self.leases.values() if lease["owner"] == params[0]]
+            else:
+                slot_id, owner, token = params
+                lease = self.leases.get(slot_id)
+                match = [lease] if lease and (lease["owner"], lease["fencing_token"]) == (owner, token) else []
+            for lease in match:
+                lease.update(owner=None, expires_at=now)
+            return len(match), []
+        if sql.startswith("SELECT fencing_token FROM replication_slot_leases"):
+            lease = self.leases.get(params[0])
+            return 0, [{"fencing_token": lease["fencing_token"]}] if lease and lease["owner"] == params[1] else []
+        if sql.startswith("SELECT slot_id, fencing_token FROM replication_slot_leases"):
+            return 0, [{"slot_id": slot_id, "fencing_token": lease["fencing_token"]}
+                       for slot_id, lease in self.leases.items()
+                       if lease["owner"] == params[0] and lease["expires_at"] >= now]
+        if sql.startswith("SELECT slot_id, owner, fencing_token"):
+            return 0, [{"slot_id": slot_id, "owner": lease["owner"], "fencing_token": lease["fencing_token"],
+                        "expired_us": now - lease["expires_at"]} for slot_id, lease in self.leases.items()]
+        if sql.startswith("SELECT 1 FROM replication_slot_leases"):
+            slot_id, owner, token = params
+            lease = self.leases.get(slot_id)
+            current = (lease is not None and lease["owner"] == owner and lease["fencing_token"] == token
+                       and lease["expires_at"] >= now)
+            return 0, [{"1": 1}] if current else []
+        raise AssertionError(f"unexpected statement: {sql}")
+
+
+class Connection:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def cursor(self):
+        return Cursor(self.tables)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class Cursor:
+    def __init__(self, tables):
+        self.tables = tables
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.rowcount, self._rows = self.tables.execute(" ".join(sql.split()), params)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+@pytest.fixture
+def tables():
+    return LeaseTables()
+
+
+def node(tables, node_id):
+    manager = SlotLeaseManager(node_id=node_id, ttl=TTL, connect=tables.connect)
+    manager._heartbeat()
+    return manager
+
+
+def current(tables, lease):
+    return lease_is_current(lease, connection=tables.connect())
+
+
+def test_every_acquisition_bumps_the_fencing_token(tables):
+    a = node(tables, "node-a")
+    assert a.acquire("slot-1") == 1
+    assert a.acquire("slot-1") is None  # already leased, even to itself
+    a.release("slot-1")
+    assert a.acquire("slot-1") == 2
+
+
+def test_stalled_owner_is_fenced_off_by_the_takeover(tables):
+    a = node(tables, "node-a")
+    a.acquire("slot-1")
+    stale = {"slot_id": "slot-1", "owner": "node-a", "token": 1}
+    assert current(tables, stale)
+
+    b = node(tables, "node-b")
+    assert b.acquire("slot-1") is None  # still leased to node-a
+
+    tables.now += TTL_US + 1  # node-a stalls past its TTL
+    b._heartbeat()
+    assert b.acquire("slot-1") == 2
+    fresh = {"slot_id": "slot-1", "owner": "node-b", "token": 2}
+    assert not current(tables, stale)
+    assert current(tables, fresh)
+
+    # node-a wakes up: its heartbeat finds the lease gone, and releasing the
+    # slot leaves node-b's lease alone.
+    a._heartbeat()
+    assert "slot-1" not in a.held
+    a.held["slot-1"] = 1
+    a.release("slot-1")
+    assert current(tables, fresh)
+
+
+def test_nodes_split_the_slots_and_take_over_released_ones(tables):
+    rows = [{"slot_id": f"slot-{i}"} for i in range(30)]
+    a, b = node(tables, "node-a"), node(tables, "node-b")
+    owned_a = {row["slot_id"]: row["lease"] for row in a.claim(rows)}
+    owned_b = {row["slot_id"]: row["lease"] for row in b.claim(rows)}
+    assert owned_a and owned_b
+    assert set(owned_a) | set(owned_b) == {row["slot_id"] for row in rows}
+    assert not set(owned_a) & set(owned_b)
+    assert all(current(tables, lease) for lease in list(owned_a.values()) + list(owned_b.values()))
+
+    a.stop()
+    taken_over = {row["slot_id"]: row["lease"] for row in b.claim(rows)}
+    assert set(taken_over) == {row["slot_id"] for row in rows}
+    for slot_id, lease in owned_a.items():
+        assert taken_over[slot_id]["token"] == lease["token"] + 1
+        assert not current(tables, lease)
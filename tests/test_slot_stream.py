@@ -0,0 +1,130 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_slot_stream.py
+"""
+SlotStream.handle: a message that cannot be handled stops the stream before
+anything after it is acknowledged.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from services.wal_listener.slot_stream import SlotStream, StreamError
+from tests import pgoutput
+
+RELATION = pgoutput.relation(16384, "orders", [("id", 23), ("note", 25)])
+
+
+class Cursor:
+    def __init__(self):
+        self.sent = []
+
+    def send_feedback(self, flush_lsn=0, force=False, **kwargs):
+        self.sent.append(flush_lsn)
+
+
+class PersistingWriter:
+    """
+    Persists every submitted transaction at once and reports it, like the
+    WalEventWriter does after its commit.
+    """
+    fenced = False
+    max_pending_rows = 1
+
+    def __init__(self, on_flush):
+        self.on_flush = on_flush
+        self.events = []
+
+    def has_room(self):
+        return True
+
+    def submit_transaction(self, wal_events, ack_lsn=None):
+        self.events.extend(wal_events)
+        if ack_lsn is not None:
+            self.on_flush(ack_lsn)
+
+    def submit_stream(self, wal_events, ack_lsn=None, on_wait=None):
+        wal_events = list(wal_events)
+        self.submit_transaction(wal_events, ack_lsn)
+        return len(wal_events)
+
+
+@pytest.fixture
+def stream():
+    stream = SlotStream(1, {}, "slot", "pub")
+    stream.cursor = Cursor()
+    stream.connection = SimpleNamespace(closed=False)
+    stream.writer = PersistingWriter(stream._flushed)
+    stream.tracker.interval = 0
+    return stream
+
+
+def feed(stream, payloads, lsn):
+    for payload in payloads:
+        lsn += 0x10
+        stream.handle(SimpleNamespace(data_start=lsn, payload=payload, cursor=stream.cursor))
+    return lsn
+
+
+def transaction(xid, commit_lsn, *changes):
+    return [pgoutput.begin(xid)] + list(changes) + [pgoutput.commit(commit_lsn, commit_lsn + 0x30)]
+
+
+def test_committed_transaction_is_confirmed(stream):
+    feed(stream, transaction(900, 0x1000, RELATION, pgoutput.insert(16384, ["1", "a"])), 0x1000)
+    assert stream.tracker.flushed_lsn == 0x1030
+    assert stream.cursor.sent == [0x1030]
+    assert len(stream.writer.events) == 1
+
+
+def test_decode_failure_does_not_move_the_confirmed_lsn(stream):
+    lsn = feed(stream, transaction(900, 0x1000, RELATION, pgoutput.insert(16384, ["1", "a"])), 0x1000)
+    decode = stream.decode
+
+    def failing_decode(payload, in_stream=False):
+        if payload[:1] == b"I" and b"boom" in payload:
+            raise UnicodeDecodeError("utf-8", b"", 0, 1, "boom")
+        return decode(payload, in_stream)
+
+    stream.decode = failing_decode
+    bad = transaction(901, 0x2000, pgoutput.insert(16384, ["2", "boom"]), pgoutput.insert(16384, ["3", "c"]))
+    with pytest.raises(StreamError):
+        feed(stream, bad, lsn)
+
+    stream.send_feedback(force=True)
+    assert stream.tracker.flushed_lsn == 0x1030
+    assert max(stream.cursor.sent) == 0x1030
+    assert len(stream.writer.events) == 1
+
+
+def test_malformed_change_is_not_skipped(stream):
+    truncated = pgoutput.update(16384, ["1", "b"], key=["1", None])[:12]
+    with pytest.raises(StreamError):
+        feed(stream, transaction(900, 0x1000, RELATION, truncated), 0x1000)
+    assert stream.tracker.flushed_lsn == 0
+
+
+def test_change_without_relation_is_not_acknowledged(stream):
+    with pytest.raises(StreamError, match="built 0 of 1"):
+        feed(stream, transaction(900, 0x1000, pgoutput.insert(16385, ["1"])), 0x1000)
+    assert stream.tracker.flushed_lsn == 0
+    assert stream.writer.events == []
+
+
+def test_spilled_transaction_with_a_lost_change_is_not_acknowledged(stream):
+    stream.tx_buffer.spill_threshold = 1
+    changes = [pgoutput.insert(16384, [str(i), "x"]) for i in range(3)] + [pgoutput.insert(16385, ["9"])]
+    with pytest.raises(StreamError):
+        feed(stream, transaction(900, 0x1000, RELATION, *changes), 0x1000)
+    assert stream.tracker.flushed_lsn == 0
+    assert len(stream.writer.events) == 0
+
+
+def test_stream_commit_of_unknown_transaction_is_not_acknowledged(stream):
+    with pytest.raises(StreamError, match="unknown xid"):
+        feed(stream, [pgoutput.stream_commit(950, 0x3000, 0x3030)], 0x3000)
+    assert stream.tracker.flushed_lsn == 0
@@ -0,0 +1,118 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_supervisor.py
+"""
+ShardSupervisor.refresh_subscriptions with fake worker processes: a slot that
+moves is withheld from its new worker until the handoff delay has passed.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from services.wal_listener import supervisor as supervisor_module
+from services.wal_listener.supervisor import ShardSupervisor
+
+HANDOFF_DELAY = 5
+ROWS = [{"db_id": db_id} for db_id in range(40)]
+
+
+class Inbox:
+    def __init__(self):
+        self.sent = []
+
+    def put(self, rows):
+        self.sent.append(rows)
+
+    def slots(self):
+        return {row["db_id"] for row in self.sent[-1]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(supervisor_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def supervisor(clock):
+    supervisor = ShardSupervisor(workers=2, check_interval=1, handoff_delay=HANDOFF_DELAY)
+    supervisor.leases = None
+    supervisor.lag_monitor = None
+    supervisor.fetch_active_slots = lambda: list(ROWS)
+    supervisor.stopped = []
+
+    def spawn(worker_id):
+        supervisor.workers[worker_id] = (SimpleNamespace(pid=None), Inbox())
+        supervisor._sent.pop(worker_id, None)
+
+    def stop_worker(worker_id):
+        supervisor.workers.pop(worker_id)
+        supervisor.stopped.append(worker_id)
+
+    supervisor._spawn = spawn
+    supervisor._stop_worker = stop_worker
+    for worker_id in supervisor.ring.nodes:
+        spawn(worker_id)
+    supervisor.refresh_subscriptions()
+    return supervisor
+
+
+def inbox(supervisor, worker_id):
+    return supervisor.workers[worker_id][1]
+
+
+def owned_by(supervisor, worker_id):
+    return {db_id for db_id, owner in supervisor.assignments.items() if owner == worker_id}
+
+
+def test_every_slot_goes_to_its_ring_owner(supervisor):
+    assert inbox(supervisor, "worker-0").slots() | inbox(supervisor, "worker-1").slots() == set(range(40))
+    for worker_id in ("worker-0", "worker-1"):
+        assert inbox(supervisor, worker_id).slots() == owned_by(supervisor, worker_id)
+
+
+def test_unchanged_assignment_is_not_resent(supervisor):
+    supervisor.refresh_subscriptions()
+    assert len(inbox(supervisor, "worker-0").sent) == 1
+
+
+def test_moved_slots_wait_for_the_handoff_delay(supervisor, clock):
+    before = dict(supervisor.assignments)
+    supervisor.add_worker("worker-2")
+    supervisor.refresh_subscriptions()
+    moved = owned_by(supervisor, "worker-2")
+    assert moved
+    assert all(before[db_id] != "worker-2" for db_id in moved)
+
+    # Taken away from the old owners at once, not yet given to the new one.
+    assert inbox(supervisor, "worker-2").slots() == set()
+    for worker_id in ("worker-0", "worker-1"):
+        assert inbox(supervisor, worker_id).slots() == owned_by(supervisor, worker_id)
+        assert not inbox(supervisor, worker_id).slots() & moved
+
+    clock.value += HANDOFF_DELAY - 0.1
+    supervisor.refresh_subscriptions()
+    assert inbox(supervisor, "worker-2").slots() == set()
+
+    clock.value += 0.1
+    supervisor.refresh_subscriptions()
+    assert inbox(supervisor, "worker-2").slots() == moved
+
+
+def test_removed_worker_is_emptied_then_stopped_after_the_handoff(supervisor, clock):
+    released = owned_by(supervisor, "worker-1")
+    supervisor.remove_worker("worker-1")
+    supervisor.refresh_subscriptions()
+    assert inbox(supervisor, "worker-1").sent[-1] == []
+    assert inbox(supervisor, "worker-0").slots() == set(range(40)) - released
+    assert supervisor.stopped == []
+
+    clock.value += HANDOFF_DELAY
+    supervisor.refresh_subscriptions()
+    assert supervisor.stopped == ["worker-1"]
+    assert inbox(supervisor, "worker-0").slots() == set(range(40))
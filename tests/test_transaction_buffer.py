@@ -0,0 +1,115 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_transaction_buffer.py
+from services.wal_listener.postgres_decoder import decode_message_view
+from services.wal_listener.transaction_buffer import TransactionBuffer
+from tests import pgoutput
+
+RELATION = pgoutput.relation(16384, "orders", [("id", 23), ("note", 25)])
+
+
+def stream_decode(payload):
+    return decode_message_view(payload, True)
+
+
+def fill(buffer, payloads, decode=decode_message_view):
+    buffer.begin(decode(pgoutput.begin(xid=900)))
+    for payload in payloads:
+        buffer.append(decode(payload), payload)
+
+
+def read_back(buffer):
+    tx = buffer.commit(decode_message_view(pgoutput.commit()))
+    return tx, list(tx["messages"])
+
+
+def test_in_memory_transaction_numbers_changes():
+    buffer = TransactionBuffer(decode=decode_message_view)
+    fill(buffer, [RELATION] + [pgoutput.insert(16384, [str(i), "x"]) for i in range(3)])
+    assert len(buffer) == 3
+
+    tx, messages = read_back(buffer)
+    assert not tx["spilled"]
+    assert tx["changes"] == 3
+    assert tx["begin"]["xid"] == 900
+    assert messages[0]["type"] == "relation"
+    assert [(m["ordinal"], m["tuple"][0]) for m in messages[1:]] == [(0, "0"), (1, "1"), (2, "2")]
+    assert not buffer.in_progress
+
+
+def test_spilled_transaction_reads_back_in_order(tmp_path):
+    buffer = TransactionBuffer(decode=decode_message_view, spill_threshold=200, spill_dir=str(tmp_path))
+    changes = [pgoutput.insert(16384, [str(i), "n" * 40]) for i in range(20)]
+    fill(buffer, [RELATION] + changes)
+    assert buffer.spilled
+    assert buffer.stats()["spilled_bytes"] > 0
+
+    tx, messages = read_back(buffer)
+    assert tx["spilled"]
+    assert tx["changes"] == 20
+    assert messages[0]["type"] == "relation"
+    inserts = messages[1:]
+    assert [m["ordinal"] for m in inserts] == list(range(20))
+    assert [m["tuple"] for m in inserts] == [[str(i), "n" * 40] for i in range(20)]
+
+
+def test_spill_needs_a_decoder():
+    buffer = TransactionBuffer(spill_threshold=10)
+    fill(buffer, [pgoutput.insert(16384, ["1", "n" * 40])])
+    assert not buffer.spilled
+
+
+def test_abort_subtransaction_in_memory():
+    buffer = TransactionBuffer(decode=stream_decode)
+    fill(buffer, [
+        pgoutput.relation(16384, "orders", [("id", 23)], xid=900),
+        pgoutput.insert(16384, ["1"], xid=900),
+        pgoutput.insert(16384, ["2"], xid=901),
+        pgoutput.insert(16384, ["3"], xid=901),
+        pgoutput.insert(16384, ["4"], xid=900),
+    ], decode=stream_decode)
+    buffer.abort_subtransaction(901)
+    assert len(buffer) == 2
+
+    tx, messages = read_back(buffer)
+    assert tx["changes"] == 2
+    assert [m["type"] for m in messages] == ["relation", "insert", "insert"]
+    assert [(m["ordinal"], m["tuple"]) for m in messages[1:]] == [(0, ["1"]), (1, ["4"])]
+
+
+def test_abort_subtransaction_after_spilling():
+    buffer = TransactionBuffer(decode=stream_decode, spill_threshold=60)
+    fill(buffer, [
+        pgoutput.insert(16384, ["1", "x" * 20], xid=900),
+        pgoutput.insert(16384, ["2", "x" * 20], xid=901),
+        pgoutput.insert(16384, ["3", "x" * 20], xid=901),
+        pgoutput.insert(16384, ["4", "x" * 20], xid=900),
+        pgoutput.insert(16384, ["5", "x" * 20], xid=902),
+    ], decode=stream_decode)
+    assert buffer.spilled
+    buffer.abort_subtransaction(901)
+
+    tx, messages = read_back(buffer)
+    assert tx["changes"] == 3
+    assert [(m["ordinal"], m["tuple"][0]) for m in messages] == [(0, "1"), (1, "4"), (2, "5")]
+
+
+def test_abort_of_unknown_subtransaction_changes_nothing():
+    buffer = TransactionBuffer(decode=stream_decode)
+    fill(buffer, [pgoutput.insert(16384, ["1"], xid=900)], decode=stream_decode)
+    buffer.abort_subtransaction(999)
+    assert len(buffer) == 1
+
+
+def test_discard_releases_the_spill_file():
+    buffer = TransactionBuffer(decode=decode_message_view, spill_threshold=10)
+    fill(buffer, [pgoutput.insert(16384, ["1", "x" * 20]), pgoutput.insert(16384, ["2", "x" * 20])])
+    spill_file = buffer._spill_file
+    buffer.discard()
+    assert spill_file.closed
+    assert not buffer.in_progress
+    assert len(buffer) == 0
@@ -0,0 +1,96 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_type_converters.py
+import json
+import struct
+import decimal
+import datetime
+
+import pytest
+
+from services.wal_listener.type_converters import (
+    BINARY_CONVERTERS, TEXT_CONVERTERS, FLOAT4OID, FLOAT8OID, NUMERICOID, TIMEOID, TIMESTAMPOID,
+    TIMESTAMPTZOID,
+)
+
+UTC = datetime.timezone.utc
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2024-05-01 12:30:00+00", datetime.datetime(2024, 5, 1, 12, 30, tzinfo=UTC)),
+    ("2024-05-01 12:30:00.5+00", datetime.datetime(2024, 5, 1, 12, 30, 0, 500000, tzinfo=UTC)),
+    ("2024-05-01 12:30:00.123456-05:30",
+     datetime.datetime(2024, 5, 1, 12, 30, 0, 123456,
+                       tzinfo=datetime.timezone(-datetime.timedelta(hours=5, minutes=30)))),
+    ("1850-01-01 00:00:00+05:53:28",
+     datetime.datetime(1850, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(seconds=21208)))),
+])
+def test_timestamptz_as_postgres_prints_it(text, expected):
+    assert TEXT_CONVERTERS[TIMESTAMPTZOID](text) == expected
+
+
+def test_timestamp_and_time_with_short_fractions():
+    assert TEXT_CONVERTERS[TIMESTAMPOID]("2024-05-01 12:30:00.12") == datetime.datetime(2024, 5, 1, 12, 30, 0, 120000)
+    assert TEXT_CONVERTERS[TIMEOID]("12:30:00.5") == datetime.time(12, 30, 0, 500000)
+
+
+@pytest.mark.parametrize("oid", [FLOAT4OID, FLOAT8OID])
+def test_text_floats(oid):
+    assert TEXT_CONVERTERS[oid]("1.5") == 1.5
+    assert TEXT_CONVERTERS[oid]("-2e-05") == -2e-05
+
+
+@pytest.mark.parametrize("oid", [FLOAT4OID, FLOAT8OID])
+@pytest.mark.parametrize("text", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_text_floats_stay_as_postgres_prints_them(oid, text):
+    value = TEXT_CONVERTERS[oid](text)
+    assert value == text
+    json.dumps(value, allow_nan=False)
+
+
+def numeric_send(text):
+    """
+    numeric_send() of a plain decimal string: base-10000 digits around the point,
+    without leading or trailing zero digits.
+    """
+    sign = 0x4000 if text.startswith("-") else 0
+    whole, _, fraction = text.lstrip("-").partition(".")
+    whole = whole.lstrip("0")
+    whole = whole.rjust(-(-len(whole) // 4) * 4, "0")
+    digits = [int(chunk) for chunk in _chunks(whole + fraction.ljust(-(-len(fraction) // 4) * 4, "0"))]
+    weight = len(whole) // 4 - 1
+    while digits and digits[0] == 0:
+        digits.pop(0)
+        weight -= 1
+    while digits and digits[-1] == 0:
+        digits.pop()
+    return struct.pack("!hhHh", len(digits), weight, sign, len(fraction)) + struct.pack(f"!{len(digits)}H", *digits)
+
+
+def _chunks(text):
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+@pytest.mark.parametrize("text", [
+    "12.50",
+    "-0.0001",
+    "1234567890123456789012345678901234567890",
+    "-1234567890123456789012345678901234567890.123456789",
+    "1" + "0" * 40,
+])
+def test_binary_numeric_keeps_every_digit(text):
+    value = BINARY_CONVERTERS[NUMERICOID](numeric_send(text))
+    assert isinstance(value, decimal.Decimal)
+    assert str(value) == text
+
+
+@pytest.mark.parametrize("oid, st", [(FLOAT4OID, "!f"), (FLOAT8OID, "!d")])
+def test_binary_floats(oid, st):
+    assert BINARY_CONVERTERS[oid](struct.pack(st, 1.5)) == 1.5
+    assert BINARY_CONVERTERS[oid](struct.pack(st, float("nan"))) == "NaN"
+    assert BINARY_CONVERTERS[oid](struct.pack(st, float("inf"))) == "Infinity"
+    assert BINARY_CONVERTERS[oid](struct.pack(st, float("-inf"))) == "-Infinity"
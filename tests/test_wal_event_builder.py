@@ -0,0 +1,64 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_wal_event_builder.py
+import decimal
+
+from services.wal_listener.postgres_decoder import decode_message_view
+from services.wal_listener.transaction_buffer import TransactionBuffer
+from services.wal_listener.wal_event_builder import (
+    build_changes, build_old_fields, build_wal_events, cache_relation, lsn_to_int
+)
+from tests import pgoutput
+from tests.pgoutput import UNCHANGED
+
+COLUMNS = [("id", 23), ("amount", 1700), ("body", 25)]
+
+
+def relation():
+    relation_cache = {}
+    cache_relation(relation_cache, decode_message_view(pgoutput.relation(16384, "orders", COLUMNS)))
+    return relation_cache[16384]
+
+
+def test_old_key_keeps_only_key_columns():
+    msg = decode_message_view(pgoutput.update(16384, ["1", "2.50", UNCHANGED], key=["1", None, None]))
+    assert build_old_fields(msg, relation()) == {"id": 1}
+
+
+def test_full_old_row_is_converted():
+    msg = decode_message_view(pgoutput.update(16384, ["1", "2.50", UNCHANGED], old=["1", "1.25", "long"]))
+    assert build_old_fields(msg, relation()) == {"id": 1, "amount": decimal.Decimal("1.25"), "body": "long"}
+
+
+def test_no_old_image():
+    msg = decode_message_view(pgoutput.update(16384, ["1", "2.50", "x"]))
+    assert build_old_fields(msg, relation()) is None
+
+
+def test_unchanged_toast_is_not_a_change():
+    old = {"id": 1, "amount": decimal.Decimal("1.25"), "body": "long"}
+    new = {"id": 1, "amount": decimal.Decimal("2.50"), "body": "unchanged"}
+    assert build_changes(old, new) == {"amount": decimal.Decimal("1.25")}
+
+
+def test_update_event_with_unchanged_toast():
+    buffer = TransactionBuffer(decode=decode_message_view)
+    buffer.begin(decode_message_view(pgoutput.begin(xid=900)))
+    for payload in [
+        pgoutput.relation(16384, "orders", COLUMNS, identity="f"),
+        pgoutput.update(16384, ["1", "2.50", UNCHANGED], old=["1", "1.25", "long"]),
+    ]:
+        buffer.append(decode_message_view(payload), payload)
+    tx = buffer.commit(decode_message_view(pgoutput.commit(lsn=0x1_0000_0020)))
+
+    (event,) = build_wal_events(tx, {})
+    assert event["action"] == "update"
+    assert event["commit_lsn"] == lsn_to_int((1, 0x20)) == 0x1_0000_0020
+    assert event["seq"] == 0
+    assert event["source_table_name"] == "orders"
+    assert event["record"] == {"id": 1, "amount": decimal.Decimal("2.50"), "body": "unchanged"}
+    assert event["changes"] == {"amount": decimal.Decimal("1.25")}
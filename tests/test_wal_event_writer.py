@@ -0,0 +1,200 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_wal_event_writer.py
+"""
+WalEventWriter._flush against a fake session: a batch is acknowledged only once
+its insert and checkpoint committed.
+"""
+import threading
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from services.wal_listener.reconnect import Backoff
+from services.wal_listener.wal_event_writer import WalEventWriter, WriterStopped
+
+INSERT = "INSERT wal_events"
+
+
+def mysql_gone():
+    return OperationalError(INSERT, {}, Exception("(2006, 'MySQL server has gone away')"))
+
+
+def rejected_value():
+    return IntegrityError(INSERT, {}, Exception("(1048, \"Column 'record' cannot be null\")"))
+
+
+class FakeSession:
+    """
+    Records what the writer does in `log`. `fail(statement, rows)` may return an
+    exception to raise for a statement instead of executing it.
+    """
+
+    def __init__(self, log, fail=None):
+        self.log = log
+        self.fail = fail or (lambda statement, rows: None)
+        self.inserted = []
+        self._pending = []
+
+    def begin_nested(self):
+        session = self
+
+        class Savepoint:
+            def __enter__(self):
+                self.mark = len(session._pending)
+
+            def __exit__(self, exc_type, exc, tb):
+                if exc_type is not None:
+                    del session._pending[self.mark:]
+                return False
+
+        return Savepoint()
+
+    def execute(self, statement, params=None):
+        statement = statement if statement == INSERT else str(statement)
+        error = self.fail(statement, params)
+        if error is not None:
+            raise error
+        self.log.append(("execute", INSERT if statement == INSERT else "checkpoint"))
+        if statement == INSERT:
+            self._pending.extend(params)
+
+    def commit(self):
+        self.log.append(("commit",))
+        self.inserted.extend(self._pending)
+        self._pending = []
+
+    def rollback(self):
+        self.log.append(("rollback",))
+        self._pending = []
+
+
+def make_writer(log, fail=None):
+    writer = WalEventWriter(1, "slot", on_flush=lambda lsn: log.append(("ack", lsn)))
+    writer.session = FakeSession(log, fail)
+    writer.wal_pipeline_id = "pipeline"
+    writer.retry_backoff = Backoff(base=0, cap=0)
+    writer._insert_statement = lambda: INSERT
+    writer._to_row = lambda event, pipeline_id: dict(event, wal_pipeline_id=pipeline_id)
+    return writer
+
+
+def batch(*transactions):
+    """
+    [(rows, ack_lsn)] as the queue hands them to _flush.
+    """
+    return [([{"commit_lsn": lsn, "seq": seq} for seq in range(rows)], lsn) for rows, lsn in transactions]
+
+
+def flush(writer, items):
+    writer._pending_rows = sum(len(events) for events, _ in items)
+    writer._flush(items)
+
+
+def test_ack_after_commit():
+    log = []
+    writer = make_writer(log)
+    flush(writer, batch((2, 100), (1, 200)))
+
+    assert log == [("execute", INSERT), ("execute", "checkpoint"), ("commit",), ("ack", 200)]
+    assert len(writer.session.inserted) == 3
+    assert writer._pending_rows == 0
+    assert writer.stats()["rows_written"] == 3
+
+
+def test_mysql_failure_is_retried_and_acked_only_once_committed():
+    log = []
+    failures = iter([mysql_gone(), mysql_gone()])
+
+    def fail(statement, rows):
+        return next(failures, None) if statement == INSERT else None
+
+    writer = make_writer(log, fail)
+    flush(writer, batch((2, 100)))
+
+    assert log.count(("rollback",)) == 2
+    assert log.index(("ack", 100)) == len(log) - 1
+    assert log[-2] == ("commit",)
+    assert [row["seq"] for row in writer.session.inserted] == [0, 1]
+    assert writer.retry_backoff.attempts == 0
+    assert writer.error is None
+
+
+def test_checkpoint_failure_is_not_acked():
+    log = []
+    calls = []
+
+    def fail(statement, rows):
+        if statement.startswith("INSERT INTO replication_slot_checkpoints"):
+            calls.append(statement)
+            if len(calls) == 1:
+                return mysql_gone()
+
+    writer = make_writer(log, fail)
+    flush(writer, batch((1, 100)))
+
+    assert log.index(("rollback",)) < log.index(("commit",)) < log.index(("ack", 100))
+    assert log.count(("ack", 100)) == 1
+    assert len(writer.session.inserted) == 1
+
+
+def test_writer_stopping_while_mysql_is_down_acks_nothing():
+    log = []
+    writer = make_writer(log, lambda statement, rows: mysql_gone())
+    writer._stopping.set()
+    flush(writer, batch((3, 100)))
+
+    assert not [entry for entry in log if entry[0] == "ack"]
+    assert ("commit",) not in log
+    assert isinstance(writer.error, OperationalError)
+    assert writer._pending_rows == 0
+
+    writer._thread = threading.Thread(target=lambda: None)
+    writer._thread.start()
+    writer._thread.join()
+    with pytest.raises(WriterStopped):
+        writer.has_room()
+
+
+def test_rejected_rows_are_dead_lettered_and_the_rest_acked(caplog):
+    log = []
+
+    def fail(statement, rows):
+        if statement == INSERT and any(row["seq"] == 1 for row in rows):
+            return rejected_value()
+
+    writer = make_writer(log, fail)
+    flush(writer, batch((3, 100)))
+
+    assert [row["seq"] for row in writer.session.inserted] == [0, 2]
+    assert log[-1] == ("ack", 100)
+    assert writer.stats()["rows_failed"] == 1
+    assert "Skipping WAL event commit_lsn=100 seq=1" in caplog.text
+
+
+def test_malformed_event_is_dead_lettered():
+    log = []
+    writer = make_writer(log)
+    writer._to_row = lambda event, pipeline_id: {"seq": event["seq"], "action": event["action"]}
+    items = [([{"commit_lsn": 100, "seq": 0, "action": "insert"}, {"commit_lsn": 100, "seq": 1}], 100)]
+    flush(writer, items)
+
+    assert [row["seq"] for row in writer.session.inserted] == [0]
+    assert log[-1] == ("ack", 100)
+    assert writer._pending_rows == 0
+
+
+def test_lost_lease_fences_without_ack():
+    log = []
+    writer = make_writer(log)
+    writer.lease = {"slot_id": "pipeline", "owner": "node-a", "token": 3}
+    writer.session.execute = lambda statement, params=None: type("Result", (), {"first": lambda self: None})()
+    flush(writer, batch((2, 100)))
+
+    assert writer.fenced
+    assert log == [("rollback",)]
+    assert writer._pending_rows == 0
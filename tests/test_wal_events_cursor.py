@@ -0,0 +1,41 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# tests/test_wal_events_cursor.py
+import json
+import base64
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from resources.wal_events.cursors import encode_cursor, decode_cursor
+
+EVENT_ID = "01928f3e-7b1c-7c3a-9d4e-5f6a7b8c9d0e"
+
+
+def token(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    event = SimpleNamespace(committed_at=datetime.datetime(2026, 10, 17, 12, 30, 0, 250000), seq=3, id=EVENT_ID)
+    cursor = encode_cursor(event)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (event.committed_at, 3, EVENT_ID)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    token(["2026-10-17T12:30:00", 3]),
+    token(["yesterday", 3, EVENT_ID]),
+    token(["2026-10-17T12:30:00", "three", EVENT_ID]),
+    token(["2026-10-17T12:30:00", 3, "' OR 1=1 --"]),
+    token({"committed_at": "2026-10-17T12:30:00"}),
+])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,23 @@
+# ===================================================
+# NOTICE: This file is part of a private repository.
+# Provided for demonstration purposes only.
+# Not suitable for production use.
+# ===================================================
+
+# utils/json.py
+import decimal
+import datetime
+
+
+def json_default(value):
+    """
+    `default=` hook for json.dumps so converted rows can be stored in JSON columns.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        # Kept as a string: a JSON float would silently lose numeric precision.
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")